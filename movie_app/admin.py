@@ -1,10 +1,25 @@
+import hashlib
+from collections import Counter, defaultdict
+from decimal import Decimal
+
 from django import forms
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.forms.models import BaseInlineFormSet
 from django.utils.safestring import mark_safe
-from django.db.models import QuerySet
+from django.db.models import Count, Max, Q, QuerySet
 from ckeditor_uploader.widgets import CKEditorUploadingWidget
 
-from .models import Movie, Actor, Director, Genre, PlaceResidence, Rating, Feedback
+from . import dedupe, leaderboard, querycache, snapshot, tasks, trending
+from .models import Movie, Actor, Director, Genre, PlaceResidence, Rating, Feedback, Task, UploadedImage
+from .search import TermSearchMixin, MOVIE_SEARCH_FIELDS, RATING_SEARCH_FIELDS
+from .slugs import assign_slugs, write_slugs
+from .uploads import file_url
 
 
 class MovieAdminForm(forms.ModelForm):
@@ -16,7 +31,79 @@ class MovieAdminForm(forms.ModelForm):
         fields = '__all__'
 
 
-admin.site.register(Genre)
+class BulkEditableMixin:
+    """Збереження list_editable одним bulk_update замість save() для кожного рядка.
+
+    Змінені рядки (form.has_changed) збираються в save_model і записуються групами
+    за набором змінених полів у тій самій транзакції, що й журнал змін адмінки.
+    Сигнали моделей при цьому не надсилаються, тож похідні дані оновлює after_bulk_save.
+    """
+    bulk_batch_size = 500
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'POST' or not self.list_editable or '_save' not in request.POST:
+            return super().changelist_view(request, extra_context)
+        request._bulk_changed = []
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            response = super().changelist_view(request, extra_context)
+            self.bulk_save(request, request._bulk_changed)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        changed = getattr(request, '_bulk_changed', None)
+        if changed is None or not change:
+            return super().save_model(request, obj, form, change)
+        changed.append((obj, list(form.changed_data), form.initial))
+
+    def bulk_save(self, request, changed):
+        if not changed:
+            return
+        slug_fields = set(getattr(self.model, 'slug_fields', ()))
+        renamed = [obj for obj, fields, initial in changed if slug_fields & set(fields)]
+        groups = defaultdict(list)
+        for obj, fields, initial in changed:
+            groups[tuple(sorted(fields))].append(obj)
+        for fields, objs in groups.items():
+            self.model._default_manager.bulk_update(objs, fields, batch_size=self.bulk_batch_size)
+        if renamed:
+            # унікальні слаги для всіх перейменованих рядків одним запитом
+            write_slugs(self.model, assign_slugs(renamed), self.bulk_batch_size)
+        # bulk_update не надсилає сигналів, тож кеш запитів скидається для всієї таблиці
+        querycache.invalidate_model(self.model)
+        if self.model in snapshot.SLUG_MODELS:
+            snapshot.schedule_build()
+        self.after_bulk_save(request, changed)
+
+    def after_bulk_save(self, request, changed):
+        """Оновлення похідних даних після пакетного запису"""
+
+
+class PrefixSearchMixin:
+    """Автодоповнення шукає за префіксом діапазоном по індексу замість LIKE '%...%'"""
+    prefix_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        match = request.resolver_match
+        if not self.prefix_search_fields or not match or match.url_name != 'autocomplete':
+            return super().get_search_results(request, queryset, search_term)
+        # кожне слово має бути початком одного з полів
+        for word in search_term.split():
+            q = Q()
+            for variant in {word, word.lower(), word.capitalize()}:
+                for field in self.prefix_search_fields:
+                    q |= Q(**{f'{field}__gte': variant, f'{field}__lt': variant + '\U0010ffff'})
+            queryset = queryset.filter(q)
+        return queryset, False
+
+
+@admin.register(Genre)
+class GenreAdmin(PrefixSearchMixin, admin.ModelAdmin):
+    """Жанри"""
+    list_display = ['name']
+    # сталий порядок сторінок автодоповнення
+    ordering = ['name', 'id']
+    search_fields = ['name']
+    prefix_search_fields = ['name']
 
 
 class RatingFilter(admin.SimpleListFilter):
@@ -69,32 +156,227 @@ class YearFilter(admin.SimpleListFilter):
         return queryset
 
 
-class FeedbackInline(admin.TabularInline):
+class DirectorFilter(admin.SimpleListFilter):
+    """Фільтр режисерів: лише найпродуктивніші, список кешується"""
+    title = "Director"
+    parameter_name = 'director'
+    limit = 20
+    cache_key = 'admin:director_filter'
+
+    def lookups(self, request, model_admin):
+        choices = cache.get(self.cache_key)
+        if choices is None:
+            choices = [(str(pk), f'{first_name} {last_name}') for pk, first_name, last_name in
+                       Director.objects.annotate(count=Count('movies')).order_by('-count', 'last_name')
+                       .values_list('id', 'first_name', 'last_name')[:self.limit]]
+            cache.set(self.cache_key, choices, 300)
+        value = self.value()
+        if value and value.isdigit() and value not in dict(choices):
+            director = Director.objects.filter(pk=value).first()
+            if director:
+                choices = choices + [(value, str(director))]
+        return choices
+
+    def queryset(self, request, queryset: QuerySet):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(director_id=self.value())
+        return queryset
+
+
+class DuplicatesFilter(admin.SimpleListFilter):
+    """Записи, що входять у пари ймовірних дублікатів; кандидати кешуються"""
+    title = 'Possible duplicates'
+    parameter_name = 'duplicates'
+
+    def lookups(self, request, model_admin):
+        return [('1', 'Yes')]
+
+    def queryset(self, request, queryset: QuerySet):
+        if self.value() == '1':
+            ids = set()
+            for candidate in dedupe.cached_candidates(queryset.model):
+                ids.update([candidate.keep_id, candidate.duplicate_id])
+            return queryset.filter(pk__in=ids)
+        return queryset
+
+
+class MergeDuplicatesMixin:
+    """Дія злиття вибраних дублікатів у найстаріший з них"""
+    actions = ['merge_duplicates']
+
+    @admin.action(description='Merge selected duplicates into the oldest')
+    def merge_duplicates(self, request, qs: QuerySet):
+        objs = list(qs.order_by('pk'))
+        if len(objs) < 2:
+            self.message_user(request, 'Select at least two rows to merge.', messages.WARNING)
+            return
+        count = dedupe.merge(self.model, objs[0], objs[1:])
+        self.message_user(request, f'Merged {count} duplicates into {objs[0]}.')
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline формсет, що показує одну сторінку записів; параметри <prefix>-page і <prefix>-q в URL"""
+    request = None
+    per_page = 20
+    search_fields = ()
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = self.queryset
+            if not queryset.ordered:
+                queryset = queryset.order_by('-pk')
+            if self.is_bound:
+                # зберігаються лише ті записи, форми яких були на сторінці
+                pks = [self.data.get(f'{self.prefix}-{i}-{self.model._meta.pk.name}')
+                       for i in range(self.initial_form_count())]
+                self._queryset = queryset.filter(pk__in=[pk for pk in pks if pk])
+                return self._queryset
+            params = self.request.GET if self.request else {}
+            self.search = params.get(f'{self.prefix}-q', '').strip()
+            if self.search:
+                q = Q()
+                for field in self.search_fields:
+                    q |= Q(**{f'{field}__icontains': self.search})
+                queryset = queryset.filter(q)
+            self.page = Paginator(queryset, self.per_page).get_page(params.get(f'{self.prefix}-page'))
+            self._queryset = self.page.object_list
+        return self._queryset
+
+    def page_url(self, number):
+        params = self.request.GET.copy()
+        params[f'{self.prefix}-page'] = number
+        return f'?{params.urlencode()}'
+
+    def pages(self):
+        """Посилання на попередню і наступну сторінки"""
+        page = getattr(self, 'page', None)
+        if page is None:
+            return {}
+        return {
+            'previous': self.page_url(page.previous_page_number()) if page.has_previous() else None,
+            'next': self.page_url(page.next_page_number()) if page.has_next() else None,
+        }
+
+
+class PaginatedInline(admin.TabularInline):
+    """Табличний inline з пагінацією, пошуком і кількістю записів"""
+    formset = PaginatedInlineFormSet
+    template = 'admin/movie_app/paginated_tabular.html'
+    per_page = 20
+    search_fields = ()
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.request = request
+        formset.per_page = self.per_page
+        formset.search_fields = self.search_fields
+        return formset
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагінатор, що не рахує точно великі таблиці.
+
+    До ADMIN_COUNT_THRESHOLD рядків рахує точно (COUNT з LIMIT). Більше - оцінює
+    за максимальним первинним ключем для нефільтрованого списку або кешує
+    точну кількість для відфільтрованого.
+    """
+
+    @cached_property
+    def count(self):
+        # порядок на кількість не впливає
+        queryset = self.object_list.order_by()
+        threshold = getattr(settings, 'ADMIN_COUNT_THRESHOLD', 10000)
+        key = self.cache_key(queryset)
+        count = cache.get(key) if key else None
+        if count is not None:
+            return count
+        count = queryset[:threshold + 1].count()
+        if count <= threshold:
+            return count
+        if not queryset.query.where:
+            count = queryset.aggregate(max_pk=Max('pk'))['max_pk'] or count
+        else:
+            count = queryset.count()
+        if key:
+            cache.set(key, count, getattr(settings, 'ADMIN_COUNT_CACHE_SECONDS', 300))
+        return count
+
+    @staticmethod
+    def cache_key(queryset):
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except Exception:
+            return None
+        return 'admin:count:' + hashlib.sha1(f'{sql}{params!r}'.encode()).hexdigest()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без точного підрахунку всіх рядків таблиці"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class TopValuesFilter(admin.SimpleListFilter):
+    """Фільтр за найчастішими значеннями поля з великою кількістю різних значень; список кешується"""
+    field = None
+    limit = 20
+
+    def lookups(self, request, model_admin):
+        key = f'admin:top_values:{model_admin.model._meta.label_lower}:{self.field}'
+        values = cache.get(key)
+        if values is None:
+            values = list(model_admin.model._default_manager.values_list(self.field, flat=True)
+                          .annotate(count=Count('pk')).order_by('-count', self.field)[:self.limit])
+            cache.set(key, values, getattr(settings, 'ADMIN_COUNT_CACHE_SECONDS', 300))
+        if self.value() and self.value() not in values:
+            values = values + [self.value()]
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset: QuerySet):
+        if self.value():
+            return queryset.filter(**{self.field: self.value()})
+        return queryset
+
+    @classmethod
+    def for_field(cls, field, title, limit=20):
+        return type(f'{field.title()}TopValuesFilter', (cls,),
+                    {'field': field, 'title': title, 'parameter_name': field, 'limit': limit})
+
+
+class FeedbackInline(PaginatedInline):
     """Відгуки на сторінці фільму"""
     model = Feedback
     extra = 1
     readonly_fields = ("email",)
     classes = ['collapse']
+    ordering = ['-id']
+    search_fields = ['email', 'name', 'surname']
 
 
-class RatingInline(admin.TabularInline):
+class RatingInline(PaginatedInline):
     """Відгуки на сторінці фільму"""
     model = Rating
     extra = 1
     readonly_fields = ("ip", "rating", "viewed_date")
     classes = ['collapse']
+    ordering = ['-viewed_date', '-id']
+    search_fields = ['ip']
 
 
 @admin.register(Movie)
-class MovieAdmin(admin.ModelAdmin):
+class MovieAdmin(PrefixSearchMixin, TermSearchMixin, BulkEditableMixin, MergeDuplicatesMixin, admin.ModelAdmin):
     """Фільми"""
     prepopulated_fields = {'slug': ('original_name',)}
     list_display = ['name', 'original_name', 'year', 'director', 'get_image', 'rating_status']
     list_editable = ['original_name', 'year', 'director']
+    list_select_related = ['director']
     ordering = ['-rating_imdb', 'name']
     list_per_page = 20
     search_fields = ['name', 'original_name', 'year', 'length', 'rating_imdb']
-    list_filter = [RatingFilter, YearFilter, 'director']
+    search_term_fields = MOVIE_SEARCH_FIELDS
+    prefix_search_fields = ['name', 'original_name']
+    autocomplete_fields = ['director', 'actors', 'genres']
+    list_filter = [RatingFilter, YearFilter, DirectorFilter, DuplicatesFilter]
     form = MovieAdminForm
     inlines = [RatingInline, FeedbackInline]
     readonly_fields = ('get_image',)
@@ -125,18 +407,32 @@ class MovieAdmin(admin.ModelAdmin):
 
     def get_image(self, obj):
         """Відображення зображень"""
+        if not obj.picture:
+            return ''
         return mark_safe(f'<img src={obj.picture.url} height="150"')
 
     get_image.short_description = "Постер"
 
+    def after_bulk_save(self, request, changed):
+        tasks.refresh_cards.enqueue_on_commit([obj.id for obj, fields, initial in changed])
+        keys = set()
+        for obj, fields, initial in changed:
+            if 'year' in fields:
+                keys.update([leaderboard.decade_key(initial['year']), leaderboard.decade_key(obj.year)])
+        if keys:
+            tasks.rebuild_boards.enqueue_on_commit(sorted(keys))
+
 
 @admin.register(Director)
-class DirectorAdmin(admin.ModelAdmin):
+class DirectorAdmin(PrefixSearchMixin, BulkEditableMixin, MergeDuplicatesMixin, admin.ModelAdmin):
     """Режисери"""
     list_display = ['first_name', 'last_name', 'director_email']
     list_editable = ['last_name', 'director_email']
+    ordering = ['last_name', 'first_name', 'id']
     list_per_page = 20
     search_fields = ['first_name', 'last_name', 'director_email']
+    prefix_search_fields = ['first_name', 'last_name']
+    list_filter = [DuplicatesFilter]
     fieldsets = (
         (None, {"fields": (('first_name', 'last_name', 'slug'),)}),
         (None, {"fields": ('director_email',)}),
@@ -144,14 +440,18 @@ class DirectorAdmin(admin.ModelAdmin):
 
 
 @admin.register(Actor)
-class ActorAdmin(admin.ModelAdmin):
+class ActorAdmin(PrefixSearchMixin, BulkEditableMixin, MergeDuplicatesMixin, admin.ModelAdmin):
     """Актори"""
     list_display = ['first_name', 'last_name', 'gender', 'residence']
     list_editable = ['last_name', 'gender', 'residence']
+    list_select_related = ['residence']
+    ordering = ['last_name', 'first_name', 'id']
     list_per_page = 20
-    actions = ['set_gender_male', 'set_gender_female']
+    actions = ['set_gender_male', 'set_gender_female', 'merge_duplicates']
     search_fields = ['first_name', 'last_name']
-    list_filter = ['gender']
+    prefix_search_fields = ['first_name', 'last_name']
+    autocomplete_fields = ['residence']
+    list_filter = ['gender', DuplicatesFilter]
     fieldsets = (
         (None, {"fields": (('first_name', 'last_name', 'slug'),)}),
         (None, {"fields": (('gender',),)}),
@@ -172,12 +472,14 @@ class ActorAdmin(admin.ModelAdmin):
 
 
 @admin.register(PlaceResidence)
-class PlaceResidenceAdmin(admin.ModelAdmin):
+class PlaceResidenceAdmin(PrefixSearchMixin, BulkEditableMixin, admin.ModelAdmin):
     """Місце проживання"""
     list_display = ['country', 'city', 'street', 'number', 'map_coordinate']
     list_editable = ['city', 'street', 'number', 'map_coordinate']
+    ordering = ['city', 'street', 'id']
     list_per_page = 20
     search_fields = ['country', 'city', 'street', 'number', 'map_coordinate']
+    prefix_search_fields = ['city', 'street']
     list_filter = ['country', 'city']
     fieldsets = (
         (None, {"fields": (('country', 'city'),)}),
@@ -187,20 +489,80 @@ class PlaceResidenceAdmin(admin.ModelAdmin):
 
 
 @admin.register(Rating)
-class RatingAdmin(admin.ModelAdmin):
+class RatingAdmin(TermSearchMixin, BulkEditableMixin, LargeTableAdmin):
     """Рейтинги"""
     list_display = ['ip', 'rating', 'viewed_date', 'movie']
     list_editable = ['rating', 'viewed_date']
     list_per_page = 20
     search_fields = ['rating', 'viewed_date']
+    search_term_fields = RATING_SEARCH_FIELDS
     list_filter = ['rating', 'viewed_date']
+    autocomplete_fields = ['movie']
+
+    def after_bulk_save(self, request, changed):
+        """Те саме, що роблять сигнали Rating, але одним проходом по всіх змінених оцінках"""
+        deltas = defaultdict(Decimal)
+        events = Counter()
+        for obj, fields, initial in changed:
+            if 'rating' in fields:
+                deltas[obj.movie_id] += Decimal(str(obj.rating)) - Decimal(str(initial['rating']))
+            if 'viewed_date' in fields:
+                events[(obj.movie_id, trending.RATING, initial['viewed_date'])] -= 1
+                events[(obj.movie_id, trending.RATING, obj.viewed_date)] += 1
+        for movie_id, delta in deltas.items():
+            if delta:
+                leaderboard.apply_rating(movie_id, 0, delta, refresh=False)
+                tasks.refresh_movie.enqueue_on_commit(movie_id)
+        if events:
+            trending.record(events)
 
 
 @admin.register(Feedback)
-class FeedbackAdmin(admin.ModelAdmin):
+class FeedbackAdmin(BulkEditableMixin, LargeTableAdmin):
     """Відгуки"""
     list_display = ['id', 'email', 'name', 'surname', 'feed']
     list_editable = ['feed']
     list_per_page = 20
     search_fields = ['name', 'surname', 'feed']
-    list_filter = ['name', 'surname']
+    list_filter = [TopValuesFilter.for_field('name', "Ім'я"), TopValuesFilter.for_field('surname', 'Прізвище')]
+    autocomplete_fields = ['movie']
+
+
+@admin.register(UploadedImage)
+class UploadedImageAdmin(LargeTableAdmin):
+    """Файли, завантажені через CKEditor"""
+    list_display = ['path', 'original_name', 'get_thumbnail', 'width', 'height', 'size', 'uploaded']
+    list_per_page = 50
+    search_fields = ['original_name']
+    ordering = ['-uploaded']
+    readonly_fields = ['path', 'thumbnail', 'sha256', 'size', 'width', 'height', 'is_image', 'uploaded']
+
+    @admin.display(description='Мініатюра')
+    def get_thumbnail(self, obj):
+        if not obj.thumbnail:
+            return ''
+        return mark_safe(f'<img src="{file_url(obj.thumbnail)}" height="50">')
+
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    """Фонові завдання"""
+    list_display = ['id', 'name', 'status', 'priority', 'attempts', 'run_at', 'duration', 'worker']
+    list_per_page = 50
+    list_filter = ['status', TopValuesFilter.for_field('name', 'Завдання')]
+    ordering = ['-id']
+    readonly_fields = ['created', 'started', 'finished', 'duration', 'worker', 'error']
+    actions = ['retry_tasks']
+
+    @admin.action(description='Retry selected failed tasks')
+    def retry_tasks(self, request, qs: QuerySet):
+        """Повторний запуск; завдання, яке вже очікує з тим самим ключем, не дублюється"""
+        count = 0
+        for task in qs.filter(status=Task.FAILED):
+            try:
+                with transaction.atomic(using=router.db_for_write(Task)):
+                    Task.objects.filter(pk=task.pk).update(status=Task.PENDING, attempts=0, run_at=timezone.now())
+                count += 1
+            except IntegrityError:
+                continue
+        self.message_user(request, f'{count} tasks queued again.')
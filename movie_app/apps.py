@@ -5,3 +5,11 @@ class MovieAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'movie_app'
     verbose_name = "Фільми"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from django.conf import settings
+
+        if getattr(settings, 'WARMUP_ON_START', False):
+            from .warmup import start_primer
+            start_primer()
@@ -0,0 +1,47 @@
+from django.db.models import Prefetch
+
+from .models import Movie, Genre, MovieCard
+
+
+def build_card(movie):
+    """Дані картки; жанри мають бути попередньо вибрані"""
+    return {
+        'id': movie.id,
+        'name': movie.name,
+        'original_name': movie.original_name,
+        'year': movie.year,
+        'length': movie.length,
+        'rating_imdb': str(movie.rating_imdb),
+        'url': movie.get_url(),
+        'thumbnail': movie.picture.url if movie.picture else '',
+        'genres': [genre.name for genre in movie.genres.all()],
+    }
+
+
+def refresh_cards(movie_ids, batch_size=500):
+    """Перебудова карток для заданих фільмів пакетами"""
+    movie_ids = list(movie_ids)
+    for i in range(0, len(movie_ids), batch_size):
+        movies = Movie.objects.filter(id__in=movie_ids[i:i + batch_size]).prefetch_related(
+            Prefetch('genres', queryset=Genre.objects.only('id', 'name')))
+        MovieCard.objects.bulk_create(
+            [MovieCard(movie_id=movie.id, data=build_card(movie)) for movie in movies],
+            update_conflicts=True, unique_fields=['movie'], update_fields=['data'])
+
+
+def rebuild_all(batch_size=500):
+    ids = list(Movie.objects.values_list('id', flat=True))
+    refresh_cards(ids, batch_size)
+    MovieCard.objects.exclude(movie_id__in=Movie.objects.values('id')).delete()
+    return len(ids)
+
+
+def cards_for(movie_ids):
+    """Картки у порядку id одним запитом за первинним ключем; відсутні будуються на льоту"""
+    movie_ids = list(movie_ids)
+    cards = MovieCard.objects.in_bulk(movie_ids)
+    missing = [pk for pk in movie_ids if pk not in cards]
+    if missing:
+        refresh_cards(missing)
+        cards.update(MovieCard.objects.in_bulk(missing))
+    return [dict(cards[pk].data) for pk in movie_ids if pk in cards]
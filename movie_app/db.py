@@ -0,0 +1,56 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+WRITE_DB = DEFAULT_DB_ALIAS
+READ_DB = 'replica'
+
+_state = threading.local()
+
+
+def read_db():
+    return READ_DB if READ_DB in settings.DATABASES else WRITE_DB
+
+
+@contextmanager
+def use_writer():
+    """Усі читання в межах блоку йдуть через з'єднання для запису"""
+    previous = getattr(_state, 'writer', False)
+    _state.writer = True
+    try:
+        yield
+    finally:
+        _state.writer = previous
+
+
+class ReadReplicaRouter:
+    """Читання через з'єднання лише для читання, запис через одне основне з'єднання"""
+
+    def db_for_read(self, model, **hints):
+        # усередині транзакції читаємо там само, де пишемо, інакше не побачимо незафіксованих змін
+        if getattr(_state, 'writer', False) or connections[WRITE_DB].in_atomic_block:
+            return WRITE_DB
+        return read_db()
+
+    def db_for_write(self, model, **hints):
+        return WRITE_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == WRITE_DB
+
+
+def configure_connection(connection):
+    """PRAGMA для нового з'єднання SQLite"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if connection.alias == WRITE_DB and not connection.is_in_memory_db():
+            # WAL дозволяє читачам працювати паралельно із записом
+            cursor.execute('PRAGMA journal_mode=WAL')
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name}={value}')
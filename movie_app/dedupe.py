@@ -0,0 +1,233 @@
+import re
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from . import querycache, trending
+from .importer import normalize_name
+from .models import Movie, Actor, Director, Rating, Feedback, MovieScore, MovieTrend, TrendingBucket
+
+DIGITS_RE = re.compile(r'\d+')
+# довжина префікса імені в ключах блоків
+PREFIX_LEN = 3
+
+Candidate = namedtuple('Candidate', 'score keep_id duplicate_id')
+# ключі блоків [(блок, рядок для сортування в блоці)], триграми імен, числа в назві і дані для перевірок
+Record = namedtuple('Record', 'pk keys grams numbers extra')
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+def movie_records(queryset):
+    """Фільми блокуються за роком, режисером і префіксами обох назв"""
+    for pk, name, original_name, year, director_id in queryset.values_list(
+            'pk', 'name', 'original_name', 'year', 'director_id').iterator():
+        original, local = normalize_name(original_name), normalize_name(name)
+        keys = [(f'y{year}', original), (f'o{original[:PREFIX_LEN]}', original), (f'n{local[:PREFIX_LEN]}', local)]
+        if director_id:
+            keys.append((f'd{director_id}', original))
+        yield Record(pk, keys, (trigrams(original), trigrams(local)),
+                     frozenset(DIGITS_RE.findall(original)), (year, director_id))
+
+
+def person_records(queryset):
+    """Люди блокуються за префіксами повного імені, прізвища і імені з упорядкованими словами"""
+    for pk, first_name, last_name in queryset.values_list('pk', 'first_name', 'last_name').iterator():
+        full = normalize_name(f'{first_name} {last_name}')
+        last = normalize_name(f'{last_name} {first_name}')
+        ordered = ' '.join(sorted(full.split()))
+        keys = [(f'f{full[:PREFIX_LEN]}', full), (f'l{last[:PREFIX_LEN]}', last), (f'o{ordered[:PREFIX_LEN]}', ordered)]
+        yield Record(pk, keys, (trigrams(full), trigrams(ordered)), frozenset(DIGITS_RE.findall(full)), None)
+
+
+def movie_score(a, b):
+    """Схожість назв; різниця в роках більше року виключає пару, різні режисери знижують бал"""
+    (year_a, director_a), (year_b, director_b) = a.extra, b.extra
+    if abs(year_a - year_b) > 1:
+        return 0.0
+    score = max(jaccard(a.grams[0], b.grams[0]), jaccard(a.grams[1], b.grams[1]))
+    if director_a and director_b and director_a != director_b:
+        score *= 0.85
+    return score
+
+
+def person_score(a, b):
+    return max(jaccard(a.grams[0], b.grams[0]), jaccard(a.grams[1], b.grams[1]))
+
+
+SPECS = {
+    Movie: (movie_records, movie_score),
+    Director: (person_records, person_score),
+    Actor: (person_records, person_score),
+}
+
+
+def default_threshold():
+    return getattr(settings, 'DEDUPE_THRESHOLD', 0.7)
+
+
+def find_duplicates(model, threshold=None, window=None, queryset=None):
+    """Пари ймовірних дублікатів без порівняння всіх пар між собою.
+
+    Записи групуються в блоки за ключами; у блоці, впорядкованому за іменем, кожен запис
+    порівнюється лише з window наступними. Пари з різними числами в назвах ("Rocky 2" і
+    "Rocky 3") і пари, чиї набори триграм за розміром не можуть дати потрібної схожості,
+    відкидаються до підрахунку.
+    """
+    threshold = default_threshold() if threshold is None else threshold
+    window = window or getattr(settings, 'DEDUPE_WINDOW', 50)
+    records_for, score_for = SPECS[model]
+    records = list(records_for(queryset if queryset is not None else model._default_manager.all()))
+    blocks = defaultdict(list)
+    for i, record in enumerate(records):
+        for key, text in record.keys:
+            blocks[key].append((text, i))
+
+    scores = {}
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        members.sort()
+        for n, (_, i) in enumerate(members):
+            a = records[i]
+            size_a = len(a.grams[0])
+            for _, j in members[n + 1:n + 1 + window]:
+                b = records[j]
+                pair = (a.pk, b.pk) if a.pk < b.pk else (b.pk, a.pk)
+                if pair in scores or a.numbers != b.numbers:
+                    continue
+                size_b = len(b.grams[0])
+                # подібність Жаккара не більша за відношення розмірів множин
+                if min(size_a, size_b) < threshold * max(size_a, size_b) and \
+                        min(len(a.grams[1]), len(b.grams[1])) < threshold * max(len(a.grams[1]), len(b.grams[1])):
+                    continue
+                scores[pair] = score_for(a, b)
+    return sorted((Candidate(round(score, 3), *pair) for pair, score in scores.items() if score >= threshold),
+                  key=lambda c: (-c.score, c.keep_id, c.duplicate_id))
+
+
+def cache_key(model):
+    return f'dedupe:{model._meta.label_lower}'
+
+
+def cached_candidates(model):
+    """Кандидати для фільтра адмінки; find_duplicates оновлює їх для великих таблиць"""
+    candidates = cache.get(cache_key(model))
+    if candidates is None:
+        candidates = store_candidates(model, find_duplicates(model))
+    return candidates
+
+
+def store_candidates(model, candidates):
+    cache.set(cache_key(model), candidates, getattr(settings, 'DEDUPE_CACHE_SECONDS', 3600))
+    return candidates
+
+
+def merge(model, keep, duplicates):
+    """Зливає дублікати в keep і видаляє їх; посилання переписуються пакетними запитами"""
+    duplicates = [obj for obj in duplicates if obj.pk != keep.pk]
+    if not duplicates:
+        return 0
+    with transaction.atomic():
+        MERGERS[model](keep, duplicates)
+        model._default_manager.filter(pk__in=[obj.pk for obj in duplicates]).delete()
+        # збереження оновлює картку і рейтинги кращих через сигнали
+        keep.save()
+        # посилання перенесено пакетними запитами без сигналів
+        querycache.invalidate_model(model, Movie)
+    cache.delete(cache_key(model))
+    return len(duplicates)
+
+
+def fill_blank(keep, duplicates, fields):
+    for field in fields:
+        if not getattr(keep, field):
+            setattr(keep, field, next((getattr(obj, field) for obj in duplicates if getattr(obj, field)),
+                                      getattr(keep, field)))
+
+
+def merge_links(through, field, other, keep_id, duplicate_ids):
+    """Переносить рядки проміжної таблиці на keep; наявні пари пропускаються"""
+    targets = through.objects.filter(**{f'{field}__in': duplicate_ids}).values_list(other, flat=True).distinct()
+    through.objects.bulk_create([through(**{field: keep_id, other: target}) for target in targets],
+                                batch_size=1000, ignore_conflicts=True)
+
+
+def merge_movies(keep, duplicates):
+    ids = [obj.pk for obj in duplicates]
+    fill_blank(keep, duplicates, ['description', 'picture', 'director_id'])
+    merge_links(Movie.genres.through, 'movie_id', 'genre_id', keep.pk, ids)
+    merge_links(Movie.actors.through, 'movie_id', 'actor_id', keep.pk, ids)
+    Feedback.objects.filter(movie_id__in=ids).update(movie_id=keep.pk)
+    Rating.objects.filter(movie_id__in=ids).update(movie_id=keep.pk)
+    # кошики переносяться до видалення повторних оцінок, щоб сигнал видалення відняв подію з кошика keep
+    _merge_trending(keep.pk, ids)
+    # одна оцінка на IP: залишається остання
+    repeated = (Rating.objects.filter(movie_id=keep.pk).values('ip').annotate(n=Count('id'))
+                .filter(n__gt=1).values_list('ip', flat=True))
+    stale = []
+    for ip in repeated:
+        stale += list(Rating.objects.filter(movie_id=keep.pk, ip=ip).order_by('-viewed_date', '-id')
+                      .values_list('id', flat=True)[1:])
+    Rating.objects.filter(id__in=stale).delete()
+    totals = Rating.objects.filter(movie_id=keep.pk).aggregate(count=Count('id'), total=Sum('rating'))
+    MovieScore.objects.update_or_create(movie_id=keep.pk, defaults={
+        'rating_count': totals['count'], 'rating_sum': totals['total'] or 0})
+
+
+def _merge_trending(keep_id, ids):
+    buckets = {(b.period, b.start): b for b in TrendingBucket.objects.filter(movie_id=keep_id)}
+    moved, summed = [], []
+    for bucket in TrendingBucket.objects.filter(movie_id__in=ids):
+        existing = buckets.get((bucket.period, bucket.start))
+        if existing is None:
+            bucket.movie_id = keep_id
+            buckets[(bucket.period, bucket.start)] = bucket
+            moved.append(bucket)
+        else:
+            existing.ratings += bucket.ratings
+            existing.views += bucket.views
+            summed.append(existing)
+    TrendingBucket.objects.bulk_update(moved, ['movie'], batch_size=1000)
+    TrendingBucket.objects.bulk_update(set(summed), ['ratings', 'views'], batch_size=1000)
+    log_score = None
+    for score in MovieTrend.objects.filter(movie_id__in=[keep_id, *ids]).values_list('log_score', flat=True):
+        log_score = trending.log_add(log_score, score)
+    if log_score is not None:
+        MovieTrend.objects.update_or_create(movie_id=keep_id, defaults={'log_score': log_score})
+
+
+def merge_directors(keep, duplicates):
+    fill_blank(keep, duplicates, ['director_email'])
+    Movie.objects.filter(director_id__in=[obj.pk for obj in duplicates]).update(director_id=keep.pk)
+
+
+def merge_actors(keep, duplicates):
+    ids = [obj.pk for obj in duplicates]
+    merge_links(Movie.actors.through, 'actor_id', 'movie_id', keep.pk, ids)
+    if keep.residence_id is None:
+        donor = next((obj for obj in duplicates if obj.residence_id), None)
+        if donor is not None:
+            # OneToOne: спершу звільнити місце проживання в дубліката
+            Actor.objects.filter(pk=donor.pk).update(residence=None)
+            keep.residence_id = donor.residence_id
+
+
+MERGERS = {
+    Movie: merge_movies,
+    Director: merge_directors,
+    Actor: merge_actors,
+}
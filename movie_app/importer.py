@@ -0,0 +1,263 @@
+import csv
+import gzip
+import json
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.text import slugify
+
+from . import cards, leaderboard, querycache
+from .models import Movie, Actor, Director, Genre
+from .slugs import assign_slugs, base_slug
+
+# роздільник списків у колонках CSV: "Драма|Комедія"
+LIST_SEPARATOR = '|'
+WORD_RE = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=100000)
+def normalize_name(value):
+    """Ключ для порівняння імен: без діакритики, регістру, розділових знаків і зайвих пробілів"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(WORD_RE.findall(value.casefold()))
+
+
+def open_source(path):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def detect_format(path):
+    name = str(path).removesuffix('.gz')
+    return 'jsonl' if name.endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+
+
+class RecordReader:
+    """Потокове читання дампу CSV чи JSONL (можна стиснутого gzip) по одному запису.
+
+    tell() - позиція у файлі після останнього прочитаного запису; з неї читання продовжується
+    через offset без розбору попередніх записів.
+    """
+
+    def __init__(self, path, fmt=None, offset=0):
+        self.fmt = fmt or detect_format(path)
+        self.file = open_source(path)
+        # рядки читаються по одному, тож позиція файлу завжди відповідає межі запису
+        self.lines = iter(self.file.readline, '')
+        self.fieldnames = next(csv.reader(self.lines), None) if self.fmt == 'csv' else None
+        if offset:
+            self.file.seek(offset)
+
+    def __iter__(self):
+        if self.fmt == 'csv':
+            yield from csv.DictReader(self.lines, fieldnames=self.fieldnames)
+        else:
+            for line in self.lines:
+                if line.strip():
+                    yield json.loads(line)
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class InvalidRecord(ValueError):
+    """Запис, який не можна імпортувати; повідомлення потрапляє у звіт про помилки"""
+
+
+def clean_field(model, name, value):
+    """Значення, перетворене і перевірене полем моделі, зокрема його валідаторами меж"""
+    try:
+        return model._meta.get_field(name).clean(value, None)
+    except ValidationError as e:
+        raise InvalidRecord(f'{name}: {" ".join(e.messages)}') from e
+
+
+def as_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+    return list(value)
+
+
+def person_fields(value, email_field=None, email=''):
+    """Ім'я та прізвище з рядка "Ім'я Прізвище" або словника з полями моделі"""
+    if isinstance(value, dict):
+        fields = {k: (value.get(k) or '').strip() for k in ('first_name', 'last_name')}
+        if email_field:
+            fields[email_field] = value.get('email') or value.get(email_field) or email
+        if value.get('gender'):
+            fields['gender'] = value['gender']
+        return fields
+    first, _, last = str(value).strip().partition(' ')
+    fields = {'first_name': first, 'last_name': last.strip()}
+    if email_field:
+        fields[email_field] = email
+    return fields
+
+
+def clip(model, field, value):
+    return value[:model._meta.get_field(field).max_length]
+
+
+class CatalogImporter:
+    """Пакетний імпорт фільмів разом із жанрами, режисерами, акторами і зв'язками M2M.
+
+    Жанри і люди зіставляються за нормалізованим іменем через словники в пам'яті,
+    тож на запис припадає лише кілька запитів на цілий пакет.
+    """
+
+    def __init__(self, batch_size=5000):
+        self.batch_size = batch_size
+        self.genres = {}
+        self.directors = {}
+        self.actors = {}
+        # наявні фільми: (нормалізована назва англійською, рік)
+        self.movies = set()
+        self.stats = Counter()
+        # рейтинги кращих, які зачепив імпорт
+        self.board_keys = set()
+        # відхилені записи останнього пакета: (номер у пакеті, причина, запис)
+        self.errors = []
+
+    def load_maps(self):
+        """Наявні жанри і люди (нормалізоване ім'я -> id) та ключі наявних фільмів"""
+        for name, year in Movie.objects.values_list('original_name', 'year').order_by().iterator():
+            self.movies.add((normalize_name(name), year))
+        for pk, name in Genre.objects.values_list('id', 'name').order_by('id').iterator():
+            self.genres.setdefault(normalize_name(name), pk)
+        for model, mapping in ((Director, self.directors), (Actor, self.actors)):
+            for pk, first, last in model.objects.values_list('id', 'first_name', 'last_name').order_by('id').iterator():
+                mapping.setdefault(normalize_name(f'{first} {last}'), pk)
+
+    def parse(self, record):
+        """Поля фільму і пов'язаних записів; InvalidRecord для некоректного запису"""
+        if not isinstance(record, dict):
+            raise InvalidRecord('record is not an object')
+        name = str(record.get('name') or record.get('original_name') or '').strip()
+        original_name = str(record.get('original_name') or name).strip()
+        if not original_name:
+            raise InvalidRecord('name and original_name are empty')
+        movie = {
+            'name': clip(Movie, 'name', name),
+            'original_name': clip(Movie, 'original_name', original_name),
+            'year': clean_field(Movie, 'year', record.get('year')),
+            'length': clean_field(Movie, 'length', record.get('length') or 0),
+            'rating_imdb': clean_field(Movie, 'rating_imdb', str(record.get('rating_imdb') or 0)),
+            'description': record.get('description') or '',
+            'picture': record.get('picture') or None,
+        }
+        director = record.get('director')
+        return {
+            'movie': movie,
+            'slug': slugify(record.get('slug') or ''),
+            'genres': [clip(Genre, 'name', name.strip()) for name in as_list(record.get('genres'))],
+            'director': person_fields(director, 'director_email', record.get('director_email') or '')
+            if director else None,
+            'actors': [person_fields(actor) for actor in as_list(record.get('actors'))],
+        }
+
+    def import_batch(self, records):
+        """Один пакет в одній транзакції; повертає id створених фільмів"""
+        rows = []
+        self.errors = []
+        for number, record in enumerate(records):
+            try:
+                rows.append(self.parse(record))
+            except InvalidRecord as e:
+                self.stats['invalid'] += 1
+                self.errors.append((number, str(e), record))
+        with transaction.atomic():
+            rows = self._new_movies(rows)
+            self._create_genres(rows)
+            self._create_people(Director, self.directors, [row['director'] for row in rows if row['director']])
+            self._create_people(Actor, self.actors, [actor for row in rows for actor in row['actors']])
+            movies = self._create_movies(rows)
+            self._link(rows, movies)
+            cards.refresh_cards([movie.id for movie in movies])
+            self.board_keys |= leaderboard.add_scores(movies)
+            if movies:
+                querycache.invalidate_model(Movie, Genre, Director, Actor)
+        return [movie.id for movie in movies]
+
+    def _new_movies(self, rows):
+        """Відкидає фільми, що вже є в базі (та сама назва англійською з точністю до регістру й діакритики
+        і рік) чи повторюються в імпорті"""
+        new = []
+        for row in rows:
+            key = (normalize_name(row['movie']['original_name']), row['movie']['year'])
+            if key in self.movies:
+                self.stats['duplicate_movies'] += 1
+                continue
+            self.movies.add(key)
+            new.append(row)
+        return new
+
+    def _create_genres(self, rows):
+        new = {}
+        for row in rows:
+            for name in row['genres']:
+                key = normalize_name(name)
+                if key and key not in self.genres and key not in new:
+                    new[key] = Genre(name=name)
+        Genre.objects.bulk_create(new.values(), batch_size=self.batch_size)
+        self.genres.update((key, genre.id) for key, genre in new.items())
+        self.stats['genres'] += len(new)
+
+    def _create_people(self, model, mapping, people):
+        new = {}
+        for fields in people:
+            key = normalize_name(f"{fields['first_name']} {fields['last_name']}")
+            if key and key not in mapping and key not in new:
+                new[key] = model(**{field: clip(model, field, value) if isinstance(value, str) else value
+                                    for field, value in fields.items()})
+        # bulk_create не викликає save(), тому слаги призначаються пакетно
+        model.objects.bulk_create(assign_slugs(new.values()), batch_size=self.batch_size)
+        mapping.update((key, obj.id) for key, obj in new.items())
+        self.stats[model._meta.model_name + 's'] += len(new)
+
+    def _person_id(self, mapping, fields):
+        return mapping.get(normalize_name(f"{fields['first_name']} {fields['last_name']}"))
+
+    def _create_movies(self, rows):
+        movies = [Movie(director_id=self._person_id(self.directors, row['director']) if row['director'] else None,
+                        **row['movie']) for row in rows]
+        bases = [row['slug'] or base_slug(movie) for row, movie in zip(rows, movies)]
+        movies = Movie.objects.bulk_create(assign_slugs(movies, bases), batch_size=self.batch_size)
+        self.stats['movies'] += len(movies)
+        return movies
+
+    def _link(self, rows, movies):
+        """Прямий запис у проміжні таблиці Movie.genres і Movie.actors"""
+        genre_links = set()
+        actor_links = set()
+        for row, movie in zip(rows, movies):
+            genre_links.update((movie.id, self.genres[normalize_name(name)])
+                               for name in row['genres'] if normalize_name(name))
+            actor_links.update((movie.id, pk) for pk in (self._person_id(self.actors, fields)
+                                                         for fields in row['actors']) if pk)
+        self.board_keys.update(leaderboard.genre_key(genre_id) for _, genre_id in genre_links)
+        Movie.genres.through.objects.bulk_create(
+            [Movie.genres.through(movie_id=m, genre_id=g) for m, g in genre_links], batch_size=self.batch_size)
+        Movie.actors.through.objects.bulk_create(
+            [Movie.actors.through(movie_id=m, actor_id=a) for m, a in actor_links], batch_size=self.batch_size)
+        self.stats['links'] += len(genre_links) + len(actor_links)
+
+    def rebuild_boards(self):
+        if self.board_keys:
+            leaderboard.rebuild_boards(sorted(self.board_keys | {leaderboard.ALL}))
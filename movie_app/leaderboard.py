@@ -0,0 +1,166 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Movie, Genre, Rating, MovieScore, Leaderboard
+
+ALL = 'all'
+MEAN_CACHE_KEY = 'leaderboard:mean'
+
+
+def board_size():
+    return getattr(settings, 'LEADERBOARD_SIZE', 100)
+
+
+def genre_key(genre_id):
+    return f'genre:{genre_id}'
+
+
+def decade_key(year):
+    return f'decade:{year // 10 * 10}'
+
+
+def board_keys(movie, genre_ids=None):
+    """Рейтинги, в які може потрапити фільм"""
+    if genre_ids is None:
+        genre_ids = movie.genres.values_list('id', flat=True)
+    return [ALL, decade_key(movie.year)] + [genre_key(genre_id) for genre_id in genre_ids]
+
+
+def global_mean():
+    """Середня оцінка спільноти; змінюється повільно, тому кешується"""
+    mean = cache.get(MEAN_CACHE_KEY)
+    if mean is None:
+        totals = MovieScore.objects.aggregate(count=Sum('rating_count'), total=Sum('rating_sum'))
+        mean = float(totals['total']) / totals['count'] if totals['count'] else 5.0
+        cache.set(MEAN_CACHE_KEY, mean, 600)
+    return mean
+
+
+def blended_score(rating_imdb, count, total, mean):
+    """IMDB змішаний з байєсівським середнім оцінок спільноти"""
+    min_votes = getattr(settings, 'LEADERBOARD_MIN_VOTES', 5)
+    weight = getattr(settings, 'LEADERBOARD_IMDB_WEIGHT', 0.5)
+    average = float(total) / count if count else mean
+    bayes = (count * average + min_votes * mean) / (count + min_votes)
+    return round(weight * float(rating_imdb) + (1 - weight) * bayes, 4)
+
+
+def board_queryset(key):
+    queryset = MovieScore.objects.all()
+    if key.startswith('genre:'):
+        queryset = queryset.filter(movie__genres=int(key.split(':')[1]))
+    elif key.startswith('decade:'):
+        start = int(key.split(':')[1])
+        queryset = queryset.filter(movie__year__gte=start, movie__year__lt=start + 10)
+    return queryset
+
+
+def rebuild_board(key):
+    """Повний перерахунок одного рейтингу через індекс за балом"""
+    ids = list(board_queryset(key).order_by('-score', 'movie_id').values_list('movie_id', flat=True)[:board_size()])
+    Leaderboard.objects.update_or_create(key=key, defaults={'movie_ids': ids})
+    return ids
+
+
+def refresh_movie(movie_id, genre_ids=None):
+    """Перераховує бал фільму та вставляє його в потрібні рейтинги"""
+    movie = Movie.objects.filter(id=movie_id).first()
+    if movie is None:
+        return
+    score, _ = MovieScore.objects.get_or_create(movie=movie)
+    old = score.score
+    score.score = blended_score(movie.rating_imdb, score.rating_count, score.rating_sum, global_mean())
+    score.save(update_fields=['score'])
+
+    boards = {board.key: board for board in Leaderboard.objects.filter(key__in=board_keys(movie, genre_ids))}
+    for key in board_keys(movie, genre_ids):
+        board = boards.get(key)
+        if board is None:
+            rebuild_board(key)
+        elif movie.id in board.movie_ids and score.score < old:
+            # фільм опустився: його місце може зайняти будь-хто поза списком
+            rebuild_board(key)
+        else:
+            _merge(board, movie.id)
+
+
+def _merge(board, movie_id):
+    """Вставка фільму в наявний список з порівнянням лише з його учасниками"""
+    candidates = set(board.movie_ids) | {movie_id}
+    scores = dict(MovieScore.objects.filter(movie_id__in=candidates).values_list('movie_id', 'score'))
+    ids = sorted(scores, key=lambda pk: (-scores[pk], pk))[:board_size()]
+    if ids != board.movie_ids:
+        board.movie_ids = ids
+        board.save(update_fields=['movie_ids', 'updated'])
+
+
+def apply_rating(movie_id, count_delta, sum_delta, refresh=True):
+    """Інкрементальне оновлення накопичених оцінок після зміни Rating.
+
+    refresh=False лише змінює лічильники; бал і рейтинги тоді перераховує фонове завдання refresh_movie.
+    """
+    with transaction.atomic():
+        MovieScore.objects.get_or_create(movie_id=movie_id)
+        MovieScore.objects.filter(movie_id=movie_id).update(
+            rating_count=F('rating_count') + count_delta,
+            rating_sum=F('rating_sum') + Decimal(str(sum_delta)),
+        )
+        if refresh:
+            refresh_movie(movie_id)
+
+
+def add_scores(movies):
+    """Бали нових фільмів без оцінок для пакетного імпорту; повертає ключі рейтингів десятиліть.
+
+    Самі рейтинги після цього перераховуються через rebuild_boards.
+    """
+    mean = global_mean()
+    MovieScore.objects.bulk_create(
+        [MovieScore(movie_id=movie.id, score=blended_score(movie.rating_imdb, 0, 0, mean)) for movie in movies],
+        batch_size=1000, ignore_conflicts=True)
+    return {decade_key(movie.year) for movie in movies}
+
+
+def rebuild_boards(keys):
+    for key in keys:
+        rebuild_board(key)
+
+
+def rebuild_all():
+    """Повний перерахунок балів і всіх рейтингів"""
+    totals = {row['movie_id']: row for row in
+              Rating.objects.values('movie_id').annotate(count=Count('id'), total=Sum('rating'))}
+    count = sum(row['count'] for row in totals.values())
+    mean = float(sum(row['total'] for row in totals.values())) / count if count else 5.0
+    cache.set(MEAN_CACHE_KEY, mean, 600)
+
+    existing = set(MovieScore.objects.values_list('movie_id', flat=True))
+    scores = []
+    for movie_id, rating_imdb in Movie.objects.values_list('id', 'rating_imdb').iterator():
+        row = totals.get(movie_id, {'count': 0, 'total': 0})
+        scores.append(MovieScore(movie_id=movie_id, rating_count=row['count'], rating_sum=row['total'],
+                                 score=blended_score(rating_imdb, row['count'], row['total'], mean)))
+    with transaction.atomic():
+        MovieScore.objects.bulk_create([s for s in scores if s.movie_id not in existing], batch_size=1000)
+        MovieScore.objects.bulk_update([s for s in scores if s.movie_id in existing],
+                                       ['rating_count', 'rating_sum', 'score'], batch_size=1000)
+        keys = [ALL] + [genre_key(pk) for pk in Genre.objects.values_list('id', flat=True)]
+        keys += [decade_key(year) for year in Movie.objects.values_list('year', flat=True).distinct()]
+        keys = list(dict.fromkeys(keys))
+        for key in keys:
+            rebuild_board(key)
+        Leaderboard.objects.exclude(key__in=keys).delete()
+    return len(scores), len(keys)
+
+
+def top_movies(key=ALL):
+    """Фільми рейтингу в порядку місць: один запит за ключем і один за первинними ключами"""
+    ids = Leaderboard.objects.filter(key=key).values_list('movie_ids', flat=True).first()
+    if ids is None:
+        ids = rebuild_board(key)
+    movies = Movie.objects.select_related('score').in_bulk(ids)
+    return [movies[pk] for pk in ids if pk in movies]
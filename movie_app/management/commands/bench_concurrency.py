@@ -0,0 +1,140 @@
+import json
+import multiprocessing
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+
+from movie_app.management.commands.benchmark import Command as Benchmark
+from movie_app.models import Movie
+from movie_app.service import percentile
+
+READ_URLS = ('movies', 'filter', 'search', 'movie', 'genre', 'actor', 'director')
+
+
+def read_loop(requests, seconds):
+    """Читання по колу до закінчення часу; повертає статуси і латентності"""
+    client = Client(SERVER_NAME='localhost')
+    results = []
+    try:
+        # прогрів: завантаження шаблонів і відкриття з'єднань не входять у вимір
+        for method, url, data in requests:
+            client.get(url, data)
+        deadline = time.perf_counter() + seconds
+        i = 0
+        while time.perf_counter() < deadline:
+            method, url, data = requests[i % len(requests)]
+            i += 1
+            begin = time.perf_counter()
+            status = client.get(url, data).status_code
+            results.append((status, round((time.perf_counter() - begin) * 1000, 3)))
+    finally:
+        connections.close_all()
+    return results
+
+
+def write_loop(request, stop, results):
+    """Постійний запис оцінок; кожна транзакція відкочується, тож база не змінюється"""
+    method, url, data = request
+    client = Client(SERVER_NAME='localhost')
+    n = 0
+    try:
+        while not stop.is_set():
+            n += 1
+            begin = time.perf_counter()
+            with transaction.atomic():
+                status = client.post(url, data, REMOTE_ADDR=f'10.255.{n // 256 % 256}.{n % 256}').status_code
+                transaction.set_rollback(True)
+            results.append((status, round((time.perf_counter() - begin) * 1000, 3)))
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """Пропускна здатність читань залежно від кількості воркерів під час запису"""
+    help = ('Measure read throughput of the list and detail pages with 1..N concurrent workers '
+            'while writer threads keep posting ratings.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,2,4,8', help='Comma separated worker counts.')
+        parser.add_argument('--writers', type=int, default=1)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--mode', choices=['threads', 'processes'], default='processes')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        movie = Movie.objects.order_by('id').first()
+        if movie is None:
+            raise CommandError('The catalog is empty, run generate_catalog first.')
+        samples = Benchmark._samples(movie)
+        reads = [samples[name] for name in READ_URLS if name in samples]
+        try:
+            levels = [int(n) for n in options['workers'].split(',')]
+        except ValueError:
+            raise CommandError('--workers must be a comma separated list of integers.')
+
+        results = []
+        for workers in levels:
+            results.append(self._level(workers, reads, samples['add_rating'], options))
+            self.stderr.write(f'{workers} workers: {results[-1]["throughput_rps"]} req/s')
+        base = results[0]['throughput_rps'] or 1
+        for level in results:
+            level['scaling'] = round(level['throughput_rps'] / base, 2)
+
+        report = {
+            'mode': options['mode'],
+            'writers': options['writers'],
+            'seconds': options['seconds'],
+            'databases': {alias: str(connections[alias].settings_dict['NAME']) for alias in connections},
+            'levels': results,
+        }
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(data)
+        else:
+            self.stdout.write(data)
+
+    @staticmethod
+    def _level(workers, reads, write, options):
+        seconds = options['seconds']
+        # з'єднання не повинні успадковуватись дочірніми процесами
+        connections.close_all()
+        if options['mode'] == 'processes':
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=django.setup)
+            # процеси запускаються до початку виміру
+            for future in [pool.submit(time.sleep, 0) for _ in range(workers)]:
+                future.result()
+        else:
+            pool = ThreadPoolExecutor(workers)
+
+        stop = threading.Event()
+        writes = []
+        writers = [threading.Thread(target=write_loop, args=(write, stop, writes)) for _ in range(options['writers'])]
+        for thread in writers:
+            thread.start()
+        with pool:
+            reads_done = [r for chunk in pool.map(read_loop, [reads] * workers, [seconds] * workers) for r in chunk]
+        stop.set()
+        for thread in writers:
+            thread.join()
+
+        latencies = [latency for _, latency in reads_done]
+        write_latencies = [latency for _, latency in writes]
+        return {
+            'workers': workers,
+            'requests': len(reads_done),
+            'throughput_rps': round(len(reads_done) / seconds, 2),
+            'status': dict(Counter(str(status) for status, _ in reads_done)),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'writes': len(writes),
+            'write_status': dict(Counter(str(status) for status, _ in writes)),
+            'write_p95_ms': percentile(write_latencies, 95),
+        }
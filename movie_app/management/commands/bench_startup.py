@@ -0,0 +1,119 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROFILES = ['personalized_movies.settings', 'personalized_movies.settings_public']
+
+# модулі, про які варто знати, чи потрапили вони в процес під час запуску
+WATCHED_MODULES = ['PIL', 'ckeditor', 'ckeditor_uploader', 'admin_interface', 'colorfield', 'django.contrib.admin',
+                   'cProfile']
+
+# холодний запуск воркера: налаштування, застосунки, WSGI застосунок з middleware і URLconf з views
+STARTUP_SCRIPT = '''
+import json, resource, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import resolve
+resolve('/')
+seconds = time.perf_counter() - started
+with open('/proc/self/statm') as f:
+    rss = int(f.read().split()[1]) * resource.getpagesize() // 1024
+print(json.dumps({
+    'seconds': seconds,
+    'rss_kb': rss,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+    'watched': [name for name in %r if name in sys.modules],
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """Рядки -X importtime: [(власний час, кумулятивний, модуль)], мкс"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(own), int(cumulative), name.strip()))
+    return rows
+
+
+def run_profile(profile):
+    """Один холодний запуск в окремому процесі; повертає результат скрипта і рядки importtime"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=profile)
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT % WATCHED_MODULES],
+                             cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if process.returncode:
+        raise CommandError(f'{profile} failed to start:\n{process.stderr[-2000:]}')
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['wall_seconds'] = wall
+    return result, parse_importtime(process.stderr)
+
+
+class Command(BaseCommand):
+    """Час холодного запуску воркера, пам'ять і найдорожчі імпорти для профілів налаштувань"""
+    help = ('Start a fresh interpreter per settings profile with -X importtime, load the WSGI application and the '
+            'URLconf, and report startup time, resident memory and the packages that take longest to import.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', metavar='settings_module',
+                            help=f'Settings modules to compare (default: {", ".join(PROFILES)}).')
+        parser.add_argument('--repeat', type=int, default=3, help='Cold starts per profile; medians are reported.')
+        parser.add_argument('--top', type=int, default=10, help='Packages to list per profile.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+        parser.add_argument('--record', metavar='PATH',
+                            help='Append the results as one JSON line, to track startup cost over time.')
+
+    def handle(self, *args, **options):
+        report = {}
+        for profile in options['profiles'] or PROFILES:
+            runs = [run_profile(profile) for _ in range(max(options['repeat'], 1))]
+            results = [result for result, _ in runs]
+            # час імпортів за кореневими пакетами з останнього запуску (сума власного часу модулів)
+            packages = defaultdict(int)
+            for own, _, name in runs[-1][1]:
+                packages[name.split('.')[0]] += own
+            report[profile] = {
+                'seconds': statistics.median(result['seconds'] for result in results),
+                'wall_seconds': statistics.median(result['wall_seconds'] for result in results),
+                'rss_mb': statistics.median(result['rss_kb'] for result in results) / 1024,
+                'max_rss_mb': statistics.median(result['max_rss_kb'] for result in results) / 1024,
+                'modules': results[-1]['modules'],
+                'import_ms': sum(own for own, _, _ in runs[-1][1]) / 1000,
+                'watched': results[-1]['watched'],
+                'packages': [[name, round(us / 1000, 1)] for name, us in
+                             sorted(packages.items(), key=lambda item: -item[1])[:options['top']]],
+            }
+        if options['record']:
+            with open(options['record'], 'a') as f:
+                f.write(json.dumps({'time': time.time(), 'results': report}) + '\n')
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for profile, result in report.items():
+            self.stdout.write(self.style.SUCCESS(
+                f'{profile}: {result["seconds"] * 1000:.0f} ms to load the application '
+                f'({result["wall_seconds"] * 1000:.0f} ms with the interpreter), {result["rss_mb"]:.1f} MB RSS '
+                f'(peak {result["max_rss_mb"]:.1f} MB), {result["modules"]} modules, '
+                f'{result["import_ms"]:.0f} ms in imports'))
+            self.stdout.write(f'  loaded: {", ".join(result["watched"]) or "none of " + ", ".join(WATCHED_MODULES)}')
+            for name, ms in result['packages']:
+                self.stdout.write(f'  {ms:>8.1f} ms  {name}')
+        if len(report) > 1:
+            base, *others = report.items()
+            for profile, result in others:
+                self.stdout.write(
+                    f'{profile} vs {base[0]}: {(result["seconds"] - base[1]["seconds"]) * 1000:+.0f} ms, '
+                    f'{result["rss_mb"] - base[1]["rss_mb"]:+.1f} MB, '
+                    f'{result["modules"] - base[1]["modules"]:+d} modules')
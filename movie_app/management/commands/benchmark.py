@@ -0,0 +1,142 @@
+import json
+import platform
+import subprocess
+import time
+from contextlib import ExitStack
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from movie_app import urls as movie_urls
+from movie_app.models import Movie, Actor, Director, Genre
+from movie_app.service import percentile
+
+
+class Command(BaseCommand):
+    """Бенчмарк усіх іменованих URL застосунку"""
+    help = 'Request every named URL of movie_app through the test client and report latency, queries and bytes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', nargs='*', help='Benchmark only these URL names.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        movie = Movie.objects.order_by('id').first()
+        if movie is None:
+            raise CommandError('The catalog is empty, run generate_catalog first.')
+        samples = self._samples(movie)
+
+        client = Client(SERVER_NAME='localhost', REMOTE_ADDR='10.0.0.1')
+        results = {}
+        for pattern in movie_urls.urlpatterns:
+            name = getattr(pattern, 'name', None)
+            if not name or (options['only'] and name not in options['only']):
+                continue
+            if name not in samples:
+                self.stderr.write(f'Skipping {name}: no sample request')
+                continue
+            results[name] = self._run(client, *samples[name], repeat=options['repeat'], warmup=options['warmup'])
+
+        report = {
+            'commit': self._commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'repeat': options['repeat'],
+            'catalog': {
+                'movies': Movie.objects.count(),
+                'actors': Actor.objects.count(),
+                'directors': Director.objects.count(),
+                'genres': Genre.objects.count(),
+            },
+            'results': results,
+        }
+        data = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(data)
+        else:
+            self.stdout.write(data)
+
+    @staticmethod
+    def _samples(movie):
+        """Приклад запиту (метод, url, дані) для кожного імені URL"""
+        actor = movie.actors.first() or Actor.objects.first()
+        director = movie.director or Director.objects.first()
+        genre = movie.genres.first() or Genre.objects.first()
+        samples = {
+            'movies': ('get', reverse('movies'), None),
+            'filter': ('get', reverse('filter'), {'year': movie.year, 'rating_imdb': 4}),
+            'search': ('get', reverse('search'), {'q': movie.name[:3]}),
+            'movie': ('get', reverse('movie', args=[movie.slug]), None),
+            'best_movies': ('get', reverse('best_movies'), None),
+            'trending': ('get', reverse('trending'), None),
+            'trending_api': ('get', reverse('trending_api'), None),
+            'history': ('get', reverse('history'), None),
+            'history_api': ('get', reverse('history_api'), None),
+            'actors': ('get', reverse('actors'), None),
+            'directors': ('get', reverse('directors'), None),
+            'add_rating': ('post', reverse('add_rating', args=[movie.id]),
+                           {'rating': '7.5', 'viewed_date_day': 1, 'viewed_date_month': 1,
+                            'viewed_date_year': 2022}),
+            'add_feedback': ('post', reverse('add_feedback', args=[movie.id]),
+                             {'name': 'Bench', 'surname': 'Bench', 'email': 'bench@example.com',
+                              'feed': 'Benchmark feedback'}),
+        }
+        if genre:
+            samples['genre'] = ('get', reverse('genre', args=[genre.id]), None)
+            samples['filter'][2]['genre'] = genre.id
+        if actor:
+            samples['actor'] = ('get', reverse('actor', args=[actor.slug]), None)
+        if director:
+            samples['director'] = ('get', reverse('director', args=[director.slug]), None)
+        return samples
+
+    @staticmethod
+    def _run(client, method, url, data, repeat, warmup):
+        """Вимірювання одного URL; запити рахуються на всіх з'єднаннях.
+        GET виконуються без транзакції, тож читання йдуть через replica, як у робочому процесі;
+        POST загортаються в транзакцію, яка відкочується після кожного запиту"""
+        timings, queries, sizes, statuses = [], [], [], set()
+        for i in range(warmup + repeat):
+            with ExitStack() as stack:
+                captures = []
+                for conn in connections.all():
+                    # журнал запитів обмежений 9000 записами, тому очищаємо його перед кожним виміром
+                    conn.queries_log.clear()
+                    captures.append(stack.enter_context(CaptureQueriesContext(conn)))
+                if method == 'post':
+                    stack.enter_context(transaction.atomic())
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                elapsed = (time.perf_counter() - started) * 1000
+                if method == 'post':
+                    transaction.set_rollback(True)
+            if i < warmup:
+                continue
+            timings.append(elapsed)
+            queries.append(sum(len(ctx.captured_queries) for ctx in captures))
+            sizes.append(len(response.content))
+            statuses.add(response.status_code)
+        return {
+            'method': method.upper(),
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'queries': max(queries),
+            'bytes': max(sizes),
+        }
+
+    @staticmethod
+    def _commit():
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from movie_app import snapshot
+
+
+class Command(BaseCommand):
+    """Компіляція знімка каталогу для всіх процесів вебсервера"""
+    help = ('Compile movie years, IMDB ratings, genres and slugs into the memory-mapped catalog snapshot '
+            '(CATALOG_SNAPSHOT_PATH). The file is replaced atomically; running workers switch to it on their own.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Write the snapshot here instead of CATALOG_SNAPSHOT_PATH.')
+
+    def handle(self, *args, **options):
+        path = options['path'] or snapshot.snapshot_path()
+        if not path:
+            raise CommandError('CATALOG_SNAPSHOT_PATH is not set.')
+        header = snapshot.build(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot {header["version"]}: {header["movies"]} movies, {len(header["sections"])} sections, '
+            f'{header["bytes"] / 1024:.1f} KB in {header["seconds"]:.2f}s -> {path}'))
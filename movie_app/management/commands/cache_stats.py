@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from movie_app import querycache
+
+
+class Command(BaseCommand):
+    """Частка влучань кешу запитів за метриками всіх процесів"""
+    help = 'Print query cache hits, misses and hit rate per cached query (from METRICS_DIR when it is set).'
+
+    def handle(self, *args, **options):
+        stats = querycache.stats()
+        if not stats:
+            self.stdout.write('No query cache lookups recorded')
+            return
+        self.stdout.write(f'{"cache":<16}{"hits":>10}{"misses":>10}{"hit rate":>10}')
+        for name, (hits, misses) in sorted(stats.items()):
+            self.stdout.write(f'{name:<16}{hits:>10g}{misses:>10g}{hits / (hits + misses):>10.1%}')
+        hits = sum(hits for hits, _ in stats.values())
+        total = hits + sum(misses for _, misses in stats.values())
+        self.stdout.write(self.style.SUCCESS(f'{"total":<16}{hits:>10g}{total - hits:>10g}{hits / total:>10.1%}'))
@@ -0,0 +1,72 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movie_app import dedupe
+from movie_app.models import Movie, Director, Actor
+
+MODELS = {
+    'movie': Movie,
+    'director': Director,
+    'actor': Actor,
+}
+
+
+class Command(BaseCommand):
+    """Пошук ймовірних дублікатів фільмів і людей"""
+    help = ('Find likely duplicate movies, directors and actors by blocked trigram similarity. '
+            'The candidates are cached for the "Possible duplicates" admin filter.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', metavar='model',
+                            help=f'Models to scan: {", ".join(MODELS)} (all by default).')
+        parser.add_argument('--threshold', type=float, help='Minimal similarity, DEDUPE_THRESHOLD by default.')
+        parser.add_argument('--window', type=int, help='Neighbours compared inside a block, DEDUPE_WINDOW by default.')
+        parser.add_argument('--limit', type=int, default=50, help='Pairs to print per model.')
+        parser.add_argument('--json', action='store_true', help='Print all pairs as JSON.')
+        parser.add_argument('--merge', action='store_true',
+                            help='Merge every found pair into the older record. Review the list first.')
+
+    def handle(self, *args, **options):
+        unknown = set(options['models']) - set(MODELS)
+        if unknown:
+            raise CommandError(f'Unknown models: {", ".join(sorted(unknown))}.')
+        report = {}
+        for name in options['models'] or list(MODELS):
+            model = MODELS[name]
+            started = time.perf_counter()
+            candidates = dedupe.store_candidates(
+                model, dedupe.find_duplicates(model, options['threshold'], options['window']))
+            elapsed = time.perf_counter() - started
+            report[name] = [candidate._asdict() for candidate in candidates]
+            if options['json']:
+                continue
+            self.stdout.write(self.style.SUCCESS(f'{name}: {len(candidates)} pairs in {elapsed:.2f}s'))
+            objs = model._default_manager.in_bulk(
+                {pk for candidate in candidates[:options['limit']] for pk in candidate[1:]})
+            for score, keep_id, duplicate_id in candidates[:options['limit']]:
+                self.stdout.write(f'  {score:.3f}  #{keep_id} {objs.get(keep_id)}  <-  #{duplicate_id} '
+                                  f'{objs.get(duplicate_id)}')
+            if options['merge']:
+                self.stdout.write(f'{name}: merged {self._merge(model, candidates)} records')
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+
+    @staticmethod
+    def _merge(model, candidates):
+        """Пари зливаються по черзі; запис, уже злитий в інший, переадресовується на той"""
+        merged_into = {}
+        count = 0
+        for _, keep_id, duplicate_id in candidates:
+            while keep_id in merged_into:
+                keep_id = merged_into[keep_id]
+            while duplicate_id in merged_into:
+                duplicate_id = merged_into[duplicate_id]
+            if keep_id == duplicate_id:
+                continue
+            keep_id, duplicate_id = min(keep_id, duplicate_id), max(keep_id, duplicate_id)
+            objs = model._default_manager.in_bulk([keep_id, duplicate_id])
+            count += dedupe.merge(model, objs[keep_id], [objs[duplicate_id]])
+            merged_into[duplicate_id] = keep_id
+        return count
@@ -0,0 +1,114 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movie_app import cards, leaderboard
+from movie_app.models import Movie, Actor, Director, Genre, Rating, Feedback
+from movie_app.slugs import assign_slugs
+
+
+class Command(BaseCommand):
+    """Генерація синтетичного каталогу для бенчмарків"""
+    help = 'Generate a synthetic catalog (movies, people, genres, ratings, feedback) with bulk inserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', type=int, default=1000)
+        parser.add_argument('--actors', type=int, default=2000)
+        parser.add_argument('--directors', type=int, default=200)
+        parser.add_argument('--genres', type=int, default=20)
+        parser.add_argument('--ratings', type=int, default=20000)
+        parser.add_argument('--ips', type=int, default=500)
+        parser.add_argument('--feedback', type=int, default=2000)
+        parser.add_argument('--actors-per-movie', type=int, default=5)
+        parser.add_argument('--genres-per-movie', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true', help='Delete the existing catalog first.')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        batch = options['batch_size']
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            if options['clear']:
+                for model in (Feedback, Rating, Movie, Actor, Director, Genre):
+                    model.objects.all().delete()
+            # зсув номерів, щоб повторний запуск не дублював назви
+            offset = Movie.objects.count()
+
+            genres = Genre.objects.bulk_create(
+                [Genre(name=f'Genre {offset + i}') for i in range(options['genres'])], batch_size=batch)
+            # bulk_create не викликає save(), тому унікальні слаги призначаються пакетно
+            directors = Director.objects.bulk_create(assign_slugs(
+                [Director(first_name=f'Director{offset + i}', last_name=f'Bench{offset + i}',
+                          director_email=f'director{offset + i}@example.com')
+                 for i in range(options['directors'])]), batch_size=batch)
+            actors = Actor.objects.bulk_create(assign_slugs(
+                [Actor(first_name=f'Actor{offset + i}', last_name=f'Bench{offset + i}',
+                       gender=rnd.choice([Actor.MALE, Actor.FEMALE]))
+                 for i in range(options['actors'])]), batch_size=batch)
+            movies = Movie.objects.bulk_create(assign_slugs(
+                [Movie(name=f'Фільм {offset + i}', original_name=f'Movie {offset + i}',
+                       year=rnd.randint(1950, 2023), length=rnd.randint(70, 200),
+                       description=f'Synthetic movie {offset + i}',
+                       rating_imdb=Decimal(rnd.randint(10, 99)) / 10,
+                       director=rnd.choice(directors) if directors else None)
+                 for i in range(options['movies'])]), batch_size=batch)
+
+            self._link(Movie.genres.through, 'genre_id', movies, genres, options['genres_per_movie'], rnd, batch)
+            self._link(Movie.actors.through, 'actor_id', movies, actors, options['actors_per_movie'], rnd, batch)
+
+            ratings = self._ratings(movies, options['ratings'], options['ips'], rnd)
+            Rating.objects.bulk_create(ratings, batch_size=batch)
+
+            Feedback.objects.bulk_create(
+                [Feedback(email=f'user{i}@example.com', name=f'Name{i % 300}', surname=f'Surname{i % 700}',
+                          feed='Synthetic feedback', movie=rnd.choice(movies))
+                 for i in range(options['feedback'] if movies else 0)], batch_size=batch)
+
+            # bulk_create не надсилає сигналів, тому похідні таблиці оновлюються окремо
+            cards.refresh_cards([movie.id for movie in movies])
+            leaderboard.rebuild_all()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(movies)} movies, {len(actors)} actors, {len(directors)} directors, '
+            f'{len(genres)} genres, {len(ratings)} ratings in {time.perf_counter() - started:.2f}s'))
+
+    @staticmethod
+    def _link(through, target_field, movies, targets, per_movie, rnd, batch):
+        """Пакетний запис у проміжну M2M таблицю"""
+        if not targets:
+            return
+        rows = []
+        for movie in movies:
+            for target in rnd.sample(targets, min(per_movie, len(targets))):
+                rows.append(through(movie_id=movie.id, **{target_field: target.id}))
+                if len(rows) >= batch:
+                    through.objects.bulk_create(rows)
+                    rows = []
+        through.objects.bulk_create(rows)
+
+    @staticmethod
+    def _ratings(movies, count, ips, rnd):
+        """Оцінки без повторів пари (ip, фільм)"""
+        if not movies or not ips:
+            return []
+        count = min(count, len(movies) * ips)
+        today = date.today()
+        seen = set()
+        ratings = []
+        while len(ratings) < count:
+            n = rnd.randrange(ips)
+            ip = f'10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}'
+            movie = rnd.choice(movies)
+            if (ip, movie.id) in seen:
+                continue
+            seen.add((ip, movie.id))
+            ratings.append(Rating(ip=ip, movie_id=movie.id, rating=Decimal(rnd.randint(0, 100)) / 10,
+                                  viewed_date=today - timedelta(days=rnd.randint(0, 1500))))
+        return ratings
@@ -0,0 +1,102 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movie_app import snapshot
+from movie_app.importer import CatalogImporter, RecordReader
+from movie_app.slugs import resolver
+
+
+class Command(BaseCommand):
+    """Потоковий імпорт каталогу з дампу CSV або JSONL"""
+    help = ('Import movies with their genres, director and actors from a CSV or JSONL dump (optionally gzipped). '
+            'Each batch is committed separately and recorded in a checkpoint file, so an interrupted import '
+            'resumes where it stopped. Rejected records are written to an error report.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Detected from the file name by default.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--checkpoint', help='Checkpoint file, <path>.checkpoint by default.')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint.')
+        parser.add_argument('--errors', help='Report of rejected records (JSONL), <path>.errors.jsonl by default.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist.')
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        errors_path = options['errors'] or f'{path}.errors.jsonl'
+        source = {'path': os.path.abspath(path), 'size': os.path.getsize(path)}
+        importer = CatalogImporter(options['batch_size'])
+        done = offset = 0
+        if os.path.exists(checkpoint_path) and not options['restart']:
+            with open(checkpoint_path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if checkpoint['source'] != source:
+                raise CommandError(f'{checkpoint_path} belongs to another file, use --restart to ignore it.')
+            done, offset = checkpoint['records'], checkpoint.get('offset', 0)
+            # рейтинги кращих, зачеплені до перерваного запуску, перебудовуються наприкінці разом з новими
+            importer.board_keys.update(checkpoint.get('board_keys', []))
+            self.stderr.write(f'Resuming after {done} records')
+        elif os.path.exists(errors_path):
+            os.remove(errors_path)
+
+        started = time.perf_counter()
+        importer.load_maps()
+        with RecordReader(path, options['format'], offset) as reader:
+            records = iter(reader)
+            try:
+                while True:
+                    batch = list(islice(records, options['batch_size']))
+                    if not batch:
+                        break
+                    importer.import_batch(batch)
+                    self._report_errors(errors_path, done, importer.errors)
+                    done += len(batch)
+                    # позначка пишеться лише після фіксації пакета
+                    self._save_checkpoint(checkpoint_path, {
+                        'source': source, 'records': done, 'offset': reader.tell(),
+                        'board_keys': sorted(importer.board_keys)})
+                    if options['verbosity'] > 1:
+                        self.stderr.write(f'{done} records, {importer.stats["movies"]} movies, '
+                                          f'{time.perf_counter() - started:.1f}s')
+            except (json.JSONDecodeError, csv.Error, UnicodeDecodeError) as e:
+                raise CommandError(f'Cannot read record {done + 1}: {e}')
+
+        # bulk_create не надсилає сигналів: бали і картки пишуться пакетами, рейтинги кращих - наприкінці
+        importer.rebuild_boards()
+        resolver.clear()
+        snapshot.schedule_build()
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        elapsed = time.perf_counter() - started
+        stats = importer.stats
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["movies"]} movies, {stats["genres"]} genres, {stats["directors"]} directors, '
+            f'{stats["actors"]} actors, {stats["links"]} links in {elapsed:.2f}s '
+            f'({stats["duplicate_movies"]} duplicate, {stats["invalid"]} invalid records skipped)'))
+        if stats['invalid']:
+            self.stdout.write(f'Rejected records are listed in {errors_path}')
+
+    @staticmethod
+    def _report_errors(path, done, errors):
+        """Відхилені записи з номером у файлі і причиною дописуються до звіту"""
+        if not errors:
+            return
+        with open(path, 'a', encoding='utf-8') as f:
+            for number, error, record in errors:
+                f.write(json.dumps({'record': done + number + 1, 'error': error, 'data': record},
+                                   ensure_ascii=False, default=str) + '\n')
+
+    @staticmethod
+    def _save_checkpoint(path, data):
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
@@ -0,0 +1,62 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from movie_app import tasks
+from movie_app.media import iter_files
+from movie_app.models import UploadedImage
+from movie_app.uploads import content_hash, get_storage
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'}
+
+
+class Command(BaseCommand):
+    """Заповнення маніфесту файлами, завантаженими до появи UploadedImage"""
+    help = 'Add files already in CKEDITOR_UPLOAD_PATH to the upload manifest and queue their thumbnails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        storage = get_storage()
+        root = storage.path(settings.CKEDITOR_UPLOAD_PATH)
+        known = set(UploadedImage.objects.values_list('path', flat=True))
+        known.update(UploadedImage.objects.exclude(thumbnail='').values_list('thumbnail', flat=True))
+        batch, added, skipped = [], 0, 0
+        for entry in iter_files(root):
+            path = os.path.relpath(entry.path, storage.path('')).replace(os.sep, '/')
+            stem, extension = os.path.splitext(entry.name)
+            if path in known or stem.endswith('_thumb'):
+                continue
+            with open(entry.path, 'rb') as f:
+                digest = content_hash(f)
+            batch.append(UploadedImage(path=path, original_name=entry.name, sha256=digest,
+                                       size=entry.stat().st_size, is_image=extension.lower() in IMAGE_EXTENSIONS))
+            if len(batch) >= options['batch_size']:
+                added_now = self._save(batch)
+                added, skipped = added + added_now, skipped + len(batch) - added_now
+                batch = []
+        added_now = self._save(batch)
+        added, skipped = added + added_now, skipped + len(batch) - added_now
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {added} files ({skipped} with duplicate content skipped) in {time.perf_counter() - started:.2f}s'))
+
+    @staticmethod
+    def _save(batch):
+        """Файли з уже відомим вмістом пропускаються; для нових зображень ставляться мініатюри"""
+        if not batch:
+            return 0
+        taken = set(UploadedImage.objects.filter(sha256__in=[image.sha256 for image in batch])
+                    .values_list('sha256', flat=True))
+        new = {}
+        for image in batch:
+            if image.sha256 not in taken:
+                new.setdefault(image.sha256, image)
+        UploadedImage.objects.bulk_create(new.values())
+        for image in new.values():
+            if image.is_image:
+                tasks.make_thumbnail.enqueue(image.pk)
+        return len(new)
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movie_app.cards import rebuild_all
+
+
+class Command(BaseCommand):
+    """Перебудова карток фільмів для списків"""
+    help = 'Rebuild the denormalized movie cards used by list pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_all(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} cards in {time.perf_counter() - started:.2f}s'))
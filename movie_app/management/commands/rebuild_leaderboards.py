@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movie_app.leaderboard import rebuild_all
+
+
+class Command(BaseCommand):
+    """Повний перерахунок балів і рейтингів кращих фільмів"""
+    help = 'Recompute community scores for every movie and rebuild all leaderboards.'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        movies, boards = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {movies} movies and rebuilt {boards} leaderboards in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movie_app import trending
+
+
+class Command(BaseCommand):
+    """Перерахунок популярності з дат переглядів у оцінках"""
+    help = ('Rebuild trending buckets and scores from Rating.viewed_date within the retention window. '
+            'Page view counters are reset.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        buckets, movies = trending.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {buckets} day buckets for {movies} movies in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from movie_app import cards, querycache, snapshot
+from movie_app.models import Movie, Director, Actor
+from movie_app.slugs import base_slug, dedupe, resolver, write_slugs
+
+# моделі та поля, з яких будуються їхні слаги
+MODELS = {
+    'movie': (Movie, ['original_name']),
+    'director': (Director, ['first_name', 'last_name']),
+    'actor': (Actor, ['first_name', 'last_name']),
+}
+
+
+class Command(BaseCommand):
+    """Виправлення порожніх і повторених слагів цілої таблиці; з --force - перегенерація всіх"""
+    help = ('Give rows with an empty or duplicate slug a unique slug built from their source fields, with '
+            'bulk_update. Existing slugs, including ones edited by hand, are kept unless --force is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', metavar='model',
+                            help=f'Models to process: {", ".join(MODELS)} (all by default).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many slugs would change.')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild every slug from its source fields, replacing hand-edited ones '
+                                 '(their old URLs stop working).')
+
+    def handle(self, *args, **options):
+        unknown = set(options['models']) - set(MODELS)
+        if unknown:
+            raise CommandError(f'Unknown models: {", ".join(sorted(unknown))}.')
+        for name in options['models'] or list(MODELS):
+            model, fields = MODELS[name]
+            started = time.perf_counter()
+            objs = list(model.objects.only('pk', 'slug', *fields).order_by('pk')
+                        .iterator(chunk_size=options['batch_size']))
+            if options['force']:
+                slugs = dedupe([(obj.pk, base_slug(obj)) for obj in objs], set())
+            else:
+                # наявні слаги резервуються першими, тож суфікс отримують лише порожні й повторені
+                objs.sort(key=lambda obj: (not obj.slug, obj.pk))
+                slugs = dedupe([(obj.pk, obj.slug or base_slug(obj)) for obj in objs], set())
+            changed = [obj for obj in objs if obj.slug != slugs[obj.pk]]
+            if not options['dry_run'] and changed:
+                for obj in changed:
+                    obj.slug = slugs[obj.pk]
+                with transaction.atomic():
+                    write_slugs(model, changed, options['batch_size'])
+                    querycache.invalidate_model(model)
+                    snapshot.schedule_build()
+                    if model is Movie:
+                        # адреси фільмів зберігаються в картках
+                        cards.refresh_cards([obj.pk for obj in changed], options['batch_size'])
+                resolver.clear()
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: {len(changed)} of {len(objs)} slugs {"would change" if options["dry_run"] else "changed"} '
+                f'in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,181 @@
+import gzip
+import io
+import json
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from movie_app.service import percentile, histogram
+
+LATENCY_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+class ReplayHandler(WSGIHandler):
+    """WSGI застосунок без перевірки CSRF для відтворених POST запитів"""
+
+    def get_response(self, request):
+        request._dont_enforce_csrf_checks = True
+        request.replayed = True
+        return super().get_response(request)
+
+
+def read_log(path, limit=None):
+    """Записи логу доступу по порядку"""
+    opener = gzip.open if path.endswith('.gz') else open
+    entries = []
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+                if limit and len(entries) >= limit:
+                    break
+    return entries
+
+
+def build_environ(entry, host):
+    """WSGI environ для запису логу"""
+    body = urlencode(entry.get('b', {}), doseq=True).encode() if entry['m'] == 'POST' else b''
+    return {
+        'REQUEST_METHOD': entry['m'],
+        'PATH_INFO': entry['p'],
+        'QUERY_STRING': entry.get('q', ''),
+        'REMOTE_ADDR': entry.get('ip') or '127.0.0.1',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def replay(app, entry, host, origin, started, speed):
+    """Один запит; повертає (статус, латентність у мс)"""
+    if speed:
+        delay = started + (entry['t'] - origin) / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    status = []
+    begin = time.perf_counter()
+    result = app(build_environ(entry, host), lambda s, headers, exc_info=None: status.append(s))
+    try:
+        for _ in result:
+            pass
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return int(status[0].split()[0]), (time.perf_counter() - begin) * 1000
+
+
+def replay_chunk(entries, host, origin, started, speed):
+    """Послідовне відтворення частини логу в окремому процесі"""
+    app = ReplayHandler()
+    try:
+        return [replay(app, entry, host, origin, started, speed) for entry in entries]
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """Відтворення записаного логу доступу"""
+    help = ('Replay a log recorded by AccessLogMiddleware against the WSGI app in-process '
+            'and report throughput and latency. POST entries write to the configured database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('log')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--mode', choices=['threads', 'processes'], default='threads')
+        parser.add_argument('--speed', type=float, default=0,
+                            help='Keep recorded pacing scaled by this factor; 0 replays as fast as possible.')
+        parser.add_argument('--limit', type=int)
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            entries = read_log(options['log'], options['limit'])
+        except OSError as e:
+            raise CommandError(e)
+        if not entries:
+            raise CommandError('The log is empty.')
+        origin = entries[0]['t']
+        workers = max(1, options['concurrency'])
+
+        started = time.perf_counter()
+        if options['mode'] == 'processes':
+            results = self._processes(entries, workers, options['host'], origin, started, options['speed'])
+        else:
+            results = self._threads(entries, workers, options['host'], origin, started, options['speed'])
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for _, latency in results]
+        report = {
+            'requests': len(results),
+            'mode': options['mode'],
+            'concurrency': workers,
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(len(results) / elapsed, 2),
+            'status': dict(Counter(str(status) for status, _ in results)),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'histogram_ms': histogram(latencies, LATENCY_BUCKETS),
+        }
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(data)
+        else:
+            self.stdout.write(data)
+
+    @staticmethod
+    def _threads(entries, workers, host, origin, started, speed):
+        app = ReplayHandler()
+        pending = queue.SimpleQueue()
+        for entry in entries:
+            pending.put(entry)
+        results = []
+        lock = threading.Lock()
+
+        def work():
+            try:
+                while True:
+                    try:
+                        entry = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    result = replay(app, entry, host, origin, started, speed)
+                    with lock:
+                        results.append(result)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(workers) as pool:
+            for future in [pool.submit(work) for _ in range(workers)]:
+                future.result()
+        return results
+
+    @staticmethod
+    def _processes(entries, workers, host, origin, started, speed):
+        # з'єднання не повинні успадковуватись дочірніми процесами
+        connections.close_all()
+        chunks = [entries[i::workers] for i in range(workers)]
+        results = []
+        with ProcessPoolExecutor(workers) as pool:
+            for chunk in pool.map(replay_chunk, chunks, [host] * workers, [origin] * workers,
+                                  [started] * workers, [speed] * workers):
+                results.extend(chunk)
+        return results
@@ -0,0 +1,56 @@
+import multiprocessing
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from movie_app import taskqueue
+from movie_app.models import Task
+
+
+class Command(BaseCommand):
+    """Воркер фонових завдань з черги в базі даних"""
+    help = 'Run queued background tasks with a pool of worker threads or processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--mode', choices=['threads', 'processes'], default='threads')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--max-tasks', type=int, help='Tasks per worker before it exits.')
+        parser.add_argument('--name', action='append', dest='names', help='Only run tasks with this name.')
+
+    def handle(self, *args, **options):
+        kwargs = {'once': options['once'], 'poll': options['poll'], 'names': options['names'],
+                  'max_tasks': options['max_tasks']}
+        workers = max(options['workers'], 1)
+        pending = Task.objects.filter(status=Task.PENDING).count()
+        self.stderr.write(f'{pending} pending tasks, starting {workers} {options["mode"]}')
+        # з'єднання не повинні успадковуватись дочірніми процесами
+        connections.close_all()
+        stop = threading.Event()
+        if options['mode'] == 'processes':
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=django.setup)
+            futures = [pool.submit(taskqueue.work, **kwargs) for _ in range(workers)]
+        else:
+            pool = ThreadPoolExecutor(workers)
+            futures = [pool.submit(taskqueue.work, stop=stop, **kwargs) for _ in range(workers)]
+        totals = Counter()
+        try:
+            for future in futures:
+                totals.update(future.result())
+        except KeyboardInterrupt:
+            # потоки завершують поточне завдання; процеси зупиняє сам Ctrl+C
+            stop.set()
+            for future in futures:
+                if not future.cancelled():
+                    totals.update(future.result())
+        finally:
+            pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            'Ran ' + ', '.join(f'{count} {status}' for status, count in sorted(totals.items()))
+            if totals else 'No tasks were run'))
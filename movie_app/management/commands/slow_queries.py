@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movie_app.slowlog import aggregate, log_path, read_entries
+
+
+class Command(BaseCommand):
+    """Звіт про найповільніші запити з журналу SLOW_QUERY_LOG"""
+    help = 'Aggregate the slow query log by SQL fingerprint and print the top N entries with their query plans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Defaults to settings.SLOW_QUERY_LOG.')
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--sort', choices=['total', 'max', 'avg', 'count'], default='total')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        path = options['log'] or log_path()
+        if not path:
+            raise CommandError('SLOW_QUERY_LOG is not configured.')
+        try:
+            report = aggregate(read_entries(path))
+        except FileNotFoundError:
+            raise CommandError(f'{path} does not exist yet.')
+
+        key = {'total': 'total_ms', 'max': 'max_ms', 'avg': 'avg_ms', 'count': 'count'}[options['sort']]
+        report = sorted(report, key=lambda item: item[key], reverse=True)[:options['top']]
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+            return
+
+        for i, item in enumerate(report, 1):
+            views = ', '.join(f'{view} ({count})' for view, count in
+                              sorted(item['views'].items(), key=lambda v: v[1], reverse=True))
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{i}. [{item["fingerprint"]}] count={item["count"]} total={item["total_ms"]:.1f}ms '
+                f'avg={item["avg_ms"]:.1f}ms max={item["max_ms"]:.1f}ms'))
+            self.stdout.write(f'   views: {views}')
+            self.stdout.write(f'   {item["sql"]}')
+            for row in item['plan'] or []:
+                self.stdout.write(f'   plan: {row}')
@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from movie_app import media
+
+
+class Command(BaseCommand):
+    """Пошук і прибирання файлів медіа, на які не посилається жоден запис"""
+    help = ('Find media files not referenced by a file field of any model (movie posters, admin theme logos...) '
+            'or by images and links in movie descriptions. '
+            'Only reports them unless --delete or --move-to is given.')
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--delete', action='store_true', help='Delete orphaned files.')
+        action.add_argument('--move-to', metavar='DIR', help='Move orphaned files to this directory.')
+        parser.add_argument('--min-age', type=float, default=24,
+                            help='Hours since the last change before a file may be swept (default 24).')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--list', action='store_true', help='Print every orphaned file.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        move_to = options['move_to'] and os.path.abspath(options['move_to'])
+        if move_to == os.path.abspath(settings.MEDIA_ROOT):
+            raise CommandError('--move-to must not be MEDIA_ROOT itself.')
+        referenced = media.referenced_paths(options['batch_size'])
+        self.stderr.write(f'{len(referenced)} referenced files')
+        apply = options['delete'] or move_to
+        batch, count, size = [], 0, 0
+        for path, file_size in media.find_orphans(referenced, options['min_age'] * 3600, exclude=[move_to or '']):
+            count += 1
+            size += file_size
+            if options['list']:
+                self.stdout.write(path)
+            if apply:
+                batch.append(path)
+                if len(batch) >= options['batch_size']:
+                    media.remove_orphans(batch, move_to)
+                    batch = []
+        if apply and batch:
+            media.remove_orphans(batch, move_to)
+        verb = 'Moved' if move_to else 'Deleted' if options['delete'] else 'Found'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {count} orphaned files ({size / 1024 / 1024:.1f} MB) in {time.perf_counter() - started:.2f}s'))
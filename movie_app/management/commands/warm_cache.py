@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movie_app import warmup
+
+
+class Command(BaseCommand):
+    """Прогрів кешів і індексів після розгортання"""
+    help = ('Warm the query cache, movie cards, leaderboards and the pages requested most often in the recent '
+            'access log. Caches are per process unless QUERY_CACHE_ALIAS points at a shared backend; '
+            'set WARMUP_ON_START to warm every web process as well.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, help='Most requested pages to load, WARMUP_PAGES by default.')
+        parser.add_argument('--log-bytes', type=int, help='Tail of the access log to rank pages by.')
+        parser.add_argument('--host', help='Host header of the warm-up requests.')
+        parser.add_argument('--list', action='store_true', help='Only print the ranked pages.')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for (path, query), count in warmup.ranked_paths(
+                    options['pages'] or 200, options['log_bytes'] or 4 * 1024 * 1024):
+                self.stdout.write(f'{count:>8g}  {path}{"?" + query if query else ""}')
+            return
+        started = time.perf_counter()
+        for step, count, seconds in warmup.warm(options['pages'], options['log_bytes'], options['host']):
+            self.stdout.write(f'{step:<40}{count:>8}{seconds:>9.2f}s')
+        self.stdout.write(self.style.SUCCESS(f'Warmed in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,125 @@
+import os
+import shutil
+import time
+from html.parser import HTMLParser
+from urllib.parse import unquote, urlsplit
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+
+from .models import Movie, UploadedImage
+
+
+def iter_files(directory, exclude=()):
+    """Потоковий обхід дерева каталогів через os.scandir; exclude - абсолютні шляхи каталогів, що пропускаються"""
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            if entry.path not in exclude:
+                yield from iter_files(entry.path, exclude)
+        elif entry.is_file(follow_symlinks=False):
+            yield entry
+
+
+def media_path(url):
+    """Шлях файлу відносно MEDIA_ROOT за посиланням з опису; None для сторонніх адрес"""
+    parts = urlsplit(url.strip())
+    if parts.scheme not in ('', 'http', 'https') or not parts.path:
+        return None
+    path = unquote(parts.path).lstrip('/')
+    prefix = urlsplit(settings.MEDIA_URL or '').path.strip('/')
+    if prefix:
+        if not path.startswith(prefix + '/'):
+            return None
+        path = path[len(prefix) + 1:]
+    return os.path.normpath(path).replace(os.sep, '/')
+
+
+class ReferenceParser(HTMLParser):
+    """Збирає src і href з HTML опису фільму"""
+    ATTRIBUTES = {'src', 'href', 'data-src'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if name in self.ATTRIBUTES and value:
+                self.urls.append(value)
+            elif name == 'srcset' and value:
+                self.urls.extend(candidate.split()[0] for candidate in value.split(',') if candidate.strip())
+
+    handle_startendtag = handle_starttag
+
+
+def description_paths(html):
+    parser = ReferenceParser()
+    parser.feed(html or '')
+    parser.close()
+    return {path for path in map(media_path, parser.urls) if path}
+
+
+def file_fields():
+    """Поля файлів усіх встановлених моделей, разом зі сторонніми застосунками (логотип і значок теми адмінки)"""
+    return [(model, field.name) for model in apps.get_models() if not model._meta.proxy
+            for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+
+
+def referenced_paths(chunk_size=2000):
+    """Шляхи файлів, на які посилаються поля файлів будь-яких моделей і описи фільмів; рядки читаються порціями"""
+    referenced = set()
+    for model, field in file_fields():
+        values = model._default_manager.values_list(field, flat=True).order_by()
+        referenced.update(path for path in values.iterator(chunk_size=chunk_size) if path)
+    descriptions = Movie.objects.values_list('description', flat=True).order_by()
+    for description in descriptions.iterator(chunk_size=chunk_size):
+        if description and ('src' in description or 'href' in description):
+            referenced |= description_paths(description)
+    # мініатюри потрібні, поки потрібен оригінал
+    for path, thumbnail in UploadedImage.objects.exclude(thumbnail='').values_list('path', 'thumbnail').iterator(
+            chunk_size=chunk_size):
+        if path in referenced:
+            referenced.add(thumbnail)
+    return referenced
+
+
+def find_orphans(referenced, min_age=0, exclude=()):
+    """Файли медіа, на які ніщо не посилається і які не змінювались min_age секунд (щойно завантажені
+    в ще не збережений опис не чіпаються)"""
+    root = os.path.abspath(settings.MEDIA_ROOT)
+    limit = time.time() - min_age
+    for entry in iter_files(root, {os.path.abspath(path) for path in exclude}):
+        path = os.path.relpath(entry.path, root).replace(os.sep, '/')
+        if path not in referenced:
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime <= limit:
+                yield path, stat.st_size
+
+
+def remove_orphans(paths, move_to=None):
+    """Видаляє або переносить у move_to зі збереженням структури каталогів; записи маніфесту видаляються разом
+    з файлами. Повертає кількість оброблених файлів"""
+    root = os.path.abspath(settings.MEDIA_ROOT)
+    done = []
+    for path in paths:
+        source = os.path.join(root, path)
+        try:
+            if move_to:
+                target = os.path.join(move_to, path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(source, target)
+            else:
+                os.remove(source)
+        except FileNotFoundError:
+            pass
+        done.append(path)
+    UploadedImage.objects.filter(path__in=done).delete()
+    UploadedImage.objects.filter(thumbnail__in=done).update(thumbnail='')
+    return len(done)
@@ -0,0 +1,215 @@
+import fcntl
+import hmac
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'http_requests_total': ('counter', 'Requests by URL name, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by URL name.'),
+    'db_queries_total': ('counter', 'Database queries by URL name.'),
+    'db_query_seconds_total': ('counter', 'Time spent in database queries by URL name.'),
+    'cache_requests_total': ('counter', 'Query cache lookups by cache name and result (hit or miss).'),
+    'rating_writes_total': ('counter', 'Ratings saved through AddRating.'),
+    'feedback_submissions_total': ('counter', 'Feedback saved through AddFeedback.'),
+    'media_bytes_served_total': ('counter', 'Bytes of media files served.'),
+    'tasks_enqueued_total': ('counter', 'Background tasks queued by task name.'),
+    'tasks_total': ('counter', 'Background tasks run by task name and resulting status.'),
+    'task_duration_seconds': ('histogram', 'Background task run time by task name.'),
+}
+
+
+class Registry:
+    """Лічильники та гістограми процесу зі скиданням у файл для агрегації між процесами"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed = 0
+        self.pid = None
+        self.token = None
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            buckets, total, count = self.histograms.get(key, ([0] * len(LATENCY_BUCKETS), 0, 0))
+            buckets = list(buckets)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    buckets[i] += 1
+            self.histograms[key] = (buckets, total + value, count + 1)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), *data] for (name, labels), data in self.histograms.items()],
+            }
+
+    def filename(self):
+        """<pid>-<токен>.json: новий процес з тим самим pid не перезапише файл попереднього"""
+        if self.pid != os.getpid():
+            # після fork у дочірньому процесі - власний файл
+            self.pid, self.token = os.getpid(), os.urandom(6).hex()
+        return f'{self.pid}-{self.token}.json'
+
+    def flush(self, force=False):
+        """Атомарно записує знімок процесу у METRICS_DIR/<pid>-<токен>.json"""
+        directory = metrics_dir()
+        now = time.monotonic()
+        if not directory or (not force and now - self.flushed < getattr(settings, 'METRICS_FLUSH_INTERVAL', 1)):
+            return
+        self.flushed = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.filename())
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+
+registry = Registry()
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+# знімки завершених процесів, злиті в один файл, щоб лічильники не зменшувалися
+RETIRED = 'retired.json'
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # процес є, але належить іншому користувачу
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(snapshots):
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            old_buckets, old_total, old_count = histograms.get(key, ([0] * len(LATENCY_BUCKETS), 0, 0))
+            histograms[key] = ([a + b for a, b in zip(old_buckets, buckets)], old_total + total, old_count + count)
+    return counters, histograms
+
+
+def _write(path, counters, histograms):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), *data] for (name, labels), data in histograms.items()],
+        }, f)
+    os.replace(tmp, path)
+
+
+def read_snapshots(directory):
+    """Знімки всіх процесів; файли процесів, яких уже немає, зливаються в RETIRED і видаляються.
+    Усе під блокуванням каталогу, щоб інший збирач не побачив знімок ні двічі, ні жодного разу"""
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired_path = os.path.join(directory, RETIRED)
+        live, dead = [], []
+        for entry in os.scandir(directory):
+            if not entry.name.endswith('.json') or entry.name == RETIRED:
+                continue
+            pid = entry.name.split('-')[0].split('.')[0]
+            (live if not pid.isdigit() or pid_alive(int(pid)) else dead).append(entry.path)
+        retired = _read(retired_path)
+        if dead:
+            snapshots = [retired] if retired else []
+            snapshots += filter(None, map(_read, dead))
+            _write(retired_path, *_merge(snapshots))
+            for path in dead:
+                os.remove(path)
+            retired = _read(retired_path)
+        return ([retired] if retired else []) + list(filter(None, map(_read, live)))
+
+
+def collect():
+    """Сума знімків усіх процесів (або лише поточного, якщо METRICS_DIR не задано)"""
+    directory = metrics_dir()
+    if directory:
+        registry.flush(force=True)
+        snapshots = read_snapshots(directory)
+    else:
+        snapshots = [registry.snapshot()]
+    return _merge(snapshots)
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render_metrics():
+    """Текстовий формат експозиції Prometheus"""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, text) in HELP.items():
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            series = sorted((k, v) for k, v in counters.items() if k[0] == name)
+            if not series and not any(k[0] == name for k in histograms):
+                lines.append(f'{name} 0')
+            for (_, labels), value in series:
+                lines.append(f'{name}{_labels(labels)} {value:g}')
+        else:
+            for (_, labels), (buckets, total, count) in sorted(i for i in histograms.items() if i[0][0] == name):
+                for bound, value in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f'{name}_bucket{_labels(labels, le=bound)} {value}')
+                lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {count}')
+                lines.append(f'{name}_sum{_labels(labels)} {total:g}')
+                lines.append(f'{name}_count{_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_allowed(request):
+    """Доступ до /metrics: з адрес METRICS_ALLOWED_IPS або із заголовком Authorization: Bearer METRICS_TOKEN.
+    Береться REMOTE_ADDR, а не X-Forwarded-For, який клієнт може підставити сам"""
+    if request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ()):
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode())
+
+
+def metrics_view(request):
+    """Ендпоінт /metrics"""
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
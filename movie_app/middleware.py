@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import NoReverseMatch, reverse
+from django.views.static import serve
+
+from .db import use_writer
+from .metrics import registry
+from .profiling import profiling_requested, profile_call
+from .service import get_client_ip
+from .slowlog import SlowQueryLogger
+
+# для цих URL записується ще й тіло форми
+RECORDED_FORMS = ('add_rating', 'add_feedback')
+
+
+class AccessLogMiddleware:
+    """Запис послідовності запитів у компактний JSONL лог для подальшого відтворення"""
+    lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.path = getattr(settings, 'ACCESS_LOG_PATH', None)
+
+    def __call__(self, request):
+        if not self.path or getattr(request, 'replayed', False):
+            return self.get_response(request)
+        started = time.time()
+        response = self.get_response(request)
+        entry = {
+            't': round(started, 3),
+            'm': request.method,
+            'p': request.path,
+            'ip': get_client_ip(request),
+        }
+        if request.META.get('QUERY_STRING'):
+            entry['q'] = request.META['QUERY_STRING']
+        match = request.resolver_match
+        if request.method == 'POST' and match and match.url_name in RECORDED_FORMS:
+            entry['b'] = {key: values for key, values in request.POST.lists() if key != 'csrfmiddlewaretoken'}
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+        # один write в O_APPEND файл не перемішується між потоками та процесами
+        with self.lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+        return response
+
+
+class ProfilingMiddleware:
+    """Профілювання окремого запиту на вимогу (view та рендер шаблону)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if profiling_requested(request):
+            response = profile_call(request, self.get_response)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+
+class MetricsMiddleware:
+    """Латентність, запити до БД та байти медіа для ендпоінта /metrics"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = {'count': 0, 'seconds': 0.0}
+
+        def count_queries(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries['count'] += 1
+                queries['seconds'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        media = match is not None and match.func is serve
+        view = 'media' if media else (match.url_name or match.view_name) if match else 'unresolved'
+        registry.inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+        registry.observe('http_request_duration_seconds', elapsed, view=view)
+        registry.inc('db_queries_total', queries['count'], view=view)
+        registry.inc('db_query_seconds_total', queries['seconds'], view=view)
+        if media and response.has_header('Content-Length'):
+            registry.inc('media_bytes_served_total', int(response['Content-Length']))
+        registry.flush()
+        return response
+
+
+class SlowQueryMiddleware:
+    """Журнал повільних запитів до БД з назвою view, що їх виконав"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.slow_query_logger = SlowQueryLogger('unresolved')
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(request.slow_query_logger))
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # view стає відомим лише після розбору URL
+        request.slow_query_logger.view = request.resolver_match.view_name
+
+
+class WriterRoutingMiddleware:
+    """Запити, що змінюють дані, і адмінка читають з основного з'єднання, решта - з replica"""
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.admin_prefix = None
+
+    def __call__(self, request):
+        if self.admin_prefix is None:
+            try:
+                self.admin_prefix = reverse('admin:index')
+            except NoReverseMatch:
+                # профіль без адмінки (settings_public)
+                self.admin_prefix = ''
+        in_admin = bool(self.admin_prefix) and request.path.startswith(self.admin_prefix)
+        if request.method in self.safe_methods and not in_admin:
+            return self.get_response(request)
+        with use_writer():
+            return self.get_response(request)
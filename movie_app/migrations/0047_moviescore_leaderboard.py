@@ -0,0 +1,45 @@
+# Generated by Django 4.1.4 on 2026-10-19 12:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0046_alter_actor_options_alter_director_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Leaderboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True, verbose_name='Ключ')),
+                ('movie_ids', models.JSONField(default=list, verbose_name='Фільми')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Оновлено')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг кращих',
+                'verbose_name_plural': 'Рейтинги кращих',
+            },
+        ),
+        migrations.CreateModel(
+            name='MovieScore',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='movie_app.movie', verbose_name='Фільм')),
+                ('rating_count', models.PositiveIntegerField(default=0, verbose_name='Кількість оцінок')),
+                ('rating_sum', models.DecimalField(decimal_places=1, default=0, max_digits=12, verbose_name='Сума оцінок')),
+                ('score', models.FloatField(db_index=True, default=0, verbose_name='Бал')),
+            ],
+            options={
+                'verbose_name': 'Бал фільму',
+                'verbose_name_plural': 'Бали фільмів',
+            },
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='movie',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='movie_app.movie', verbose_name='Фільм'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.4 on 2026-10-19 12:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0047_moviescore_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieTrend',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='movie_app.movie', verbose_name='Фільм')),
+                ('log_score', models.FloatField(db_index=True, verbose_name='Бал')),
+            ],
+            options={
+                'verbose_name': 'Популярність фільму',
+                'verbose_name_plural': 'Популярність фільмів',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('d', 'День'), ('w', 'Тиждень')], default='d', max_length=1, verbose_name='Період')),
+                ('start', models.DateField(verbose_name='Початок періоду')),
+                ('ratings', models.PositiveIntegerField(default=0, verbose_name='Оцінки')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Перегляди')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_buckets', to='movie_app.movie', verbose_name='Фільм')),
+            ],
+            options={
+                'verbose_name': 'Кошик популярності',
+                'verbose_name_plural': 'Кошики популярності',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingbucket',
+            index=models.Index(fields=['period', 'start'], name='movie_app_t_period_036de3_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='trendingbucket',
+            constraint=models.UniqueConstraint(fields=('movie', 'period', 'start'), name='unique_trending_bucket'),
+        ),
+    ]
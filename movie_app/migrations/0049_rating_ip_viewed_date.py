@@ -0,0 +1,17 @@
+# Generated by Django 4.1.4 on 2026-10-19 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0048_trending'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['ip', 'viewed_date'], name='movie_app_r_ip_4c3683_idx'),
+        ),
+    ]
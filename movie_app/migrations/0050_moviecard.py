@@ -0,0 +1,25 @@
+# Generated by Django 4.1.4 on 2026-10-19 12:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0049_rating_ip_viewed_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieCard',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='movie_app.movie', verbose_name='Фільм')),
+                ('data', models.JSONField(default=dict, verbose_name='Картка')),
+            ],
+            options={
+                'verbose_name': 'Картка фільму',
+                'verbose_name_plural': 'Картки фільмів',
+            },
+        ),
+    ]
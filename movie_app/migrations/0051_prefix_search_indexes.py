@@ -0,0 +1,58 @@
+# Generated by Django 4.1.4 on 2026-10-19 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0050_moviecard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='actor',
+            name='first_name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name="Ім'я"),
+        ),
+        migrations.AlterField(
+            model_name='actor',
+            name='last_name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='Прізвище'),
+        ),
+        migrations.AlterField(
+            model_name='director',
+            name='first_name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name="Ім'я"),
+        ),
+        migrations.AlterField(
+            model_name='director',
+            name='last_name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='Прізвище'),
+        ),
+        migrations.AlterField(
+            model_name='genre',
+            name='name',
+            field=models.CharField(db_index=True, max_length=40, verbose_name='Жанр'),
+        ),
+        migrations.AlterField(
+            model_name='movie',
+            name='name',
+            field=models.CharField(db_index=True, max_length=50, verbose_name='Назва'),
+        ),
+        migrations.AlterField(
+            model_name='movie',
+            name='original_name',
+            field=models.CharField(db_index=True, max_length=50, verbose_name='Англійською'),
+        ),
+        migrations.AlterField(
+            model_name='placeresidence',
+            name='city',
+            field=models.CharField(db_index=True, max_length=40, verbose_name='Місто'),
+        ),
+        migrations.AlterField(
+            model_name='placeresidence',
+            name='street',
+            field=models.CharField(db_index=True, max_length=40, verbose_name='Вулиця'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.1.4 on 2026-10-19 12:28
+
+import datetime
+import django.core.validators
+from django.db import migrations, models
+
+from movie_app.search import install_fts, uninstall_fts
+
+
+def forwards(apps, schema_editor):
+    install_fts(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    uninstall_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0051_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movie',
+            name='length',
+            field=models.IntegerField(db_index=True, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1000)], verbose_name='Тривалість'),
+        ),
+        migrations.AlterField(
+            model_name='movie',
+            name='rating_imdb',
+            field=models.DecimalField(db_index=True, decimal_places=1, max_digits=3, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(10)], verbose_name='Рейтинг IMDB'),
+        ),
+        migrations.AlterField(
+            model_name='movie',
+            name='year',
+            field=models.IntegerField(db_index=True, validators=[django.core.validators.MinValueValidator(1895), django.core.validators.MaxValueValidator(2100)], verbose_name='Рік'),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='rating',
+            field=models.DecimalField(db_index=True, decimal_places=1, max_digits=3, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(10)], verbose_name='Рейтинг'),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='viewed_date',
+            field=models.DateField(db_index=True, default=datetime.date.today, verbose_name='Дата останнього перегляду'),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
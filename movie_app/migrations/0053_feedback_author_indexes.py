@@ -0,0 +1,23 @@
+# Generated by Django 4.1.4 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0052_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feedback',
+            name='name',
+            field=models.CharField(db_index=True, max_length=20, verbose_name="Ім'я"),
+        ),
+        migrations.AlterField(
+            model_name='feedback',
+            name='surname',
+            field=models.CharField(db_index=True, max_length=60, verbose_name='Прізвище'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.1.4 on 2026-10-19 12:32
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+from movie_app.search import install_fts
+from movie_app.slugs import dedupe
+
+# базовий слаг для історичних моделей, у яких немає make_slug()
+BASES = {
+    'Movie': lambda obj: obj.slug or slugify(obj.original_name) or 'movie',
+    'Director': lambda obj: slugify(f'{obj.first_name}-{obj.last_name}', allow_unicode=True) or 'director',
+    'Actor': lambda obj: slugify(f'{obj.first_name}-{obj.last_name}', allow_unicode=True) or 'actor',
+}
+
+
+def dedupe_slugs(apps, schema_editor):
+    """Повтори отримують суфікси -2, -3... у порядку первинних ключів"""
+    for name, base in BASES.items():
+        model = apps.get_model('movie_app', name)
+        objs = list(model.objects.order_by('pk'))
+        slugs = dedupe([(obj.pk, base(obj)) for obj in objs], set())
+        changed = [obj for obj in objs if obj.slug != slugs[obj.pk]]
+        for obj in changed:
+            obj.slug = slugs[obj.pk]
+        model.objects.bulk_update(changed, ['slug'], batch_size=1000)
+
+
+def reinstall_fts(apps, schema_editor):
+    # зміна поля перебудовує таблицю фільмів у SQLite разом з її тригерами
+    install_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0053_feedback_author_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='actor',
+            name='slug',
+            field=models.SlugField(default='', unique=True, verbose_name='Слаг'),
+        ),
+        migrations.AlterField(
+            model_name='director',
+            name='slug',
+            field=models.SlugField(default='', unique=True, verbose_name='Слаг'),
+        ),
+        migrations.AlterField(
+            model_name='movie',
+            name='slug',
+            field=models.SlugField(default='', unique=True, verbose_name='Слаг'),
+        ),
+        migrations.RunPython(reinstall_fts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1.4 on 2026-10-19 12:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0054_unique_slugs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Завдання')),
+                ('args', models.JSONField(blank=True, default=list, verbose_name='Аргументи')),
+                ('kwargs', models.JSONField(blank=True, default=dict, verbose_name='Іменовані аргументи')),
+                ('dedupe_key', models.CharField(blank=True, max_length=200, null=True, verbose_name='Ключ дедуплікації')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Пріоритет')),
+                ('status', models.CharField(choices=[('pending', 'Очікує'), ('running', 'Виконується'), ('done', 'Виконано'), ('failed', 'Помилка')], default='pending', max_length=10, verbose_name='Стан')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Спроби')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='Максимум спроб')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Запуск після')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Створено')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Почато')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('duration', models.FloatField(blank=True, null=True, verbose_name='Тривалість, с')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Воркер')),
+                ('error', models.TextField(blank=True, verbose_name='Помилка')),
+            ],
+            options={
+                'verbose_name': 'Фонове завдання',
+                'verbose_name_plural': 'Фонові завдання',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', '-priority', 'run_at'], name='movie_app_t_status_b91ece_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('dedupe_key',), name='unique_pending_task'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.4 on 2026-10-19 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0055_tasks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadedImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('thumbnail', models.CharField(blank=True, max_length=255, verbose_name='Мініатюра')),
+                ('original_name', models.CharField(db_index=True, max_length=255, verbose_name="Ім'я файлу")),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='Розмір, байт')),
+                ('width', models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(blank=True, null=True, verbose_name='Висота')),
+                ('is_image', models.BooleanField(default=True, verbose_name='Зображення')),
+                ('uploaded', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Завантажено')),
+            ],
+            options={
+                'verbose_name': 'Завантажений файл',
+                'verbose_name_plural': 'Завантажені файли',
+            },
+        ),
+    ]
@@ -1,16 +1,19 @@
 from datetime import date
 
 from django.db import models
+from django.utils import timezone
 from django.urls import reverse
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator, MinLengthValidator
 
+from .slugs import assign_slug
+
 
 class PlaceResidence(models.Model):
     """Місце проживання акторів"""
     country = models.CharField("Країна", max_length=40)
-    city = models.CharField("Місто", max_length=40)
-    street = models.CharField("Вулиця", max_length=40)
+    city = models.CharField("Місто", max_length=40, db_index=True)
+    street = models.CharField("Вулиця", max_length=40, db_index=True)
     number = models.CharField("Номер будинку", max_length=10)
     map_coordinate = models.URLField("Координати на мапі", default="https://www.google.com/maps")
 
@@ -24,13 +27,18 @@ class PlaceResidence(models.Model):
 
 class Director(models.Model):
     """Режисери"""
-    first_name = models.CharField("Ім'я", max_length=100)
-    last_name = models.CharField("Прізвище", max_length=100)
+    first_name = models.CharField("Ім'я", max_length=100, db_index=True)
+    last_name = models.CharField("Прізвище", max_length=100, db_index=True)
     director_email = models.EmailField("Email")
-    slug = models.SlugField("Слаг", default='', null=False)
+    slug = models.SlugField("Слаг", default='', null=False, unique=True)
+    # поля, з яких будується слаг
+    slug_fields = ('first_name', 'last_name')
+
+    def make_slug(self):
+        return slugify(f"{self.first_name}-{self.last_name}", allow_unicode=True)
 
     def save(self, *args, **kwargs):
-        self.slug = slugify(f"{self.first_name}-{self.last_name}", allow_unicode=True)
+        assign_slug(self)
         return super().save(*args, **kwargs)
 
     def __str__(self):
@@ -46,7 +54,7 @@ class Director(models.Model):
 
 class Genre(models.Model):
     """Жанри"""
-    name = models.CharField("Жанр", max_length=40)
+    name = models.CharField("Жанр", max_length=40, db_index=True)
 
     def __str__(self):
         return self.name
@@ -67,15 +75,19 @@ class Actor(models.Model):
         (MALE, 'Чоловік'),
         (FEMALE, 'Жінка'),
     ]
-    first_name = models.CharField("Ім'я", max_length=100)
-    last_name = models.CharField("Прізвище", max_length=100)
+    first_name = models.CharField("Ім'я", max_length=100, db_index=True)
+    last_name = models.CharField("Прізвище", max_length=100, db_index=True)
     gender = models.CharField("Стать", max_length=10, choices=GENDER_CHOICES, default=MALE)
     residence = models.OneToOneField(PlaceResidence, verbose_name="Місце проживання", on_delete=models.SET_NULL,
                                      null=True, blank=True)
-    slug = models.SlugField("Слаг", default='', null=False, db_index=True)
+    slug = models.SlugField("Слаг", default='', null=False, unique=True)
+    slug_fields = ('first_name', 'last_name')
+
+    def make_slug(self):
+        return slugify(f"{self.first_name}-{self.last_name}", allow_unicode=True)
 
     def save(self, *args, **kwargs):
-        self.slug = slugify(f"{self.first_name}-{self.last_name}", allow_unicode=True)
+        assign_slug(self)
         return super().save(*args, **kwargs)
 
     def __str__(self):
@@ -95,27 +107,31 @@ class Actor(models.Model):
 class Movie(models.Model):
     """Фільми"""
 
-    name = models.CharField("Назва", max_length=50)
+    name = models.CharField("Назва", max_length=50, db_index=True)
 
-    original_name = models.CharField("Англійською", max_length=50)
+    original_name = models.CharField("Англійською", max_length=50, db_index=True)
     # рік випуску
-    year = models.IntegerField("Рік", blank=False, validators=[MinValueValidator(1895), MaxValueValidator(2100)])
+    year = models.IntegerField("Рік", blank=False, db_index=True,
+                               validators=[MinValueValidator(1895), MaxValueValidator(2100)])
     # тривалість у хвилинах
-    length = models.IntegerField("Тривалість", blank=False, validators=[MinValueValidator(0), MaxValueValidator(1000)])
+    length = models.IntegerField("Тривалість", blank=False, db_index=True,
+                                 validators=[MinValueValidator(0), MaxValueValidator(1000)])
     genres = models.ManyToManyField(Genre, verbose_name="Жанри", related_name='movies')
     description = models.TextField("Опис", max_length=2000)
-    rating_imdb = models.DecimalField("Рейтинг IMDB", max_digits=3, decimal_places=1, validators=[MinValueValidator(0),
-                                                                                                  MaxValueValidator(
-                                                                                                      10)])
+    rating_imdb = models.DecimalField("Рейтинг IMDB", max_digits=3, decimal_places=1, db_index=True,
+                                      validators=[MinValueValidator(0), MaxValueValidator(10)])
     actors = models.ManyToManyField(Actor, verbose_name="Актори", related_name='movies')
     director = models.ForeignKey(Director, verbose_name="Режисер", on_delete=models.CASCADE, null=True,
                                  related_name='movies')
-    slug = models.SlugField("Слаг", default='', null=False)
+    slug = models.SlugField("Слаг", default='', null=False, unique=True)
     picture = models.ImageField("Зображення", upload_to='my_gallery', null=True, blank=True)
 
+    def make_slug(self):
+        return slugify(self.original_name)
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.original_name)
+        # заданий вручну слаг зберігається, лише отримує суфікс при збігу з іншим фільмом
+        assign_slug(self, self.slug or None)
         return super().save(*args, **kwargs)
 
     def __str__(self):
@@ -132,21 +148,24 @@ class Movie(models.Model):
 class Rating(models.Model):
     """Персональний рейтинг"""
     ip = models.CharField("IP адреса", max_length=15)
-    rating = models.DecimalField("Рейтинг", max_digits=3, decimal_places=1, validators=[MinValueValidator(0),
-                                                                                        MaxValueValidator(10)])
-    viewed_date = models.DateField("Дата останнього перегляду", default=date.today)
+    rating = models.DecimalField("Рейтинг", max_digits=3, decimal_places=1, db_index=True,
+                                 validators=[MinValueValidator(0), MaxValueValidator(10)])
+    viewed_date = models.DateField("Дата останнього перегляду", default=date.today, db_index=True)
     movie = models.ForeignKey(Movie, verbose_name="Фільм", on_delete=models.CASCADE)
 
     class Meta:
         verbose_name = 'Рейтинг'
         verbose_name_plural = 'Рейтинги'
+        indexes = [
+            models.Index(fields=['ip', 'viewed_date']),
+        ]
 
 
 class Feedback(models.Model):
     """Відгуки"""
     email = models.EmailField()
-    name = models.CharField("Ім'я", max_length=20)
-    surname = models.CharField("Прізвище", max_length=60)
+    name = models.CharField("Ім'я", max_length=20, db_index=True)
+    surname = models.CharField("Прізвище", max_length=60, db_index=True)
     feed = models.TextField("Відгук", max_length=5000)
     movie = models.ForeignKey(Movie, verbose_name="Фільм", on_delete=models.CASCADE)
 
@@ -156,3 +175,142 @@ class Feedback(models.Model):
     class Meta:
         verbose_name = 'Відгук'
         verbose_name_plural = 'Відгуки'
+
+
+class MovieScore(models.Model):
+    """Накопичені оцінки фільму для рейтингу кращих"""
+    movie = models.OneToOneField(Movie, verbose_name="Фільм", on_delete=models.CASCADE, primary_key=True,
+                                 related_name='score')
+    rating_count = models.PositiveIntegerField("Кількість оцінок", default=0)
+    rating_sum = models.DecimalField("Сума оцінок", max_digits=12, decimal_places=1, default=0)
+    score = models.FloatField("Бал", default=0, db_index=True)
+
+    class Meta:
+        verbose_name = 'Бал фільму'
+        verbose_name_plural = 'Бали фільмів'
+
+
+class Leaderboard(models.Model):
+    """Ранжований список id кращих фільмів: загальний, за жанром чи десятиліттям"""
+    key = models.CharField("Ключ", max_length=40, unique=True)
+    movie_ids = models.JSONField("Фільми", default=list)
+    updated = models.DateTimeField("Оновлено", auto_now=True)
+
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        verbose_name = 'Рейтинг кращих'
+        verbose_name_plural = 'Рейтинги кращих'
+
+
+class TrendingBucket(models.Model):
+    """Кількість оцінок і переглядів фільму за день чи тиждень"""
+    DAY = 'd'
+    WEEK = 'w'
+    PERIOD_CHOICES = [
+        (DAY, 'День'),
+        (WEEK, 'Тиждень'),
+    ]
+    movie = models.ForeignKey(Movie, verbose_name="Фільм", on_delete=models.CASCADE, related_name='trending_buckets')
+    period = models.CharField("Період", max_length=1, choices=PERIOD_CHOICES, default=DAY)
+    start = models.DateField("Початок періоду")
+    ratings = models.PositiveIntegerField("Оцінки", default=0)
+    views = models.PositiveIntegerField("Перегляди", default=0)
+
+    class Meta:
+        verbose_name = 'Кошик популярності'
+        verbose_name_plural = 'Кошики популярності'
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'period', 'start'], name='unique_trending_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'start']),
+        ]
+
+
+class MovieTrend(models.Model):
+    """Згасаючий бал популярності фільму (log2 відносно TRENDING_EPOCH)"""
+    movie = models.OneToOneField(Movie, verbose_name="Фільм", on_delete=models.CASCADE, primary_key=True,
+                                 related_name='trend')
+    log_score = models.FloatField("Бал", db_index=True)
+
+    class Meta:
+        verbose_name = 'Популярність фільму'
+        verbose_name_plural = 'Популярність фільмів'
+
+
+class MovieCard(models.Model):
+    """Готова картка фільму для списків: назви, рік, URL, постер і жанри"""
+    movie = models.OneToOneField(Movie, verbose_name="Фільм", on_delete=models.CASCADE, primary_key=True,
+                                 related_name='card')
+    data = models.JSONField("Картка", default=dict)
+
+    class Meta:
+        verbose_name = 'Картка фільму'
+        verbose_name_plural = 'Картки фільмів'
+
+
+class UploadedImage(models.Model):
+    """Файл, завантажений через CKEditor; браузер файлів читає цей маніфест замість обходу каталогу"""
+    path = models.CharField("Файл", max_length=255, unique=True)
+    thumbnail = models.CharField("Мініатюра", max_length=255, blank=True)
+    original_name = models.CharField("Ім'я файлу", max_length=255, db_index=True)
+    # хеш завантаженого вмісту: повторне завантаження того самого файлу повертає наявний запис
+    sha256 = models.CharField("SHA-256", max_length=64, unique=True)
+    size = models.PositiveIntegerField("Розмір, байт", default=0)
+    width = models.PositiveIntegerField("Ширина", null=True, blank=True)
+    height = models.PositiveIntegerField("Висота", null=True, blank=True)
+    is_image = models.BooleanField("Зображення", default=True)
+    uploaded = models.DateTimeField("Завантажено", auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.path
+
+    class Meta:
+        verbose_name = 'Завантажений файл'
+        verbose_name_plural = 'Завантажені файли'
+
+
+class Task(models.Model):
+    """Фонове завдання в черзі бази даних"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Очікує'),
+        (RUNNING, 'Виконується'),
+        (DONE, 'Виконано'),
+        (FAILED, 'Помилка'),
+    ]
+    name = models.CharField("Завдання", max_length=100)
+    args = models.JSONField("Аргументи", default=list, blank=True)
+    kwargs = models.JSONField("Іменовані аргументи", default=dict, blank=True)
+    # однакові завдання, що очікують, не дублюються
+    dedupe_key = models.CharField("Ключ дедуплікації", max_length=200, null=True, blank=True)
+    priority = models.SmallIntegerField("Пріоритет", default=0)
+    status = models.CharField("Стан", max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField("Спроби", default=0)
+    max_attempts = models.PositiveSmallIntegerField("Максимум спроб", default=3)
+    run_at = models.DateTimeField("Запуск після", default=timezone.now)
+    created = models.DateTimeField("Створено", auto_now_add=True)
+    started = models.DateTimeField("Почато", null=True, blank=True)
+    finished = models.DateTimeField("Завершено", null=True, blank=True)
+    duration = models.FloatField("Тривалість, с", null=True, blank=True)
+    worker = models.CharField("Воркер", max_length=100, blank=True)
+    error = models.TextField("Помилка", blank=True)
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+    class Meta:
+        verbose_name = 'Фонове завдання'
+        verbose_name_plural = 'Фонові завдання'
+        constraints = [
+            models.UniqueConstraint(fields=['dedupe_key'], condition=models.Q(status='pending'),
+                                    name='unique_pending_task'),
+        ]
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at']),
+        ]
@@ -0,0 +1,135 @@
+import io
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+PROFILE_SALT = 'movie_app.profiling'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.prof$')
+
+# одночасно профілюється лише один запит у процесі
+_profile_lock = threading.Lock()
+
+
+def profile_dir():
+    return getattr(settings, 'PROFILE_STORE_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def make_profile_token():
+    """Підписаний токен для заголовка X-Profile"""
+    return signing.TimestampSigner(salt=PROFILE_SALT).sign('profile')
+
+
+def profiling_requested(request):
+    """Профілювання вмикає персонал параметром ?_profile=1 або чинний підписаний заголовок"""
+    token = request.META.get(PROFILE_HEADER)
+    if token:
+        try:
+            signing.TimestampSigner(salt=PROFILE_SALT).unsign(
+                token, max_age=getattr(settings, 'PROFILE_TOKEN_MAX_AGE', 3600))
+            return True
+        except signing.BadSignature:
+            return False
+    user = getattr(request, 'user', None)
+    return PROFILE_PARAM in request.GET and user is not None and user.is_staff
+
+
+def profile_call(request, get_response):
+    """Виконує запит під cProfile і зберігає результат; None, якщо профайлер зайнятий"""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        if PROFILE_PARAM in request.GET:
+            # службовий параметр не повинен потрапити у фільтри списку змін адмінки
+            request.GET = request.GET.copy()
+            del request.GET[PROFILE_PARAM]
+        # cProfile і pstats (разом з profile) потрібні лише для запитів, що профілюються
+        import cProfile
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = get_response(request)
+            # TemplateResponse рендериться до виходу з middleware, але відкладений рендер теж враховуємо
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+        finally:
+            profiler.disable()
+        elapsed = (time.perf_counter() - started) * 1000
+        match = request.resolver_match
+        name = save_profile(profiler, match.view_name if match else 'unresolved', elapsed)
+        response['X-Profile-Id'] = name
+        return response
+    finally:
+        _profile_lock.release()
+
+
+def save_profile(profiler, view_name, elapsed):
+    """Зберігає профіль у форматі pstats і видаляє найстаріші понад PROFILE_STORE_MAX"""
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    view_name = re.sub(r'[^\w.-]', '_', view_name)
+    name = f'{time.strftime("%Y%m%d-%H%M%S")}-{int(time.time() * 1000) % 1000:03d}-{view_name}-{elapsed:.0f}ms.prof'
+    profiler.dump_stats(os.path.join(directory, name))
+    for old in list_profiles()[getattr(settings, 'PROFILE_STORE_MAX', 50):]:
+        try:
+            os.remove(os.path.join(directory, old['name']))
+        except FileNotFoundError:
+            pass
+    return name
+
+
+def list_profiles():
+    """Збережені профілі, найновіші першими"""
+    directory = profile_dir()
+    try:
+        entries = [e for e in os.scandir(directory) if e.is_file() and PROFILE_NAME_RE.match(e.name)]
+    except FileNotFoundError:
+        return []
+    profiles = [{'name': e.name, 'size': e.stat().st_size, 'mtime': e.stat().st_mtime} for e in entries]
+    return sorted(profiles, key=lambda p: (p['mtime'], p['name']), reverse=True)
+
+
+def profile_path(name):
+    if not PROFILE_NAME_RE.match(name):
+        raise Http404
+    path = os.path.join(profile_dir(), name)
+    if not os.path.isfile(path):
+        raise Http404
+    return path
+
+
+def profile_list(request):
+    """Сторінка адмінки зі списком профілів"""
+    import pstats
+    from django.contrib import admin
+
+    selected = request.GET.get('show')
+    summary = None
+    if selected:
+        stream = io.StringIO()
+        stats = pstats.Stats(profile_path(selected), stream=stream)
+        stats.sort_stats('cumulative').print_stats(40)
+        summary = stream.getvalue()
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Профілі запитів',
+        'profiles': list_profiles(),
+        'selected': selected,
+        'summary': summary,
+        'token': make_profile_token(),
+    }
+    return render(request, 'admin/movie_app/profiles.html', context)
+
+
+def profile_download(request, name):
+    """Завантаження профілю у форматі pstats"""
+    return FileResponse(open(profile_path(name), 'rb'), as_attachment=True, filename=name)
@@ -0,0 +1,152 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .metrics import collect, registry
+from .models import Movie, Actor, Director, Genre, Feedback
+
+PREFIX = 'qc:1'
+
+
+def get_cache():
+    return caches[getattr(settings, 'QUERY_CACHE_ALIAS', 'default')]
+
+
+def tag(model, pk='*'):
+    """Тег рядка моделі; pk='*' - тег усієї таблиці для пакетних змін, що обходять сигнали"""
+    return f'{model._meta.model_name}:{pk}'
+
+
+def tags_for(model, pks):
+    return [tag(model, pk) for pk in pks if pk is not None]
+
+
+def _tag_key(name):
+    return f'{PREFIX}:tag:{name}'
+
+
+def _entry_key(key):
+    if len(key) > 150:
+        key = hashlib.sha1(key.encode()).hexdigest()
+    return f'{PREFIX}:entry:{key}'
+
+
+def _new_version():
+    return os.urandom(6).hex()
+
+
+def tag_versions(tags):
+    """Поточні версії тегів; тегам, яких ще немає в кеші (або витіснених), присвоюється нова версія"""
+    cache = get_cache()
+    keys = {_tag_key(name): name for name in tags}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # add не перезаписує версію, яку щойно встановив інший процес
+        cache.add(key, _new_version(), None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def cached(name, key, build, tags=(), extra_tags=None, timeout=None):
+    """Результат build() з кешу, поки не змінилася версія жодного з його тегів.
+
+    tags відомі заздалегідь і читаються до побудови значення, тож інвалідація під час побудови не загубиться;
+    extra_tags(value) - теги, що залежать від самого результату (наприклад, жанри фільму).
+    """
+    cache = get_cache()
+    entry = cache.get(_entry_key(key))
+    if entry is not None:
+        versions, value = entry
+        if tag_versions(versions) == versions:
+            registry.inc('cache_requests_total', cache=name, result='hit')
+            return value
+    registry.inc('cache_requests_total', cache=name, result='miss')
+    versions = tag_versions(tags)
+    value = build()
+    if extra_tags:
+        versions.update(tag_versions(set(extra_tags(value)) - versions.keys()))
+    if timeout is None:
+        timeout = getattr(settings, 'QUERY_CACHE_SECONDS', 3600)
+    cache.set(_entry_key(key), (versions, value), timeout)
+    return value
+
+
+def _bump(tags):
+    get_cache().set_many({_tag_key(name): _new_version() for name in tags}, None)
+
+
+def invalidate(*tags, using=None):
+    """Нові версії тегів зараз (для читання в тій самій транзакції) і ще раз після фіксації,
+    щоб паралельний запит не зберіг у кеш дані, прочитані до неї"""
+    tags = {name for name in tags if name}
+    if not tags:
+        return
+    _bump(tags)
+    transaction.on_commit(lambda: _bump(tags), using=using)
+
+
+def invalidate_model(*models, using=None):
+    invalidate(*(tag(model) for model in models), using=using)
+
+
+def genre_list():
+    return cached('genres', 'genres', lambda: list(Genre.objects.all()), tags=['genre-list', tag(Genre)])
+
+
+def movie_years():
+    """Роки випуску для панелі фільтрів, кожен один раз"""
+    return cached('years', 'years', lambda: list(Movie.objects.values('year').distinct().order_by('year')),
+                  tags=['movie-years', tag(Movie)])
+
+
+def filmography(obj):
+    """Id фільмів актора, режисера чи жанру; самі картки читаються окремо і завжди свіжі"""
+    model = type(obj)
+    if model is Director:
+        queryset = Movie.objects.filter(director_id=obj.id).order_by('id').values_list('id', flat=True)
+    elif model is Actor:
+        queryset = Movie.actors.through.objects.filter(actor_id=obj.id).order_by('movie_id') \
+            .values_list('movie_id', flat=True)
+    else:
+        queryset = Movie.genres.through.objects.filter(genre_id=obj.id).order_by('movie_id') \
+            .values_list('movie_id', flat=True)
+    return cached('filmography', tag(obj, obj.id), lambda: list(queryset),
+                  tags=[tag(obj, obj.id), tag(model), tag(Movie)])
+
+
+def movie_related(movie):
+    """Жанри, актори, режисер і відгуки фільму для сторінки деталей; оцінка відвідувача читається окремо"""
+    def build():
+        return {
+            'genres': list(movie.genres.all()),
+            'actors': list(movie.actors.all()),
+            'director': movie.director,
+            'feedbacks': list(movie.feedback_set.all()),
+        }
+
+    def extra_tags(value):
+        return (tags_for(Genre, [genre.id for genre in value['genres']])
+                + tags_for(Actor, [actor.id for actor in value['actors']]) + tags_for(Director, [movie.director_id]))
+
+    return cached('movie', tag(movie, movie.id), build, extra_tags=extra_tags, tags=[
+        tag(movie, movie.id), tag(Movie), tag(Genre), tag(Actor), tag(Director), tag(Feedback)])
+
+
+def stats():
+    """Влучання і промахи за назвами кешів з метрик усіх процесів: назва -> (hits, misses)"""
+    counters, _ = collect()
+    result = {}
+    for (name, labels), value in counters.items():
+        if name != 'cache_requests_total':
+            continue
+        labels = dict(labels)
+        hits, misses = result.get(labels.get('cache', ''), (0, 0))
+        if labels.get('result') == 'hit':
+            hits += value
+        else:
+            misses += value
+        result[labels.get('cache', '')] = (hits, misses)
+    return result
@@ -0,0 +1,207 @@
+import re
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.text import smart_split, unescape_string_literal
+
+FTS_TABLE = 'movie_app_movie_fts'
+FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(name, original_name, "
+    f"content='movie_app_movie', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON movie_app_movie BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, original_name) VALUES (new.id, new.name, new.original_name); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON movie_app_movie BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, original_name) "
+    f"VALUES ('delete', old.id, old.name, old.original_name); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, original_name ON movie_app_movie BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, original_name) "
+    f"VALUES ('delete', old.id, old.name, old.original_name); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, original_name) VALUES (new.id, new.name, new.original_name); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+DROP_FTS_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+INT_RE = re.compile(r'^\d+$')
+DECIMAL_RE = re.compile(r'^\d+[.,]\d+$')
+RANGE_RE = re.compile(r'^(\d+(?:[.,]\d+)?)(?:-|\.\.)(\d+(?:[.,]\d+)?)$')
+COMPARE_RE = re.compile(r'^(<=|>=|<|>)(\d+(?:[.,]\d+)?)$')
+DATE_RE = re.compile(r'^(\d{4})-(\d{1,2})(?:-(\d{1,2}))?$')
+WORD_RE = re.compile(r'\w+')
+COMPARE_LOOKUPS = {'<': 'lt', '<=': 'lte', '>': 'gt', '>=': 'gte'}
+
+NOTHING = Q(pk__in=[])
+# поля, для яких має сенс точне порівняння з дробовим числом
+DECIMAL_FIELDS = {'rating_imdb', 'rating'}
+# види полів у search_term_fields, крім числових з межами (мінімум, максимум)
+DATE = 'date'
+PREFIX = 'prefix'
+# поле входить у повнотекстовий індекс назв фільмів
+FULL_TEXT = 'fts'
+MOVIE_SEARCH_FIELDS = {'year': (1895, 2100), 'length': (0, 1000), 'rating_imdb': (0, 10),
+                       'name': FULL_TEXT, 'original_name': FULL_TEXT}
+RATING_SEARCH_FIELDS = {'viewed_date': DATE, 'rating': (0, 10), 'ip': PREFIX}
+
+
+def install_fts(schema_editor):
+    """Повнотекстовий індекс назв фільмів; лише для SQLite.
+
+    Перебудова таблиці movie_app_movie в міграціях SQLite видаляє тригери,
+    тому такі міграції мають викликати цю функцію ще раз.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_SQL:
+        schema_editor.execute(sql)
+
+
+def uninstall_fts(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_FTS_SQL:
+        schema_editor.execute(sql)
+
+
+def split_terms(search_term):
+    """Слова запиту; фрази в лапках залишаються одним словом, як у пошуку адмінки"""
+    terms = []
+    for term in smart_split(search_term):
+        if term[0] in '"\'' and term[0] == term[-1] and len(term) > 1:
+            term = unescape_string_literal(term)
+        if term:
+            terms.append(term)
+    return terms
+
+
+def to_number(value):
+    try:
+        return Decimal(value.replace(',', '.'))
+    except InvalidOperation:
+        return None
+
+
+def parse_date_range(term):
+    """'2022-05' -> [1 травня, 1 червня), '2022-05-03' -> один день"""
+    match = DATE_RE.match(term)
+    if not match:
+        return None
+    year, month, day = int(match[1]), int(match[2]), match[3]
+    try:
+        if day:
+            start = date(year, month, int(day))
+            return start, start + timedelta(days=1)
+        start = date(year, month, 1)
+    except ValueError:
+        return None
+    return start, date(year + month // 12, month % 12 + 1, 1)
+
+
+def fields_q(fields, value_range, lookups, narrowest=False):
+    """OR фільтрів по полях {назва: (мінімум, максимум)}, у межі яких потрапляє значення; None - жодне.
+
+    Для порівнянь і діапазонів береться лише поле з найвужчими межами:
+    '>8' - це рейтинг, а не тривалість.
+    """
+    matching = [field for field, (low, high) in fields.items() if low <= value_range[0] and value_range[1] <= high]
+    if narrowest and matching:
+        matching = [min(matching, key=lambda field: fields[field][1] - fields[field][0])]
+    q = Q()
+    for field in matching:
+        q |= Q(**{f'{field}__{lookup}' if lookup else field: value for lookup, value in lookups.items()})
+    return q or None
+
+
+def numeric_q(term, fields):
+    """Порівняння '>a', діапазон 'a-b' або число; None, якщо терм не числовий чи не підходить жодному полю"""
+    match = COMPARE_RE.match(term)
+    if match:
+        value = to_number(match[2])
+        return fields_q(fields, (value, value), {COMPARE_LOOKUPS[match[1]]: value}, narrowest=True)
+    match = RANGE_RE.match(term)
+    if match:
+        start, end = sorted([to_number(match[1]), to_number(match[2])])
+        return fields_q(fields, (start, end), {'gte': start, 'lte': end}, narrowest=True)
+    if INT_RE.match(term) or DECIMAL_RE.match(term):
+        value = to_number(term)
+        if value != int(value):
+            fields = {field: limits for field, limits in fields.items() if field in DECIMAL_FIELDS}
+        return fields_q(fields, (value, value), {'': value})
+    return None
+
+
+def is_comparison(term):
+    return bool(COMPARE_RE.match(term) or RANGE_RE.match(term))
+
+
+def movie_text_q(term, using='default'):
+    """Текст шукається за префіксами слів у FTS індексі назв"""
+    words = WORD_RE.findall(term)
+    if not words:
+        return NOTHING
+    if connections[using].vendor != 'sqlite':
+        q = Q()
+        for word in words:
+            q &= Q(name__icontains=word) | Q(original_name__icontains=word)
+        return q
+    match = ' '.join(f'"{word}"*' for word in words)
+    return Q(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+
+
+def date_q(term, fields):
+    """'2022-05', '2022-05-03' чи рік - діапазони полів дати; None, якщо терм не дата"""
+    dates = parse_date_range(term)
+    if not dates and INT_RE.match(term) and 1895 <= int(term) <= 2100:
+        dates = date(int(term), 1, 1), date(int(term) + 1, 1, 1)
+    if not dates:
+        return None
+    q = Q()
+    for field in fields:
+        q |= Q(**{f'{field}__gte': dates[0], f'{field}__lt': dates[1]})
+    return q
+
+
+def term_q(term, fields, using='default'):
+    """Фільтр для одного слова запиту за полями {назва: вид}.
+
+    Дати - діапазони полів DATE; числа, порівняння й діапазони - числові поля; порівняння ніколи не шукаються
+    як текст. Повнотекстовий пошук додається до числового збігу (число буває в назві), а префікс поля PREFIX
+    лише заміняє його, коли число не підійшло жодному полю.
+    """
+    kinds = {}
+    for field, kind in fields.items():
+        kinds.setdefault(kind if isinstance(kind, str) else 'number', {})[field] = kind
+    if DATE in kinds:
+        q = date_q(term, kinds[DATE])
+        if q:
+            return q
+    q = numeric_q(term, kinds['number']) if 'number' in kinds else None
+    if is_comparison(term):
+        return q or NOTHING
+    if FULL_TEXT in kinds:
+        text = movie_text_q(term, using)
+        return q | text if q else text
+    if q:
+        return q
+    prefix = Q()
+    for field in kinds.get(PREFIX, ()):
+        prefix |= Q(**{f'{field}__gte': term, f'{field}__lt': term + '\U0010ffff'})
+    return prefix or NOTHING
+
+
+class TermSearchMixin:
+    """Пошук адмінки, що розбирає кожне слово запиту і будує для нього індексований фільтр за search_term_fields"""
+    search_term_fields = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        if not self.search_term_fields:
+            return super().get_search_results(request, queryset, search_term)
+        for term in split_terms(search_term):
+            queryset = queryset.filter(term_q(term, self.search_term_fields, queryset.db))
+        return queryset, False
@@ -1,3 +1,4 @@
+import math
 
 
 def get_client_ip(request):
@@ -8,3 +9,25 @@ def get_client_ip(request):
     else:
         ip = request.META.get('REMOTE_ADDR')
     return ip
+
+
+def percentile(values, pct):
+    """Перцентиль списку значень (найближчий ранг)"""
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(values)) - 1)
+    return values[index]
+
+
+def histogram(values, buckets):
+    """Кількість значень у кожному кошику (верхня межа включно), останній кошик - решта"""
+    counts = dict.fromkeys([str(b) for b in buckets] + ['+Inf'], 0)
+    for value in values:
+        for bound in buckets:
+            if value <= bound:
+                counts[str(bound)] += 1
+                break
+        else:
+            counts['+Inf'] += 1
+    return counts
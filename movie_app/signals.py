@@ -0,0 +1,206 @@
+from decimal import Decimal
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import db, leaderboard, querycache, snapshot, tasks, trending
+from .models import Movie, Actor, Director, Genre, Rating, Feedback
+
+# фільми, що видаляються зараз: каскадне видалення їх оцінок не оновлює бали
+_deleting = set()
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    db.configure_connection(connection)
+
+
+@receiver(pre_save, sender=Rating)
+def remember_rating(sender, instance, **kwargs):
+    """Попереднє значення оцінки для інкрементального оновлення балів"""
+    instance._previous = None
+    if instance.pk:
+        instance._previous = Rating.objects.filter(pk=instance.pk).values_list(
+            'movie_id', 'rating', 'viewed_date').first()
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    # зміна дати перегляду чи фільму переносить подію з попереднього кошика, а не додає ще одну
+    trending.move_rating(previous and (previous[0], previous[2]), (instance.movie_id, instance.viewed_date))
+    rating = Decimal(str(instance.rating))
+    # лічильники оновлюються одразу, перерахунок рейтингів кращих - у фоновому завданні
+    if previous is None:
+        apply_rating(instance.movie_id, 1, rating)
+    elif previous[0] != instance.movie_id:
+        apply_rating(previous[0], -1, -previous[1])
+        apply_rating(instance.movie_id, 1, rating)
+    elif previous[1] != rating:
+        apply_rating(instance.movie_id, 0, rating - previous[1])
+
+
+def apply_rating(movie_id, count_delta, sum_delta):
+    leaderboard.apply_rating(movie_id, count_delta, sum_delta, refresh=False)
+    tasks.refresh_movie.enqueue_on_commit(movie_id)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    if instance.movie_id in _deleting:
+        return
+    apply_rating(instance.movie_id, -1, -Decimal(str(instance.rating)))
+    trending.record_rating(instance.movie_id, instance.viewed_date, -1)
+
+
+@receiver(pre_save, sender=Movie)
+def remember_year(sender, instance, **kwargs):
+    instance._previous_year = instance._previous_director = None
+    if instance.pk:
+        instance._previous_year, instance._previous_director = Movie.objects.filter(pk=instance.pk).values_list(
+            'year', 'director_id').first() or (None, None)
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved(sender, instance, **kwargs):
+    tasks.refresh_movie.enqueue_on_commit(instance.id)
+    previous_year = getattr(instance, '_previous_year', None)
+    if previous_year is not None and leaderboard.decade_key(previous_year) != leaderboard.decade_key(instance.year):
+        tasks.rebuild_boards.enqueue_on_commit([leaderboard.decade_key(previous_year)])
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def movie_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # зміна з боку жанру: genre.movies.add(...)
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            tasks.rebuild_boards.enqueue_on_commit([leaderboard.genre_key(instance.id)])
+    elif action == 'pre_clear':
+        instance._cleared_genres = list(instance.genres.values_list('id', flat=True))
+    elif action == 'post_add':
+        tasks.refresh_movie.enqueue_on_commit(instance.id)
+    elif action in ('post_remove', 'post_clear'):
+        removed = pk_set if action == 'post_remove' else getattr(instance, '_cleared_genres', [])
+        tasks.rebuild_boards.enqueue_on_commit(sorted(leaderboard.genre_key(pk) for pk in removed))
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def movie_genres_cards(sender, instance, action, reverse, pk_set, **kwargs):
+    """Назви жанрів зберігаються в картках фільмів"""
+    if not reverse:
+        if action in ('post_remove', 'post_clear'):
+            # після post_add картку оновлює refresh_movie
+            tasks.refresh_movie.enqueue_on_commit(instance.id)
+    elif action == 'pre_clear':
+        instance._cleared_movies = list(instance.movies.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        tasks.refresh_cards.enqueue_on_commit(sorted(pk_set))
+    elif action == 'post_clear':
+        tasks.refresh_cards.enqueue_on_commit(getattr(instance, '_cleared_movies', []))
+
+
+@receiver(pre_delete, sender=Movie)
+def movie_deleting(sender, instance, **kwargs):
+    _deleting.add(instance.id)
+    instance._board_keys = leaderboard.board_keys(instance)
+    instance._cache_tags = (querycache.tags_for(Genre, instance.genres.values_list('id', flat=True))
+                            + querycache.tags_for(Actor, instance.actors.values_list('id', flat=True)))
+
+
+@receiver(post_delete, sender=Movie)
+def movie_deleted(sender, instance, **kwargs):
+    _deleting.discard(instance.id)
+    tasks.rebuild_boards.enqueue_on_commit(getattr(instance, '_board_keys', [leaderboard.ALL]))
+
+
+@receiver(post_save, sender=Genre)
+def genre_saved(sender, instance, created, **kwargs):
+    if not created:
+        tasks.refresh_genre_cards.enqueue_on_commit(instance.id)
+
+
+@receiver(pre_delete, sender=Genre)
+def genre_deleting(sender, instance, **kwargs):
+    instance._movie_ids = list(Movie.genres.through.objects.filter(genre_id=instance.id)
+                               .values_list('movie_id', flat=True))
+
+
+@receiver(post_delete, sender=Genre)
+def genre_deleted(sender, instance, **kwargs):
+    tasks.refresh_cards.enqueue_on_commit(getattr(instance, '_movie_ids', []))
+    tasks.rebuild_boards.enqueue_on_commit([leaderboard.genre_key(instance.id)])
+
+
+# кеш запитів: кожна зміна інвалідує теги рядків, від яких залежать збережені результати
+
+@receiver(post_save, sender=Movie)
+def movie_saved_cache(sender, instance, created, **kwargs):
+    tags = [querycache.tag(Movie, instance.id), *querycache.tags_for(Director, [instance.director_id])]
+    if created or getattr(instance, '_previous_year', None) != instance.year:
+        tags.append('movie-years')
+    previous_director = getattr(instance, '_previous_director', None)
+    if previous_director != instance.director_id:
+        tags += querycache.tags_for(Director, [previous_director])
+    querycache.invalidate(*tags)
+
+
+@receiver(post_delete, sender=Movie)
+def movie_deleted_cache(sender, instance, **kwargs):
+    querycache.invalidate(querycache.tag(Movie, instance.id), 'movie-years',
+                          *querycache.tags_for(Director, [instance.director_id]), *getattr(instance, '_cache_tags', []))
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def genre_changed_cache(sender, instance, **kwargs):
+    querycache.invalidate('genre-list', querycache.tag(Genre, instance.id))
+
+
+@receiver(post_save, sender=Actor)
+@receiver(post_delete, sender=Actor)
+@receiver(post_save, sender=Director)
+@receiver(post_delete, sender=Director)
+def person_changed_cache(sender, instance, **kwargs):
+    querycache.invalidate(querycache.tag(sender, instance.id))
+
+
+@receiver(post_save, sender=Feedback)
+@receiver(post_delete, sender=Feedback)
+def movie_child_changed_cache(sender, instance, **kwargs):
+    """Оцінки не входять у кешовані дані сторінки фільму, тож нова оцінка їх не витісняє"""
+    querycache.invalidate(querycache.tag(Movie, instance.movie_id))
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Movie.actors.through)
+def movie_links_changed_cache(sender, instance, action, model, pk_set, **kwargs):
+    """Зв'язки фільм-жанр і фільм-актор з будь-якого боку"""
+    name, other = instance._meta.model_name, model._meta.model_name
+    if action == 'pre_clear':
+        instance._cleared_links = list(sender.objects.filter(**{name: instance.pk}).values_list(
+            f'{other}_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    pks = getattr(instance, '_cleared_links', []) if action == 'post_clear' else pk_set or []
+    querycache.invalidate(querycache.tag(instance, instance.pk), *querycache.tags_for(model, pks))
+
+
+# знімок каталогу: роки, рейтинги, жанри фільмів і слаги
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(post_save, sender=Actor)
+@receiver(post_delete, sender=Actor)
+@receiver(post_save, sender=Director)
+@receiver(post_delete, sender=Director)
+@receiver(post_delete, sender=Genre)
+def catalog_changed(sender, **kwargs):
+    snapshot.schedule_build()
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def catalog_genres_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        snapshot.schedule_build()
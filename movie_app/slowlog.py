@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger('movie_app.slow_queries')
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN \((?:\s*(?:\?|%s)\s*,)*\s*(?:\?|%s)\s*\)', re.IGNORECASE)
+SPACE_RE = re.compile(r'\s+')
+
+_state = threading.local()
+_explained = set()
+_write_lock = threading.Lock()
+
+
+def normalize_sql(sql):
+    """SQL без літералів і з одним місцем підстановки для списків IN (...)"""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def threshold_ms():
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100)
+
+
+def log_path():
+    return getattr(settings, 'SLOW_QUERY_LOG', None)
+
+
+def explain(connection, sql, params):
+    """План запиту; лише для SELECT, щоб EXPLAIN нічого не змінював"""
+    if not sql.lstrip()[:6].upper().startswith(('SELECT', 'WITH')):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    _state.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        _state.explaining = False
+
+
+class SlowQueryLogger:
+    """Обгортка execute_wrapper, що записує запити довші за SLOW_QUERY_THRESHOLD_MS"""
+
+    def __init__(self, view):
+        self.view = view
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_state, 'explaining', False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            if elapsed >= threshold_ms():
+                self.record(sql, params, many, context['connection'], elapsed)
+
+    def record(self, sql, params, many, connection, elapsed):
+        normalized = normalize_sql(sql)
+        fp = fingerprint(normalized)
+        entry = {'t': round(time.time(), 3), 'ms': round(elapsed, 3), 'view': self.view, 'db': connection.alias,
+                 'fp': fp, 'sql': normalized}
+        # план знімається один раз на відбиток у процесі
+        if fp not in _explained and not many:
+            _explained.add(fp)
+            entry['plan'] = explain(connection, sql, params)
+        logger.warning('Slow query %.1f ms in %s [%s]: %s', elapsed, self.view, fp, normalized)
+        path = log_path()
+        if path:
+            line = json.dumps(entry, ensure_ascii=False) + '\n'
+            with _write_lock:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+
+
+def read_entries(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def aggregate(entries):
+    """Зведення записів логу за відбитком запиту"""
+    report = {}
+    for entry in entries:
+        item = report.setdefault(entry['fp'], {
+            'fingerprint': entry['fp'], 'sql': entry['sql'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'views': {}, 'plan': None,
+        })
+        item['count'] += 1
+        item['total_ms'] += entry['ms']
+        item['max_ms'] = max(item['max_ms'], entry['ms'])
+        item['views'][entry['view']] = item['views'].get(entry['view'], 0) + 1
+        if entry.get('plan'):
+            item['plan'] = entry['plan']
+    for item in report.values():
+        item['avg_ms'] = item['total_ms'] / item['count']
+    return list(report.values())
@@ -0,0 +1,124 @@
+import threading
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+
+# кількість базових слагів в одному запиті до бази
+LOOKUP_CHUNK = 100
+
+
+def taken_slugs(queryset, bases, exclude_pks=()):
+    """Зайняті слаги, з якими можуть зіткнутися базові: сам base і base-N (пошук діапазоном по індексу).
+
+    Спершу одним запитом перевіряються точні збіги; діапазон base-N потрібен лише
+    для базових слагів, які вже зайняті або повторюються серед нових.
+    """
+    counts = Counter(bases)
+    bases = sorted(counts)
+    queryset = queryset.exclude(pk__in=exclude_pks)
+    taken = set()
+    for i in range(0, len(bases), LOOKUP_CHUNK * 10):
+        taken.update(queryset.filter(slug__in=bases[i:i + LOOKUP_CHUNK * 10]).values_list('slug', flat=True))
+    colliding = [base for base in bases if base in taken or counts[base] > 1]
+    for i in range(0, len(colliding), LOOKUP_CHUNK):
+        q = Q()
+        for base in colliding[i:i + LOOKUP_CHUNK]:
+            # '.' - наступний символ після '-'
+            q |= Q(slug__gte=f'{base}-', slug__lt=f'{base}.')
+        taken.update(queryset.filter(q).values_list('slug', flat=True))
+    return taken
+
+
+def dedupe(items, taken):
+    """Унікальні слаги для [(ключ, базовий слаг)]: перший отримує base, наступні - base-2, base-3...
+
+    taken - вже зайняті слаги; доповнюється призначеними.
+    """
+    result = {}
+    counters = {}
+    for key, base in items:
+        slug = base
+        n = counters.get(base, 1)
+        while slug in taken:
+            n += 1
+            slug = f'{base}-{n}'
+        counters[base] = n
+        taken.add(slug)
+        result[key] = slug
+    return result
+
+
+def base_slug(obj):
+    return obj.make_slug() or obj._meta.model_name
+
+
+def assign_slugs(objs, bases=None):
+    """Призначає об'єктам унікальні слаги одним проходом; bases - бажані слаги за замовчуванням make_slug()"""
+    objs = list(objs)
+    if not objs:
+        return objs
+    model = type(objs[0])
+    if bases is None:
+        bases = [base_slug(obj) for obj in objs]
+    taken = taken_slugs(model._default_manager.all(), bases, [obj.pk for obj in objs if obj.pk])
+    slugs = dedupe(list(enumerate(bases)), taken)
+    for i, obj in enumerate(objs):
+        obj.slug = slugs[i]
+    return objs
+
+
+def assign_slug(obj, base=None):
+    assign_slugs([obj], None if base is None else [base])
+    return obj.slug
+
+
+def write_slugs(model, objs, batch_size=1000):
+    """Запис нових слагів через тимчасові значення, щоб обмін слагами між рядками не порушив унікальність"""
+    objs = list(objs)
+    final = [obj.slug for obj in objs]
+    for obj in objs:
+        obj.slug = f'~{obj.pk}'
+    model._default_manager.bulk_update(objs, ['slug'], batch_size=batch_size)
+    for obj, slug in zip(objs, final):
+        obj.slug = slug
+    model._default_manager.bulk_update(objs, ['slug'], batch_size=batch_size)
+
+
+class SlugResolver:
+    """LRU кеш slug -> pk у пам'яті процесу, щоб сторінки деталей вибирали запис за первинним ключем"""
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get_size(self):
+        return self.maxsize or getattr(settings, 'SLUG_CACHE_SIZE', 10000)
+
+    def get(self, model, slug):
+        key = (model._meta.label_lower, slug)
+        with self.lock:
+            pk = self.entries.get(key)
+            if pk is not None:
+                self.entries.move_to_end(key)
+            return pk
+
+    def put(self, model, slug, pk):
+        key = (model._meta.label_lower, slug)
+        with self.lock:
+            self.entries[key] = pk
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.get_size():
+                self.entries.popitem(last=False)
+
+    def discard(self, model, slug):
+        with self.lock:
+            self.entries.pop((model._meta.label_lower, slug), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+resolver = SlugResolver()
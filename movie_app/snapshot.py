@@ -0,0 +1,240 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from django.conf import settings
+
+from .models import Movie, Actor, Director
+
+MAGIC = b'MCATSNP1'
+# магічні байти і довжина JSON заголовка
+PREAMBLE = struct.Struct('<8sI')
+ALIGN = 8
+# моделі, для яких у знімку є таблиця slug -> pk
+SLUG_MODELS = (Movie, Actor, Director)
+# пороги рейтингу IMDB з окремими бітовими масками (rating_imdb >= поріг)
+RATING_THRESHOLDS = range(11)
+# номери встановлених бітів для кожного значення байта маски
+BIT_POSITIONS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+
+def snapshot_path():
+    return getattr(settings, 'CATALOG_SNAPSHOT_PATH', None)
+
+
+def build_delay():
+    return getattr(settings, 'CATALOG_SNAPSHOT_BUILD_DELAY', 0)
+
+
+def schedule_build():
+    """Перебудова знімка фоновим завданням після фіксації транзакції.
+
+    Завдання в черзі запускається через build_delay() секунд, і всі зміни за цей час, наприклад серія
+    збережень в адмінці, зливаються в одну перебудову.
+    """
+    if snapshot_path():
+        from . import tasks
+        tasks.build_snapshot.enqueue_on_commit()
+
+
+class Bitset:
+    """Бітова множина рядків фільмів; біт i - i-й фільм у порядку id"""
+
+    def __init__(self, size):
+        self.data = bytearray((size + 7) // 8)
+
+    def add(self, index):
+        self.data[index >> 3] |= 1 << (index & 7)
+
+
+def _slug_table(model):
+    """Слаги, відсортовані як байти UTF-8: зміщення (n + 1), суцільний блок байтів і pk"""
+    rows = sorted((slug.encode(), pk) for pk, slug in model.objects.values_list('pk', 'slug').order_by() if slug)
+    offsets, pks, blob = array('I', [0]), array('q'), bytearray()
+    for slug, pk in rows:
+        blob += slug
+        offsets.append(len(blob))
+        pks.append(pk)
+    return offsets, bytes(blob), pks
+
+
+def build(path=None):
+    """Компіляція каталогу в один файл з масивами; файл замінюється атомарно. Повертає заголовок"""
+    path = path or snapshot_path()
+    started = time.perf_counter()
+    movies = list(Movie.objects.order_by('id').values_list('id', 'year', 'rating_imdb'))
+    row = {movie_id: i for i, (movie_id, _, _) in enumerate(movies)}
+    size = len(movies)
+
+    sections = {'movie_ids': array('q', [movie_id for movie_id, _, _ in movies])}
+    genres, any_genre = {}, Bitset(size)
+    for genre_id, movie_id in Movie.genres.through.objects.values_list('genre_id', 'movie_id').order_by():
+        genres.setdefault(genre_id, Bitset(size)).add(row[movie_id])
+        any_genre.add(row[movie_id])
+    years = {}
+    ratings = {threshold: Bitset(size) for threshold in RATING_THRESHOLDS}
+    for i, (_, year, rating_imdb) in enumerate(movies):
+        years.setdefault(year, Bitset(size)).add(i)
+        for threshold in RATING_THRESHOLDS:
+            if rating_imdb is not None and rating_imdb >= threshold:
+                ratings[threshold].add(i)
+    # ключі індексу відсортовані, маски йдуть підряд у тому самому порядку
+    for name, masks in (('genre', genres), ('year', years), ('rating', ratings)):
+        keys = sorted(masks)
+        sections[f'{name}_keys'] = array('q', keys)
+        sections[f'{name}_masks'] = b''.join(bytes(masks[key].data) for key in keys)
+    sections['any_genre_mask'] = bytes(any_genre.data)
+    for model in SLUG_MODELS:
+        name = model._meta.model_name
+        sections[f'{name}_slug_offsets'], sections[f'{name}_slug_blob'], sections[f'{name}_slug_pks'] = \
+            _slug_table(model)
+
+    header = {
+        'version': time.time_ns(),
+        'byteorder': sys.byteorder,
+        'movies': size,
+        'mask_bytes': (size + 7) // 8,
+        'sections': {},
+    }
+    body = bytearray()
+    for name, data in sections.items():
+        typecode = data.typecode if isinstance(data, array) else 'B'
+        raw = data.tobytes() if isinstance(data, array) else data
+        body += b'\0' * (-len(body) % ALIGN)
+        header['sections'][name] = [len(body), len(raw), typecode]
+        body += raw
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b' ' * (-(PREAMBLE.size + len(header_bytes)) % ALIGN)
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    # процеси, що вже відобразили старий файл, читають його до перевірки нової версії
+    os.replace(tmp, path)
+    header['seconds'] = time.perf_counter() - started
+    header['bytes'] = os.path.getsize(path)
+    return header
+
+
+class Snapshot:
+    """Знімок каталогу, відображений у пам'ять лише для читання; сторінки спільні для всіх процесів"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = PREAMBLE.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a catalog snapshot')
+        self.header = json.loads(self.mm[PREAMBLE.size:PREAMBLE.size + header_size])
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError(f'{path} was built on a machine with a different byte order')
+        self.base = PREAMBLE.size + header_size
+        self.version = self.header['version']
+        self.mask_bytes = self.header['mask_bytes']
+        view = memoryview(self.mm)
+        self.arrays = {}
+        for name, (offset, length, typecode) in self.header['sections'].items():
+            self.arrays[name] = view[self.base + offset:self.base + offset + length].cast(typecode)
+
+    def section_offset(self, name):
+        return self.base + self.header['sections'][name][0]
+
+    def slug_pk(self, model, slug):
+        """pk за слагом бінарним пошуком у відсортованій таблиці; None, якщо слага немає"""
+        name = model._meta.model_name
+        offsets = self.arrays.get(f'{name}_slug_offsets')
+        if offsets is None:
+            return None
+        blob = self.section_offset(f'{name}_slug_blob')
+        key = slug.encode()
+        lo, hi = 0, len(offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.mm[blob + offsets[mid]:blob + offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(offsets) - 1 and self.mm[blob + offsets[lo]:blob + offsets[lo + 1]] == key:
+            return self.arrays[f'{name}_slug_pks'][lo]
+        return None
+
+    def _mask(self, name, key):
+        """Маска для ключа індексу як ціле число (0, якщо ключа немає)"""
+        keys = self.arrays[f'{name}_keys']
+        lo, hi = 0, len(keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys[mid] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(keys) or keys[lo] != key:
+            return 0
+        start = self.section_offset(f'{name}_masks') + lo * self.mask_bytes
+        return int.from_bytes(self.mm[start:start + self.mask_bytes], 'little')
+
+    def filter_ids(self, years=None, genre_ids=None, min_rating=None):
+        """Id фільмів за роками, будь-яким із жанрів і цілим мінімальним рейтингом IMDB; None - без обмеження,
+        крім жанрів: тоді фільм має мати хоча б один жанр, як у фільтрі через ORM"""
+        if genre_ids is None:
+            start = self.section_offset('any_genre_mask')
+            mask = int.from_bytes(self.mm[start:start + self.mask_bytes], 'little')
+        else:
+            mask = 0
+            for genre_id in genre_ids:
+                mask |= self._mask('genre', genre_id)
+        if years is not None and mask:
+            year_mask = 0
+            for year in years:
+                year_mask |= self._mask('year', year)
+            mask &= year_mask
+        if min_rating is not None and mask:
+            # маски є лише для цілих порогів, як у панелі фільтрів
+            mask &= self._mask('rating', max(min_rating, 0))
+        ids = self.arrays['movie_ids']
+        result = []
+        # маска розкладається по байтах: нульові пропускаються, біти решти беруться з таблиці
+        for i, byte in enumerate(mask.to_bytes(self.mask_bytes, 'little')):
+            if byte:
+                row = i << 3
+                result.extend(ids[row + bit] for bit in BIT_POSITIONS[byte])
+        return result
+
+
+_current = None
+_checked = 0
+_lock = threading.Lock()
+
+
+def current():
+    """Чинний знімок процесу; новий файл підхоплюється не частіше ніж раз на CATALOG_SNAPSHOT_CHECK_SECONDS"""
+    global _current, _checked
+    path = snapshot_path()
+    if not path:
+        return None
+    now = time.monotonic()
+    if now - _checked < getattr(settings, 'CATALOG_SNAPSHOT_CHECK_SECONDS', 1):
+        return _current
+    with _lock:
+        _checked = now
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            _current = None
+            return None
+        if _current is None or (_current.stat.st_ino, _current.stat.st_mtime_ns) != (stat.st_ino, stat.st_mtime_ns):
+            try:
+                _current = Snapshot(path)
+            except (OSError, ValueError):
+                _current = None
+        return _current
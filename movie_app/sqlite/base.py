@@ -0,0 +1,19 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite з вибором режиму транзакцій через OPTIONS['transaction_mode']
+
+    З IMMEDIATE транзакція одразу бере блокування запису і чекає його з busy_timeout,
+    замість миттєвої помилки "database is locked", коли транзакція, що почалася з
+    читання, намагається писати під час запису з іншого з'єднання.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        mode = getattr(self, 'transaction_mode', None)
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import registry
+from .models import Task
+
+logger = logging.getLogger('movie_app.tasks')
+
+# зареєстровані завдання: назва -> TaskFunction
+TASKS = {}
+
+
+class TaskFunction:
+    """Функція, яку можна викликати напряму або поставити в чергу"""
+
+    def __init__(self, func, name, priority=0, max_attempts=3, unique=False, delay=0):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.unique = unique
+        self.delay = delay
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def dedupe_key(self, args, kwargs):
+        """Для unique завдань ключ будується з назви і аргументів"""
+        if not self.unique:
+            return None
+        key = f'{self.name}:{json.dumps([args, kwargs], sort_keys=True, default=str)}'
+        if len(key) > 200:
+            key = f'{self.name}:{hashlib.sha1(key.encode()).hexdigest()}'
+        return key
+
+    def get_delay(self):
+        """Секунди від постановки до запуску; delay може бути функцією, що читає налаштування"""
+        return self.delay() if callable(self.delay) else self.delay
+
+    def enqueue(self, *args, **kwargs):
+        return enqueue(self, args, kwargs, delay=self.get_delay())
+
+    def enqueue_on_commit(self, *args, **kwargs):
+        """Постановка в чергу після фіксації поточної транзакції, щоб воркер побачив зміни.
+
+        Однаковий виклик unique завдання в тій самій транзакції ставиться лише раз.
+        """
+        using = router.db_for_write(Task)
+        key = self.dedupe_key(args, kwargs)
+        connection = connections[using]
+        if key and connection.in_atomic_block and any(
+                getattr(entry[1], 'dedupe_key', None) == key for entry in connection.run_on_commit):
+            return
+
+        def callback():
+            # виконаний виклик більше не поглинає нові
+            callback.dedupe_key = None
+            enqueue(self, args, kwargs, delay=self.get_delay())
+
+        callback.dedupe_key = key
+        transaction.on_commit(callback, using=using)
+
+
+def task(name=None, priority=0, max_attempts=3, unique=False, delay=0):
+    """Декоратор реєстрації завдання; unique - однакові виклики, що очікують, не дублюються.
+
+    delay відкладає запуск поставленого в чергу завдання: разом з unique усі виклики за цей час
+    зливаються в одне завдання. Із TASKS_EAGER завдання виконується одразу.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        TASKS[task_name] = TaskFunction(func, task_name, priority, max_attempts, unique, delay)
+        return TASKS[task_name]
+    return decorator
+
+
+def is_eager():
+    return getattr(settings, 'TASKS_EAGER', settings.DEBUG)
+
+
+def run_eager(func, args, kwargs):
+    """Виконання в процесі, що поставив завдання; помилка записується в лог, а не ламає вже зафіксований запит"""
+    started = time.perf_counter()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        status = Task.FAILED
+        logger.exception('Task %s%r failed', func.name, tuple(args))
+    else:
+        status = Task.DONE
+    registry.inc('tasks_total', task=func.name, status=status)
+    registry.observe('task_duration_seconds', time.perf_counter() - started, task=func.name)
+
+
+def enqueue(func, args=(), kwargs=None, priority=None, delay=0):
+    """Запис завдання в чергу; з TASKS_EAGER виконується одразу в цьому процесі"""
+    kwargs = kwargs or {}
+    if is_eager():
+        run_eager(func, args, kwargs)
+        return
+    # INSERT OR IGNORE: завдання з таким самим ключем уже очікує
+    Task.objects.bulk_create([Task(
+        name=func.name, args=list(args), kwargs=kwargs, dedupe_key=func.dedupe_key(args, kwargs),
+        priority=func.priority if priority is None else priority, max_attempts=func.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )], ignore_conflicts=True)
+    registry.inc('tasks_enqueued_total', task=func.name)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim(worker, limit=1, names=None):
+    """Забирає найпріоритетніші завдання, час яких настав, і позначає їх як виконувані"""
+    now = timezone.now()
+    using = router.db_for_write(Task)
+    with transaction.atomic(using=using):
+        queryset = Task.objects.using(using).filter(status=Task.PENDING, run_at__lte=now)
+        if names:
+            queryset = queryset.filter(name__in=names)
+        if connections[using].features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        # на SQLite транзакція BEGIN IMMEDIATE вже виключає одночасне захоплення
+        ids = list(queryset.order_by('-priority', 'run_at', 'id').values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        Task.objects.using(using).filter(id__in=ids, status=Task.PENDING).update(
+            status=Task.RUNNING, worker=worker, started=now, attempts=F('attempts') + 1)
+        return list(Task.objects.using(using).filter(id__in=ids, status=Task.RUNNING, worker=worker))
+
+
+def run(task_row):
+    """Виконує захоплене завдання, записує результат і метрики; повертає новий стан"""
+    started = time.perf_counter()
+    try:
+        func = TASKS.get(task_row.name)
+        if func is None:
+            raise LookupError(f'Unknown task {task_row.name}')
+        func(*task_row.args, **task_row.kwargs)
+    except Exception:
+        status = _failed(task_row, traceback.format_exc(), time.perf_counter() - started)
+    else:
+        status = Task.DONE
+        Task.objects.filter(pk=task_row.pk).update(status=status, finished=timezone.now(),
+                                                   duration=time.perf_counter() - started, error='')
+    duration = time.perf_counter() - started
+    registry.inc('tasks_total', task=task_row.name, status=status)
+    registry.observe('task_duration_seconds', duration, task=task_row.name)
+    registry.flush()
+    return status
+
+
+def retry_delay(attempts):
+    """Експоненційна затримка між спробами"""
+    return getattr(settings, 'TASKS_RETRY_DELAY', 10) * 2 ** (attempts - 1)
+
+
+def _failed(task_row, error, duration):
+    fields = {'finished': timezone.now(), 'duration': duration, 'error': error}
+    if task_row.attempts < task_row.max_attempts:
+        try:
+            with transaction.atomic(using=router.db_for_write(Task)):
+                Task.objects.filter(pk=task_row.pk).update(
+                    status=Task.PENDING, run_at=timezone.now() + timedelta(seconds=retry_delay(task_row.attempts)),
+                    **fields)
+            return Task.PENDING
+        except IntegrityError:
+            # те саме завдання вже знову в черзі і виконає цю роботу
+            fields['error'] += '\nSuperseded by a pending task with the same dedupe key.'
+    Task.objects.filter(pk=task_row.pk).update(status=Task.FAILED, **fields)
+    return Task.FAILED
+
+
+def requeue_stale():
+    """Завдання воркерів, що зупинилися посеред виконання, повертаються в чергу"""
+    limit = timezone.now() - timedelta(seconds=getattr(settings, 'TASKS_STALE_SECONDS', 600))
+    count = 0
+    for task_row in Task.objects.using(router.db_for_write(Task)).filter(status=Task.RUNNING, started__lt=limit):
+        if _failed(task_row, 'Worker stopped while running the task.', None) == Task.PENDING:
+            count += 1
+    return count
+
+
+def purge():
+    """Видалення виконаних завдань старших за TASKS_KEEP_SECONDS"""
+    limit = timezone.now() - timedelta(seconds=getattr(settings, 'TASKS_KEEP_SECONDS', 86400))
+    return Task.objects.filter(status=Task.DONE, finished__lt=limit).delete()[0]
+
+
+def work(worker=None, stop=None, once=False, poll=1.0, names=None, max_tasks=None):
+    """Цикл воркера; once - завершитися, коли черга порожня. Повертає кількість завдань за станами"""
+    from . import tasks  # noqa: F401 - реєстрація завдань у процесах multiprocessing
+
+    worker = worker or worker_name()
+    results = {}
+    housekeeping = 0
+    try:
+        while not (stop and stop.is_set()):
+            if time.monotonic() - housekeeping > 60:
+                housekeeping = time.monotonic()
+                requeue_stale()
+                purge()
+            claimed = claim(worker, names=names)
+            if not claimed:
+                if once:
+                    break
+                if stop:
+                    stop.wait(poll)
+                else:
+                    time.sleep(poll)
+                continue
+            for task_row in claimed:
+                status = run(task_row)
+                results[status] = results.get(status, 0) + 1
+            if max_tasks and sum(results.values()) >= max_tasks:
+                break
+    finally:
+        connections.close_all()
+    return results
@@ -0,0 +1,43 @@
+from . import cards, leaderboard, snapshot
+from .models import Movie, UploadedImage
+from .taskqueue import task
+
+
+@task(name='refresh_movie', priority=5, unique=True)
+def refresh_movie(movie_id):
+    """Картка фільму і його місце в рейтингах кращих"""
+    cards.refresh_cards([movie_id])
+    leaderboard.refresh_movie(movie_id)
+
+
+@task(name='refresh_cards')
+def refresh_cards(movie_ids):
+    cards.refresh_cards(movie_ids)
+
+
+@task(name='refresh_genre_cards', unique=True)
+def refresh_genre_cards(genre_id):
+    """Назви жанру в картках усіх його фільмів"""
+    cards.refresh_cards(Movie.genres.through.objects.filter(genre_id=genre_id).values_list('movie_id', flat=True))
+
+
+@task(name='rebuild_boards', unique=True)
+def rebuild_boards(keys):
+    leaderboard.rebuild_boards(keys)
+
+
+@task(name='make_thumbnail', unique=True)
+def make_thumbnail(image_id):
+    """Мініатюра завантаженого через CKEditor зображення"""
+    from . import uploads
+
+    image = UploadedImage.objects.filter(pk=image_id).first()
+    if image is not None:
+        uploads.make_thumbnail(image)
+
+
+@task(name='build_snapshot', unique=True, delay=snapshot.build_delay)
+def build_snapshot():
+    """Знімок каталогу для всіх процесів вебсервера"""
+    if snapshot.snapshot_path():
+        snapshot.build()
@@ -1,3 +1,1409 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from admin_interface.models import Theme
+from django import forms as django_forms
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import (cards, db, dedupe, leaderboard, metrics, profiling, querycache, search, slowlog, slugs, snapshot,
+               taskqueue, trending, uploads, warmup)
+from .admin import DirectorFilter, EstimatedCountPaginator, FeedbackInline
+from .importer import CatalogImporter, InvalidRecord, RecordReader, normalize_name
+from .management.commands import replay_log
+from .models import (Movie, Actor, Director, Genre, MovieCard, Rating, Feedback, MovieScore, Leaderboard,
+                     TrendingBucket, MovieTrend, Task, UploadedImage)
+from .slugs import SlugResolver, assign_slugs, resolver
+from .sqlite.base import DatabaseWrapper as SQLiteWrapper
+
+
+@override_settings(TASKS_EAGER=True, CATALOG_SNAPSHOT_PATH=None, METRICS_DIR=None, LEADERBOARD_SIZE=3)
+class CatalogTestCase(TestCase):
+    """Завдання виконуються одразу після фіксації, кеші процесу порожні на початку кожного тесту"""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        resolver.clear()
+        # інакше буфер переглядів записався б під час виходу процесу вже в робочу базу
+        self.addCleanup(trending._pending.clear)
+
+    def make_movie(self, name, year=2000, rating_imdb='7.0', genres=(), **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            kwargs.setdefault('original_name', name)
+            kwargs.setdefault('description', '')
+            movie = Movie.objects.create(name=name, year=year, length=100, rating_imdb=Decimal(rating_imdb),
+                                         **kwargs)
+            movie.genres.set(genres)
+        return movie
+
+    def rate(self, movie, rating, ip='10.0.0.1', **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Rating.objects.create(movie=movie, rating=Decimal(str(rating)), ip=ip, **kwargs)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(METRICS_DIR=self.directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def dead_pid(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        return process.pid
+
+    def write(self, name, value):
+        registry = metrics.Registry()
+        # лічильник, який застосунок не пише: в collect() входять і метрики самого процесу тестів
+        registry.inc('test_events_total', value)
+        metrics._write(os.path.join(self.directory.name, name), registry.counters, registry.histograms)
+
+    def total(self):
+        return metrics.collect()[0].get(('test_events_total', ()), 0)
+
+    def test_dead_process_files_are_merged_and_removed(self):
+        self.write(f'{self.dead_pid()}-aaaa.json', 5)
+        self.write(f'{self.dead_pid()}-bbbb.json', 2)
+        self.assertEqual(self.total(), 7)
+        self.assertEqual(set(os.listdir(self.directory.name)),
+                         {'.lock', metrics.RETIRED, metrics.registry.filename()})
+        self.write(f'{self.dead_pid()}-cccc.json', 1)
+        self.assertEqual(self.total(), 8)
+        self.assertEqual(self.total(), 8)
+
+    def test_live_process_keeps_its_file(self):
+        self.write(f'{os.getpid()}-other.json', 3)
+        self.assertEqual(self.total(), 3)
+        self.assertIn(f'{os.getpid()}-other.json', os.listdir(self.directory.name))
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_requires_allowed_ip_or_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5',
+                                         HTTP_X_FORWARDED_FOR='127.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5',
+                                         HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.5', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertContains(response, '# TYPE http_requests_total counter')
+
+    def test_file_name_is_unique_per_process(self):
+        registry = metrics.Registry()
+        name = registry.filename()
+        self.assertTrue(name.startswith(f'{os.getpid()}-'))
+        self.assertEqual(registry.filename(), name)
+        self.assertNotEqual(metrics.Registry().filename(), name)
+
+
+class LeaderboardTests(CatalogTestCase):
+    def score(self, movie):
+        return MovieScore.objects.get(movie=movie)
+
+    def board(self, key=leaderboard.ALL):
+        return Leaderboard.objects.get(key=key).movie_ids
+
+    def test_rating_deltas(self):
+        movie, other = self.make_movie('A'), self.make_movie('B')
+        rating = self.rate(movie, 8)
+        self.rate(movie, 6, ip='10.0.0.2')
+        self.assertEqual((self.score(movie).rating_count, self.score(movie).rating_sum), (2, Decimal('14')))
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.rating = Decimal('9')
+            rating.save()
+        self.assertEqual((self.score(movie).rating_count, self.score(movie).rating_sum), (2, Decimal('15')))
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.movie = other
+            rating.save()
+        self.assertEqual((self.score(movie).rating_count, self.score(movie).rating_sum), (1, Decimal('6')))
+        self.assertEqual((self.score(other).rating_count, self.score(other).rating_sum), (1, Decimal('9')))
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.delete()
+        self.assertEqual((self.score(other).rating_count, self.score(other).rating_sum), (0, Decimal('0')))
+
+    def test_score_matches_full_rebuild(self):
+        # середня оцінка кешується, тож порівнюються оцінки з тим самим середнім, яке порахує rebuild_all
+        caches['default'].set(leaderboard.MEAN_CACHE_KEY, 7.0)
+        movies = [self.make_movie(f'M{i}', rating_imdb=f'{5 + i}.0') for i in range(4)]
+        for i, (movie, rating) in enumerate([(0, 6), (0, 8), (1, 8), (2, 6)]):
+            self.rate(movies[movie], rating, ip=f'10.0.0.{i}')
+        incremental = {score.movie_id: score.score for score in MovieScore.objects.all()}
+        boards = {board.key: board.movie_ids for board in Leaderboard.objects.all()}
+        leaderboard.rebuild_all()
+        self.assertEqual(incremental, {score.movie_id: score.score for score in MovieScore.objects.all()})
+        self.assertEqual(boards, {board.key: board.movie_ids for board in Leaderboard.objects.all()})
+
+    def test_movie_falls_out_and_outsider_takes_its_place(self):
+        movies = [self.make_movie(f'M{i}', rating_imdb=f'{9 - i}.0') for i in range(4)]
+        self.assertEqual(self.board(), [movie.id for movie in movies[:3]])
+        with self.captureOnCommitCallbacks(execute=True):
+            movies[0].rating_imdb = Decimal('1.0')
+            movies[0].save()
+        self.assertEqual(self.board(), [movie.id for movie in movies[1:]])
+        with self.captureOnCommitCallbacks(execute=True):
+            movies[0].rating_imdb = Decimal('9.5')
+            movies[0].save()
+        self.assertEqual(self.board(), [movie.id for movie in movies[:3]])
+
+    def test_genre_and_decade_boards(self):
+        drama, comedy = Genre.objects.create(name='Drama'), Genre.objects.create(name='Comedy')
+        old = self.make_movie('Old', year=1975, genres=[drama])
+        new = self.make_movie('New', year=2005, rating_imdb='8.0', genres=[drama, comedy])
+        self.assertEqual(self.board(leaderboard.genre_key(drama.id)), [new.id, old.id])
+        self.assertEqual(self.board(leaderboard.genre_key(comedy.id)), [new.id])
+        self.assertEqual(self.board(leaderboard.decade_key(1979)), [old.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            new.genres.remove(comedy)
+        self.assertEqual(self.board(leaderboard.genre_key(comedy.id)), [])
+
+    def test_best_movies_rejects_bad_board(self):
+        genre = Genre.objects.create(name='Drama')
+        self.assertEqual(self.client.get('/best/', {'genre': genre.id}).status_code, 200)
+        for query in ({'genre': 'abc'}, {'genre': '-1'}, {'genre': genre.id + 1}, {'decade': '19x0'}):
+            self.assertEqual(self.client.get('/best/', query).status_code, 404, query)
+
+
+class TrendingTests(CatalogTestCase):
+    def buckets(self, movie):
+        return dict(TrendingBucket.objects.filter(movie=movie).values_list('start', 'ratings'))
+
+    def log_score(self, movie):
+        return MovieTrend.objects.filter(movie=movie).values_list('log_score', flat=True).first()
+
+    def test_score_halves_every_half_life(self):
+        now = datetime(2024, 3, 1, 12, tzinfo=timezone.utc)
+        log_score = trending.log_component(1, trending.VIEW, now)
+        self.assertAlmostEqual(trending.current_score(log_score, now), 1)
+        later = now + timedelta(seconds=trending.half_life())
+        self.assertAlmostEqual(trending.current_score(log_score, later), 0.5)
+        self.assertAlmostEqual(trending.current_score(trending.log_add(log_score, log_score), later), 1)
+
+    def test_log_sub_undoes_log_add(self):
+        a, b = trending.log_component(2, trending.VIEW, trending.TRENDING_EPOCH), 3.5
+        self.assertAlmostEqual(trending.log_sub(trending.log_add(a, b), b), a)
+        self.assertIsNone(trending.log_sub(b, b))
+        self.assertIsNone(trending.log_sub(None, b))
+
+    def test_recent_events_rank_higher(self):
+        today = date.today()
+        old, new = self.make_movie('Old'), self.make_movie('New')
+        for i in range(3):
+            self.rate(old, 7, ip=f'10.0.0.{i}', viewed_date=today - timedelta(days=10))
+        self.rate(new, 7, viewed_date=today)
+        ranked = trending.trending(10)
+        self.assertEqual([item['movie'] for item in ranked], [new, old])
+        self.assertEqual([item['ratings_7d'] for item in ranked], [1, 0])
+
+    def test_changed_viewed_date_moves_the_event(self):
+        movie = self.make_movie('A')
+        today = date.today()
+        rating = self.rate(movie, 7, viewed_date=today - timedelta(days=3))
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.viewed_date = today
+            rating.save()
+        self.assertEqual(self.buckets(movie), {today - timedelta(days=3): 0, today: 1})
+        incremental = self.log_score(movie)
+        trending.rebuild()
+        self.assertAlmostEqual(incremental, self.log_score(movie))
+
+    def test_moved_rating_follows_the_movie(self):
+        movie, other = self.make_movie('A'), self.make_movie('B')
+        rating = self.rate(movie, 7)
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.movie = other
+            rating.save()
+        self.assertIsNone(self.log_score(movie))
+        self.assertEqual(self.buckets(other), {date.today(): 1})
+
+    def test_deleted_rating_is_subtracted(self):
+        movie = self.make_movie('A')
+        kept = self.rate(movie, 7, ip='10.0.0.1')
+        rating = self.rate(movie, 7, ip='10.0.0.2', viewed_date=date.today() - timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.delete()
+        incremental = self.log_score(movie)
+        trending.rebuild()
+        self.assertAlmostEqual(incremental, self.log_score(movie))
+        with self.captureOnCommitCallbacks(execute=True):
+            kept.delete()
+        self.assertIsNone(self.log_score(movie))
+        self.assertEqual(set(self.buckets(movie).values()), {0})
+
+    @override_settings(TRENDING_FLUSH_SECONDS=3600)
+    def test_buffered_views_are_written_at_exit(self):
+        movie = self.make_movie('A')
+        trending.flush()
+        self.client.get(movie.get_url())
+        self.client.get(movie.get_url())
+        self.assertFalse(TrendingBucket.objects.filter(movie=movie, views__gt=0).exists())
+        trending.flush_at_exit()
+        self.assertEqual(TrendingBucket.objects.get(movie=movie).views, 2)
+        self.assertFalse(trending._pending)
+
+    def test_delete_after_compaction_uses_week_bucket(self):
+        movie = self.make_movie('A')
+        viewed = date.today() - timedelta(days=30)
+        rating = self.rate(movie, 7, viewed_date=viewed)
+        trending.compact(date.today())
+        week = TrendingBucket.objects.get(movie=movie, period=TrendingBucket.WEEK)
+        self.assertEqual((week.start, week.ratings), (trending.week_start(viewed), 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.delete()
+        week.refresh_from_db()
+        self.assertEqual(week.ratings, 0)
+
+
+class TermSearchTests(CatalogTestCase):
+    def movies(self, term):
+        return set(Movie.objects.filter(search.term_q(term, search.MOVIE_SEARCH_FIELDS))
+                   .values_list('name', flat=True))
+
+    def ratings(self, term):
+        return set(Rating.objects.filter(search.term_q(term, search.RATING_SEARCH_FIELDS))
+                   .values_list('ip', flat=True))
+
+    def test_movie_terms(self):
+        self.make_movie('Ворошиловський стрілець', original_name='Voroshilov Sharpshooter', year=1999,
+                        rating_imdb='7.9')
+        self.make_movie('1917', year=2019, rating_imdb='8.2')
+        self.make_movie('Брат', original_name='Brother', year=1997, rating_imdb='7.9')
+        self.assertEqual(self.movies('1917'), {'1917'})
+        self.assertEqual(self.movies('2019'), {'1917'})
+        self.assertEqual(self.movies('1990-1998'), {'Брат'})
+        self.assertEqual(self.movies('>8'), {'1917'})
+        self.assertEqual(self.movies('7,9'), {'Брат', 'Ворошиловський стрілець'})
+        self.assertEqual(self.movies('ворош'), {'Ворошиловський стрілець'})
+        self.assertEqual(self.movies('>20000'), set())
+
+    def test_rating_terms(self):
+        movie = self.make_movie('A')
+        self.rate(movie, 8, ip='192.168.0.1', viewed_date=date(2022, 5, 3))
+        self.rate(movie, 6, ip='10.0.0.1', viewed_date=date(2023, 1, 10))
+        self.assertEqual(self.ratings('2022-05'), {'192.168.0.1'})
+        self.assertEqual(self.ratings('2023'), {'10.0.0.1'})
+        self.assertEqual(self.ratings('>7'), {'192.168.0.1'})
+        self.assertEqual(self.ratings('6'), {'10.0.0.1'})
+        self.assertEqual(self.ratings('192.168'), {'192.168.0.1'})
+
+    def test_full_text_index_follows_changes(self):
+        movie = self.make_movie('Амелі', original_name='Le Fabuleux Destin d\'Amélie Poulain')
+        self.make_movie('Destiny', year=2001)
+        self.assertEqual(self.movies('amelie'), {'Амелі'})
+        self.assertEqual(self.movies('fab dest'), {'Амелі'})
+        self.assertEqual(self.movies('dest'), {'Амелі', 'Destiny'})
+        # підрядок усередині слова не знаходиться
+        self.assertEqual(self.movies('estin'), set())
+        Movie.objects.filter(pk=movie.pk).update(original_name='Amelie')
+        self.assertEqual(self.movies('fab'), set())
+        self.assertEqual(self.movies('amel'), {'Амелі'})
+        Movie.objects.filter(pk=movie.pk).delete()
+        self.assertEqual(self.movies('amel'), set())
+
+    def test_number_out_of_rating_range_falls_back_to_ip_prefix(self):
+        movie = self.make_movie('A')
+        self.rate(movie, 10, ip='172.16.0.1')
+        self.rate(movie, 7, ip='10.1.2.3')
+        # 10 - оцінка, а не початок IP
+        self.assertEqual(self.ratings('10'), {'172.16.0.1'})
+        self.assertEqual(self.ratings('172'), {'172.16.0.1'})
+        # дробове число поза межами оцінки і неповна адреса шукаються як префікс
+        self.assertEqual(self.ratings('10.1'), {'10.1.2.3'})
+        self.assertEqual(self.ratings('10.'), {'10.1.2.3'})
+
+    def test_admin_changelists_use_term_search(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.make_movie('1917', year=2019)
+        self.make_movie('Брат', year=1997)
+        response = self.client.get('/admin/movie_app/movie/', {'q': '>2000'})
+        self.assertEqual([movie.name for movie in response.context['cl'].result_list], ['1917'])
+        response = self.client.get('/admin/movie_app/rating/', {'q': '2022-05'})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(ADMIN_COUNT_THRESHOLD=5)
+class EstimatedCountPaginatorTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        movie = self.make_movie('A')
+        Feedback.objects.bulk_create([Feedback(email='a@example.com', name='Name', surname=f'S{i % 2}', feed='',
+                                               movie=movie) for i in range(10)])
+
+    def count(self, queryset):
+        return EstimatedCountPaginator(queryset, 2).count
+
+    def test_small_results_are_exact(self):
+        third = Feedback.objects.order_by('pk')[2].pk
+        self.assertEqual(self.count(Feedback.objects.filter(pk__lte=third).order_by('-id')), 3)
+
+    def test_unfiltered_large_table_uses_max_pk(self):
+        Feedback.objects.filter(pk__in=Feedback.objects.order_by('pk').values('pk')[:3]).delete()
+        self.assertEqual(Feedback.objects.count(), 7)
+        self.assertEqual(self.count(Feedback.objects.order_by('-id')), Feedback.objects.order_by('-pk')[0].pk)
+
+    def test_filtered_large_count_is_exact_and_cached(self):
+        queryset = Feedback.objects.filter(name='Name').order_by('-id')
+        self.assertEqual(self.count(queryset), 10)
+        Feedback.objects.filter(pk=Feedback.objects.order_by('pk')[0].pk).delete()
+        self.assertEqual(self.count(queryset), 10)
+        caches['default'].clear()
+        self.assertEqual(self.count(queryset), 9)
+
+
+class SlugTests(CatalogTestCase):
+    def test_dedupe_suffixes_in_order(self):
+        taken = {'matrix', 'matrix-2'}
+        self.assertEqual(slugs.dedupe([(1, 'matrix'), (2, 'heat'), (3, 'heat'), (4, 'matrix')], taken),
+                         {1: 'matrix-3', 2: 'heat', 3: 'heat-2', 4: 'matrix-4'})
+        self.assertTrue({'matrix-3', 'heat', 'heat-2', 'matrix-4'} <= taken)
+
+    def test_saved_objects_get_unique_slugs(self):
+        first = self.make_movie('Matrix')
+        second = self.make_movie('Matrix 2', original_name='Matrix')
+        third = self.make_movie('Matrix 3', original_name='Matrix')
+        self.assertEqual([first.slug, second.slug, third.slug], ['matrix', 'matrix-2', 'matrix-3'])
+        # збережений знову об'єкт не конфліктує сам із собою
+        second.save()
+        self.assertEqual(second.slug, 'matrix-2')
+        actors = assign_slugs([Actor(first_name='Іван', last_name='Франко') for _ in range(2)])
+        self.assertEqual([actor.slug for actor in actors], ['іван-франко', 'іван-франко-2'])
+
+    def test_resolver_evicts_least_recently_used(self):
+        cache = SlugResolver(maxsize=2)
+        cache.put(Movie, 'a', 1)
+        cache.put(Movie, 'b', 2)
+        self.assertEqual(cache.get(Movie, 'a'), 1)
+        cache.put(Movie, 'c', 3)
+        self.assertEqual((cache.get(Movie, 'a'), cache.get(Movie, 'b'), cache.get(Movie, 'c')), (1, None, 3))
+        self.assertIsNone(cache.get(Actor, 'a'))
+
+    def test_detail_page_follows_changed_slug(self):
+        movie = self.make_movie('Heat')
+        self.assertEqual(self.client.get('/movies/heat').status_code, 200)
+        self.assertEqual(resolver.get(Movie, 'heat'), movie.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            movie.slug = 'heat-1995'
+            movie.save()
+        self.assertEqual(self.client.get('/movies/heat').status_code, 404)
+        self.assertIsNone(resolver.get(Movie, 'heat'))
+        self.assertEqual(self.client.get('/movies/heat-1995').status_code, 200)
+
+    def test_regenerate_keeps_existing_slugs(self):
+        edited = self.make_movie('Heat', slug='heat-director-cut')
+        other = self.make_movie('Heat 2', original_name='Heat')
+        Movie.objects.filter(pk=other.pk).update(slug='')
+        call_command('regenerate_slugs', 'movie', stdout=io.StringIO())
+        self.assertEqual(list(Movie.objects.order_by('pk').values_list('slug', flat=True)),
+                         ['heat-director-cut', 'heat'])
+        call_command('regenerate_slugs', 'movie', '--force', stdout=io.StringIO())
+        self.assertEqual(list(Movie.objects.order_by('pk').values_list('slug', flat=True)), ['heat', 'heat-2'])
+        self.assertEqual(edited.pk, Movie.objects.get(slug='heat').pk)
+
+
+class ImporterTests(CatalogTestCase):
+    RECORDS = [
+        {'name': 'Тіні забутих предків', 'original_name': 'Shadows of Forgotten Ancestors', 'year': 1965,
+         'length': 97, 'rating_imdb': '7.8', 'genres': 'Drama|Romance', 'director': 'Sergei Parajanov',
+         'actors': 'Ivan Mykolaichuk|Larisa Kadochnikova'},
+        {'name': 'Земля', 'original_name': 'Earth', 'year': 1930, 'rating_imdb': '7.3', 'genres': ['drama'],
+         'director': {'first_name': 'Oleksandr', 'last_name': 'Dovzhenko', 'email': 'od@example.com'}},
+        {'name': 'Earth again', 'original_name': 'EARTH', 'year': 1930},
+        {'name': 'No year', 'original_name': 'No year'},
+        {'name': 'Земля', 'original_name': 'Earth', 'year': 2005, 'actors': ['Ivan Mykolaichuk']},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'catalog.jsonl')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for record in self.RECORDS:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def import_catalog(self, *args):
+        out = io.StringIO()
+        call_command('import_catalog', self.path, '--batch-size', '2', *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name('  Pedro  ALMODÓVAR! '), 'pedro almodovar')
+
+    def test_parse_rejects_invalid_records(self):
+        importer = CatalogImporter()
+        for record in ({'name': 'x', 'year': 'soon'}, {'original_name': 'x'}, {'name': ' ', 'year': 2001},
+                       {'name': 'x', 'year': 1800}, {'name': 'x', 'year': 2001, 'length': -5},
+                       {'name': 'x', 'year': 2001, 'rating_imdb': '11'},
+                       {'name': 'x', 'year': 2001, 'rating_imdb': 7.25}, ['x', 2001]):
+            with self.assertRaises(InvalidRecord, msg=record):
+                importer.parse(record)
+        row = importer.parse({'original_name': 'x' * 80, 'year': '2001', 'genres': 'A| B |', 'rating_imdb': '7.5'})
+        self.assertEqual((row['movie']['name'], row['movie']['year'], row['movie']['rating_imdb'], row['genres']),
+                         ('x' * 50, 2001, Decimal('7.5'), ['A', 'B']))
+
+    def test_reader_resumes_from_offset(self):
+        path = os.path.join(self.directory.name, 'catalog.csv.gz')
+        with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'description'])
+            writer.writerows([['A', 'one\ntwo'], ['Б', 'три'], ['C', '"four"\nfive'], ['D', '']])
+        with RecordReader(path) as reader:
+            records = iter(reader)
+            self.assertEqual([next(records)['name'] for _ in range(2)], ['A', 'Б'])
+            offset = reader.tell()
+        with RecordReader(path, offset=offset) as reader:
+            self.assertEqual([(record['name'], record['description']) for record in reader],
+                             [('C', '"four"\nfive'), ('D', '')])
+
+    def test_import_links_matches_and_skips(self):
+        Genre.objects.create(name='Драма')
+        drama = Genre.objects.create(name='DRAMA')
+        output = self.import_catalog()
+        self.assertIn('Imported 3 movies', output)
+        self.assertIn('1 duplicate, 1 invalid', output)
+        ancestors = Movie.objects.get(original_name='Shadows of Forgotten Ancestors')
+        self.assertEqual(sorted(ancestors.genres.values_list('name', flat=True)), ['DRAMA', 'Romance'])
+        self.assertEqual(ancestors.director.slug, 'sergei-parajanov')
+        self.assertEqual(Actor.objects.filter(first_name='Ivan').count(), 1)
+        self.assertEqual(Director.objects.get(last_name='Dovzhenko').director_email, 'od@example.com')
+        self.assertEqual(sorted(Movie.objects.values_list('slug', flat=True)),
+                         ['earth', 'earth-2', 'shadows-of-forgotten-ancestors'])
+        self.assertEqual(set(MovieCard.objects.values_list('movie_id', flat=True)),
+                         set(Movie.objects.values_list('id', flat=True)))
+        self.assertEqual(Leaderboard.objects.get(key=leaderboard.genre_key(drama.id)).movie_ids,
+                         [ancestors.id, Movie.objects.get(year=1930).id])
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_resume_from_checkpoint(self):
+        import_batch = CatalogImporter.import_batch
+
+        def interrupted(importer, records):
+            if importer.stats['movies']:
+                raise RuntimeError('interrupted')
+            return import_batch(importer, records)
+
+        drama = Genre.objects.create(name='Drama')
+        with mock.patch.object(CatalogImporter, 'import_batch', interrupted), self.assertRaises(RuntimeError):
+            self.import_catalog()
+        earth = Movie.objects.get(original_name='Earth')
+        self.assertFalse(Leaderboard.objects.filter(key=leaderboard.genre_key(drama.id)).exists())
+
+        with mock.patch.object(CatalogImporter, 'parse', autospec=True, side_effect=CatalogImporter.parse) as parse:
+            self.assertIn('Imported 1 movies', self.import_catalog())
+        # записи до позначки не розбираються вдруге
+        self.assertEqual([call.args[1]['year'] for call in parse.call_args_list if 'year' in call.args[1]],
+                         [1930, 2005])
+        self.assertEqual(parse.call_count, 3)
+        # рейтинг жанру з першого пакета перебудовано, хоча фільми в нього додав перерваний запуск
+        self.assertEqual(Leaderboard.objects.get(key=leaderboard.genre_key(drama.id)).movie_ids,
+                         [Movie.objects.get(year=1965).id, earth.id])
+        with open(f'{self.path}.errors.jsonl', encoding='utf-8') as f:
+            errors = [json.loads(line) for line in f]
+        self.assertEqual([(error['record'], error['data']['name']) for error in errors], [(4, 'No year')])
+        self.assertTrue(errors[0]['error'].startswith('year:'))
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+        # той самий файл ще раз: усі фільми вже є
+        self.assertIn('Imported 0 movies', self.import_catalog())
+        self.assertEqual(Movie.objects.count(), 3)
+
+
+class DedupeTests(CatalogTestCase):
+    def pairs(self, model, **kwargs):
+        return {(c.keep_id, c.duplicate_id) for c in dedupe.find_duplicates(model, **kwargs)}
+
+    def test_find_movie_duplicates(self):
+        a = self.make_movie('Тіні забутих предків', original_name='Shadows of Forgotten Ancestors', year=1965)
+        b = self.make_movie('Тіні забутих предків', original_name='Shadows of the Forgotten Ancestors', year=1964)
+        self.make_movie('Shadows', original_name='Shadows of Forgotten Ancestors', year=1990)
+        self.make_movie('Rocky 2', year=1979)
+        self.make_movie('Rocky 3', year=1979)
+        self.assertEqual(self.pairs(Movie), {(a.id, b.id)})
+
+    def test_find_person_duplicates_in_any_word_order(self):
+        a = Actor.objects.create(first_name='Іван', last_name='Миколайчук')
+        b = Actor.objects.create(first_name='Миколайчук', last_name='Іван')
+        Actor.objects.create(first_name='Іван', last_name='Гаврилюк')
+        self.assertEqual(self.pairs(Actor), {(a.id, b.id)})
+
+    def test_merge_movies(self):
+        drama, comedy = Genre.objects.create(name='Drama'), Genre.objects.create(name='Comedy')
+        actor = Actor.objects.create(first_name='Іван', last_name='Миколайчук')
+        keep = self.make_movie('Earth', year=1930, genres=[drama])
+        duplicate = self.make_movie('Earth!', original_name='Earth', year=1930, genres=[drama, comedy],
+                                    description='Silent film')
+        duplicate.actors.add(actor)
+        today = date.today()
+        self.rate(keep, 6, ip='10.0.0.1', viewed_date=today)
+        self.rate(duplicate, 8, ip='10.0.0.1', viewed_date=today - timedelta(days=2))
+        self.rate(duplicate, 10, ip='10.0.0.2', viewed_date=today)
+        Feedback.objects.create(email='a@example.com', name='A', surname='B', feed='', movie=duplicate)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(dedupe.merge(Movie, keep, [duplicate]), 1)
+
+        self.assertFalse(Movie.objects.filter(pk=duplicate.pk).exists())
+        keep.refresh_from_db()
+        self.assertEqual(keep.description, 'Silent film')
+        self.assertEqual(set(keep.genres.all()), {drama, comedy})
+        self.assertEqual(list(keep.actors.all()), [actor])
+        self.assertEqual(keep.feedback_set.count(), 1)
+        # одна оцінка на IP: залишається остання
+        self.assertEqual(sorted(keep.rating_set.values_list('ip', 'rating')),
+                         [('10.0.0.1', Decimal('6.0')), ('10.0.0.2', Decimal('10.0'))])
+        score = MovieScore.objects.get(movie=keep)
+        self.assertEqual((score.rating_count, score.rating_sum), (2, Decimal('16')))
+        self.assertEqual(dict(TrendingBucket.objects.filter(movie=keep).values_list('start', 'ratings')),
+                         {today - timedelta(days=2): 0, today: 2})
+        incremental = MovieTrend.objects.get(movie=keep).log_score
+        trending.rebuild()
+        self.assertAlmostEqual(incremental, MovieTrend.objects.get(movie=keep).log_score)
+        self.assertEqual(Leaderboard.objects.get(key=leaderboard.genre_key(comedy.id)).movie_ids, [keep.id])
+
+    def test_merge_directors(self):
+        keep = Director.objects.create(first_name='Oleksandr', last_name='Dovzhenko', director_email='')
+        duplicate = Director.objects.create(first_name='Olexandr', last_name='Dovzhenko',
+                                            director_email='od@example.com')
+        movie = self.make_movie('Earth', director=duplicate)
+        dedupe.merge(Director, keep, [duplicate])
+        keep.refresh_from_db()
+        self.assertEqual(keep.director_email, 'od@example.com')
+        self.assertEqual(Movie.objects.get(pk=movie.pk).director, keep)
+        self.assertFalse(Director.objects.filter(pk=duplicate.pk).exists())
+
+
+calls = []
+
+
+@taskqueue.task(name='tests.remember', unique=True)
+def remember(value):
+    calls.append(value)
+
+
+@taskqueue.task(name='tests.append')
+def append(value):
+    calls.append(value)
+
+
+@taskqueue.task(name='tests.fail', unique=True, max_attempts=2)
+def fail():
+    raise RuntimeError('boom')
+
+
+@override_settings(TASKS_EAGER=False, TASKS_RETRY_DELAY=10)
+class TaskQueueTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        calls.clear()
+
+    def run_due(self):
+        """Усі завдання, час яких настав; повертає їхні стани"""
+        statuses = []
+        while True:
+            claimed = taskqueue.claim('test-worker')
+            if not claimed:
+                return statuses
+            statuses += [taskqueue.run(task_row) for task_row in claimed]
+
+    def make_due(self):
+        Task.objects.filter(status=Task.PENDING).update(run_at=timezone.now())
+
+    def test_unique_tasks_are_queued_once(self):
+        remember.enqueue(1)
+        remember.enqueue(1)
+        remember.enqueue(2)
+        append.enqueue(1)
+        append.enqueue(1)
+        self.assertEqual(Task.objects.filter(name='tests.remember').count(), 2)
+        self.assertEqual(Task.objects.filter(name='tests.append').count(), 2)
+        self.assertEqual(self.run_due(), [Task.DONE] * 4)
+        self.assertEqual(sorted(calls), [1, 1, 1, 2])
+        # виконане завдання не заважає поставити таке саме знову
+        remember.enqueue(1)
+        self.assertEqual(Task.objects.filter(status=Task.PENDING).count(), 1)
+
+    def test_same_call_in_a_transaction_is_registered_once(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            remember.enqueue_on_commit(1)
+            remember.enqueue_on_commit(1)
+            remember.enqueue_on_commit(2)
+            append.enqueue_on_commit(3)
+            append.enqueue_on_commit(3)
+        self.assertEqual(len(callbacks), 4)
+        self.assertEqual(Task.objects.count(), 4)
+
+    def test_claim_by_priority(self):
+        taskqueue.enqueue(append, [1], priority=1)
+        taskqueue.enqueue(append, [2], priority=5)
+        taskqueue.enqueue(append, [3], priority=1, delay=3600)
+        self.run_due()
+        self.assertEqual(calls, [2, 1])
+        self.assertEqual(Task.objects.get(status=Task.PENDING).args, [3])
+
+    def test_failed_task_is_retried_with_backoff(self):
+        fail.enqueue()
+        self.assertEqual(self.run_due(), [Task.PENDING])
+        task_row = Task.objects.get()
+        self.assertEqual(task_row.attempts, 1)
+        self.assertIn('RuntimeError: boom', task_row.error)
+        self.assertAlmostEqual((task_row.run_at - timezone.now()).total_seconds(), 10, delta=2)
+        self.assertEqual(self.run_due(), [])
+        self.make_due()
+        self.assertEqual(self.run_due(), [Task.FAILED])
+        self.assertEqual(Task.objects.get().attempts, 2)
+
+    def test_retry_is_dropped_when_the_same_task_is_pending(self):
+        fail.enqueue()
+        task_row = taskqueue.claim('test-worker')[0]
+        fail.enqueue()
+        self.assertEqual(taskqueue.run(task_row), Task.FAILED)
+        self.assertIn('Superseded', Task.objects.get(pk=task_row.pk).error)
+        self.assertEqual(Task.objects.filter(status=Task.PENDING).count(), 1)
+
+    def test_stale_running_tasks_are_requeued_and_old_ones_purged(self):
+        remember.enqueue(1)
+        taskqueue.claim('stopped-worker')
+        Task.objects.update(started=timezone.now() - timedelta(hours=1))
+        self.assertEqual(taskqueue.requeue_stale(), 1)
+        self.make_due()
+        self.assertEqual(self.run_due(), [Task.DONE])
+        Task.objects.update(finished=timezone.now() - timedelta(days=2))
+        self.assertEqual(taskqueue.purge(), 1)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_tasks_run_after_commit_and_log_errors(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            remember.enqueue_on_commit(1)
+            remember.enqueue_on_commit(1)
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [1])
+        with self.assertLogs('movie_app.tasks', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                fail.enqueue_on_commit()
+        self.assertFalse(Task.objects.exists())
+
+
+class QueryCacheTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.drama = Genre.objects.create(name='Драма')
+        self.movie = self.make_movie('Heat', genres=[self.drama], slug='heat')
+
+    def test_related_rows_are_cached(self):
+        first = querycache.movie_related(self.movie)
+        with self.assertNumQueries(0):
+            self.assertEqual(querycache.movie_related(self.movie), first)
+
+    def test_rating_does_not_evict_movie_entry(self):
+        querycache.movie_related(self.movie)
+        self.rate(self.movie, 8)
+        with self.assertNumQueries(0):
+            self.assertNotIn('ratings', querycache.movie_related(self.movie))
+
+    def test_feedback_and_linked_rows_invalidate_entry(self):
+        querycache.movie_related(self.movie)
+        with self.captureOnCommitCallbacks(execute=True):
+            Feedback.objects.create(email='a@example.com', name='Ann', surname='Lee', feed='Good', movie=self.movie)
+        self.assertEqual([f.feed for f in querycache.movie_related(self.movie)['feedbacks']], ['Good'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.drama.name = 'Трилер'
+            self.drama.save()
+        self.assertEqual([g.name for g in querycache.movie_related(self.movie)['genres']], ['Трилер'])
+
+        actor = Actor.objects.create(first_name='Al', last_name='Pacino')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.actors.add(actor)
+        self.assertEqual(querycache.movie_related(self.movie)['actors'], [actor])
+        self.assertEqual(querycache.filmography(actor), [self.movie.id])
+
+    def test_invalidate_model_rebuilds_only_tagged_entries(self):
+        querycache.genre_list()
+        querycache.movie_years()
+        Movie.objects.filter(pk=self.movie.pk).update(year=1995)
+        with self.captureOnCommitCallbacks(execute=True):
+            querycache.invalidate_model(Movie)
+        with self.assertNumQueries(0):
+            querycache.genre_list()
+        self.assertEqual(querycache.movie_years(), [{'year': 1995}])
+
+    def test_detail_page_reads_visitor_rating(self):
+        self.rate(self.movie, 6, ip='127.0.0.1', viewed_date=date(2024, 3, 1))
+        self.rate(self.movie, 9, ip='10.0.0.2')
+        response = self.client.get('/movies/heat')
+        self.assertEqual(response.context['my_rating'].rating, 6)
+        self.assertContains(response, 'Мій рейтинг - 6')
+        self.assertIsNone(self.client.get('/movies/heat', REMOTE_ADDR='10.0.0.3').context['my_rating'])
+
+
+class WarmupTests(CatalogTestCase):
+
+    def test_warm_data_reads_cards_of_first_pages_only(self):
+        movies = [self.make_movie(f'Movie {i}') for i in range(5)]
+        MovieCard.objects.all().delete()
+        self.assertEqual(warmup.warm_data(1), 2)
+        self.assertEqual(set(MovieCard.objects.values_list('movie_id', flat=True)), {movies[0].id, movies[1].id})
+
+
+class SnapshotTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.genres = [Genre.objects.create(name=name) for name in ('Drama', 'Comedy', 'Crime')]
+        self.movies = [self.make_movie(f'Movie {i}', year=1990 + i % 4, rating_imdb=f'{i % 10}.5',
+                                       genres=self.genres[i % 3:i % 3 + i % 2 + 1] if i % 7 else ())
+                       for i in range(30)]
+        self.director = Director.objects.create(first_name='Michael', last_name='Mann')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'catalog.snapshot')
+        snapshot.build(self.path)
+        self.catalog = snapshot.Snapshot(self.path)
+
+    def tearDown(self):
+        del self.catalog
+        self.tmp.cleanup()
+
+    def orm_ids(self, years=None, genre_ids=None, min_rating=None):
+        queryset = Movie.objects.all()
+        if years is not None:
+            queryset = queryset.filter(year__in=years)
+        if genre_ids is None:
+            queryset = queryset.filter(genres__isnull=False)
+        else:
+            queryset = queryset.filter(genres__in=genre_ids)
+        if min_rating is not None:
+            queryset = queryset.filter(rating_imdb__gte=min_rating)
+        return list(queryset.distinct().order_by('id').values_list('id', flat=True))
+
+    def test_filter_ids_match_orm(self):
+        drama, comedy, crime = (genre.id for genre in self.genres)
+        cases = [{}, {'years': [1991]}, {'years': [1990, 1993], 'min_rating': 4}, {'genre_ids': [comedy]},
+                 {'genre_ids': [drama, crime], 'years': [1992]}, {'genre_ids': [drama], 'min_rating': 9},
+                 {'min_rating': 0}, {'years': [1890]}, {'genre_ids': []}, {'genre_ids': [crime + 100]}]
+        for kwargs in cases:
+            with self.subTest(**kwargs):
+                self.assertEqual(self.catalog.filter_ids(**kwargs), self.orm_ids(**kwargs))
+
+    def test_filter_ids_cover_every_bit_of_a_byte(self):
+        self.assertEqual(len(self.catalog.filter_ids(min_rating=0)), 30 - len(range(0, 30, 7)))
+        self.assertEqual(snapshot.BIT_POSITIONS[0b10100001], (0, 5, 7))
+        self.assertEqual(snapshot.BIT_POSITIONS[255], tuple(range(8)))
+
+    def test_slug_pk(self):
+        for movie in self.movies[:3]:
+            self.assertEqual(self.catalog.slug_pk(Movie, movie.slug), movie.id)
+        self.assertEqual(self.catalog.slug_pk(Director, self.director.slug), self.director.id)
+        self.assertIsNone(self.catalog.slug_pk(Movie, 'missing'))
+        self.assertIsNone(self.catalog.slug_pk(Actor, self.movies[0].slug))
+
+    def test_filter_page_reads_only_its_ids(self):
+        params = []
+
+        def record(execute, sql, query_params, many, context):
+            params.append(len(query_params or ()))
+            return execute(sql, query_params, many, context)
+
+        with override_settings(CATALOG_SNAPSHOT_PATH=self.path, CATALOG_SNAPSHOT_CHECK_SECONDS=0), \
+                connection.execute_wrapper(record):
+            response = self.client.get('/filter/', {'rating_imdb': 0, 'page': 2})
+        expected = self.orm_ids(min_rating=0)
+        self.assertEqual(response.context['paginator'].count, len(expected))
+        self.assertEqual([card['id'] for card in response.context['movie_list']], expected[2:4])
+        # у запитах лише id сторінки, а не всі id фільтра
+        self.assertLess(max(params), 10)
+
+    @override_settings(TASKS_EAGER=False, CATALOG_SNAPSHOT_BUILD_DELAY=60)
+    def test_burst_of_changes_queues_one_delayed_build(self):
+        with override_settings(CATALOG_SNAPSHOT_PATH=self.path):
+            for movie in self.movies[:5]:
+                # кожне збереження - окрема транзакція, як у серії правок в адмінці
+                with self.captureOnCommitCallbacks(execute=True):
+                    movie.name += '!'
+                    movie.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.director.save()
+        builds = Task.objects.filter(name='build_snapshot')
+        self.assertEqual(builds.count(), 1)
+        self.assertGreater(builds.get().run_at, timezone.now() + timedelta(seconds=50))
+        # до кінця затримки воркер її не бере
+        self.assertEqual(taskqueue.claim('test', names=['build_snapshot']), [])
+
+
+class AccessLogTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.movie = self.make_movie('Heat', slug='heat')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'access.log')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_requests_are_recorded_and_replayed(self):
+        form = {'rating': '7.5', 'viewed_date_day': '1', 'viewed_date_month': '2', 'viewed_date_year': '2022'}
+        with override_settings(ACCESS_LOG_PATH=self.path):
+            self.client.get('/movies/heat', {'ref': 'home'}, REMOTE_ADDR='10.0.0.5')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/review/{self.movie.id}/', form, REMOTE_ADDR='10.0.0.5')
+        entries = replay_log.read_log(self.path)
+        self.assertEqual([(e['m'], e['p'], e.get('q'), e['ip']) for e in entries], [
+            ('GET', '/movies/heat', 'ref=home', '10.0.0.5'),
+            ('POST', f'/review/{self.movie.id}/', None, '10.0.0.5')])
+        self.assertEqual(entries[1]['b'], {key: [value] for key, value in form.items()})
+
+        Rating.objects.all().delete()
+        app = replay_log.ReplayHandler()
+        with override_settings(ACCESS_LOG_PATH=self.path), self.captureOnCommitCallbacks(execute=True):
+            results = [replay_log.replay(app, entry, 'testserver', entries[0]['t'], 0, 0) for entry in entries]
+        self.assertEqual([status for status, _ in results], [200, 302])
+        self.assertEqual(Rating.objects.get().ip, '10.0.0.5')
+        # відтворені запити не дописуються в той самий лог
+        self.assertEqual(len(replay_log.read_log(self.path)), 2)
+
+
+class ProfilingTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.make_movie('Heat', slug='heat')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        settings = override_settings(PROFILE_STORE_DIR=self.tmp.name, PROFILE_STORE_MAX=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_staff_parameter_and_signed_header_enable_profiling(self):
+        self.assertNotIn('X-Profile-Id', self.client.get('/movies/heat', {'_profile': 1}))
+        self.assertNotIn('X-Profile-Id', self.client.get('/movies/heat', HTTP_X_PROFILE='forged'))
+        response = self.client.get('/movies/heat', HTTP_X_PROFILE=profiling.make_profile_token())
+        self.assertIn('-movie-', response['X-Profile-Id'])
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get('/admin/movie_app/movie/', {'_profile': 1})
+        # службовий параметр не потрапляє у фільтри списку змін, інакше адмінка перенаправила б на ?e=1
+        self.assertEqual(response.status_code, 200)
+        name = response['X-Profile-Id']
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp.name, name)))
+        self.assertContains(self.client.get('/admin/profiles/', {'show': name}), 'cumulative')
+        self.assertEqual(self.client.get(f'/admin/profiles/{name}').status_code, 200)
+        self.assertEqual(self.client.get('/admin/profiles/..%2Fdb.sqlite3').status_code, 404)
+
+    def test_old_profiles_are_removed(self):
+        for _ in range(3):
+            self.client.get('/movies/heat', HTTP_X_PROFILE=profiling.make_profile_token())
+        self.assertEqual(len(profiling.list_profiles()), 2)
+
+
+class SlowQueryLogTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'slow.log')
+
+    def run_query(self, delay_ms):
+        """Запит, що триває щонайменше delay_ms"""
+        def execute(sql, params, many, context):
+            time.sleep(delay_ms / 1000)
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+
+        logger = slowlog.SlowQueryLogger('test')
+        logger(execute, "SELECT id FROM movie_app_movie WHERE name = 'Heat' AND year IN (%s, %s)", [1995, 1996],
+               False, {'connection': connection})
+
+    def entries(self):
+        if not os.path.exists(self.path):
+            return []
+        return list(slowlog.read_entries(self.path))
+
+    def test_only_queries_over_threshold_are_logged(self):
+        with override_settings(SLOW_QUERY_LOG=self.path, SLOW_QUERY_THRESHOLD_MS=1000):
+            self.run_query(5)
+        self.assertEqual(self.entries(), [])
+        with override_settings(SLOW_QUERY_LOG=self.path, SLOW_QUERY_THRESHOLD_MS=5), \
+                self.assertLogs('movie_app.slow_queries', 'WARNING'):
+            self.run_query(10)
+            self.run_query(10)
+        first, second = self.entries()
+        self.assertGreaterEqual(first['ms'], 10)
+        self.assertEqual(first['sql'], 'SELECT id FROM movie_app_movie WHERE name = ? AND year IN (...)')
+        self.assertEqual((first['view'], first['fp']), ('test', second['fp']))
+        # план знімається один раз на відбиток
+        self.assertTrue(first['plan'])
+        self.assertNotIn('plan', second)
+
+        out = io.StringIO()
+        call_command('slow_queries', '--log', self.path, '--json', stdout=out)
+        report, = json.loads(out.getvalue())
+        self.assertEqual((report['count'], report['views']), (2, {'test': 2}))
+
+    def test_requests_log_with_view_name(self):
+        self.make_movie('Heat', slug='heat')
+        with override_settings(SLOW_QUERY_LOG=self.path, SLOW_QUERY_THRESHOLD_MS=0), \
+                self.assertLogs('movie_app.slow_queries', 'WARNING'):
+            self.client.get('/movies/heat')
+        self.assertIn('movie', {entry['view'] for entry in self.entries()})
+
+
+@override_settings(HISTORY_PAGE_SIZE=3)
+class HistoryTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        days = [date(2024, 1, 31)] * 4 + [date(2024, 2, 1)] * 3 + [date(2024, 2, 29)] * 3 + [date(2024, 3, 1)]
+        self.ratings = [self.rate(self.make_movie(f'Movie {i}'), 7, ip='127.0.0.1', viewed_date=day)
+                        for i, day in enumerate(days)]
+        self.rate(self.make_movie('Other'), 7, ip='10.0.0.9', viewed_date=date(2024, 2, 1))
+
+    def pages(self, **params):
+        """Усі сторінки API за курсором: [(назви фільмів сторінки)]"""
+        pages, cursor = [], None
+        while True:
+            data = self.client.get('/api/history/', {**params, **({'after': cursor} if cursor else {})}).json()
+            pages.append([rating['movie'] for rating in data['ratings']])
+            cursor = data['next']
+            if cursor is None:
+                return pages
+
+    def test_cursor_walks_ties_without_gaps_or_duplicates(self):
+        pages = self.pages()
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 2])
+        names = [name for page in pages for name in page]
+        expected = sorted(self.ratings, key=lambda r: (r.viewed_date, r.id), reverse=True)
+        self.assertEqual(names, [rating.movie.name for rating in expected])
+
+    def test_month_range_includes_last_day_of_month(self):
+        self.assertEqual(sum(map(len, self.pages(**{'from': '2024-02', 'to': '2024-02'}))), 6)
+        self.assertEqual(sum(map(len, self.pages(to='2024-01'))), 4)
+        self.assertEqual(sum(map(len, self.pages(**{'from': '2024-03'}))), 1)
+        data = self.client.get('/api/history/', {'from': '2024-01', 'to': '2024-02'}).json()
+        self.assertEqual(data['months'], [{'month': '2024-02', 'count': 6}, {'month': '2024-01', 'count': 4}])
+
+    def test_page_and_bad_parameters(self):
+        response = self.client.get('/history/')
+        self.assertEqual(len(response.context['ratings']), 3)
+        last = response.context['ratings'][-1]
+        self.assertEqual(response.context['cursor'], f'{last.viewed_date.isoformat()}_{last.id}')
+        for params in ({'after': 'yesterday'}, {'after': '2024-01-31_x'}, {'from': '2024-13'}):
+            self.assertEqual(self.client.get('/history/', params).status_code, 404, params)
+
+
+class MovieCardTests(CatalogTestCase):
+
+    def card(self, movie):
+        return MovieCard.objects.get(movie=movie).data
+
+    def test_cards_follow_movies_and_genres(self):
+        drama, comedy = Genre.objects.create(name='Drama'), Genre.objects.create(name='Comedy')
+        movie = self.make_movie('Heat', year=1995, genres=[drama])
+        self.assertEqual((self.card(movie)['name'], self.card(movie)['genres']), ('Heat', ['Drama']))
+        with self.captureOnCommitCallbacks(execute=True):
+            movie.name = 'Heat (1995)'
+            movie.save()
+            movie.genres.add(comedy)
+        self.assertEqual(self.card(movie)['name'], 'Heat (1995)')
+        self.assertEqual(sorted(self.card(movie)['genres']), ['Comedy', 'Drama'])
+        with self.captureOnCommitCallbacks(execute=True):
+            drama.name = 'Crime'
+            drama.save()
+        self.assertEqual(sorted(self.card(movie)['genres']), ['Comedy', 'Crime'])
+        with self.captureOnCommitCallbacks(execute=True):
+            comedy.delete()
+        self.assertEqual(self.card(movie)['genres'], ['Crime'])
+        with self.captureOnCommitCallbacks(execute=True):
+            movie.genres.clear()
+        self.assertEqual(self.card(movie)['genres'], [])
+
+    def test_missing_cards_are_built_on_read_and_rebuilt(self):
+        first, second = self.make_movie('A'), self.make_movie('B')
+        MovieCard.objects.filter(movie=second).delete()
+        self.assertEqual([card['name'] for card in cards.cards_for([second.id, first.id])], ['B', 'A'])
+        Movie.objects.filter(pk=first.pk).update(name='A2')
+        call_command('rebuild_cards', stdout=io.StringIO())
+        self.assertEqual(self.card(first)['name'], 'A2')
+
+    def list_queries(self):
+        # перший запит заповнює кеш панелі фільтрів, який нові фільми інвалідують
+        self.client.get('/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/')
+        return response, len(ctx.captured_queries)
+
+    def test_list_page_queries_do_not_grow_with_movies(self):
+        genre = Genre.objects.create(name='Drama')
+        for i in range(3):
+            self.make_movie(f'Movie {i}', genres=[genre])
+        _, few = self.list_queries()
+        for i in range(3, 10):
+            self.make_movie(f'Movie {i}', genres=[genre])
+        response, many = self.list_queries()
+        self.assertEqual(len(response.context['movie_list']), 10)
+        self.assertEqual(many, few)
+
+
+@override_settings(TASKS_EAGER=True, CATALOG_SNAPSHOT_PATH=None, METRICS_DIR=None)
+class ReadReplicaRoutingTests(TransactionTestCase):
+    """Без обгорткової транзакції TestCase, щоб replica бачила зафіксовані дані"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        resolver.clear()
+        self.addCleanup(trending._pending.clear)
+        self.router = db.ReadReplicaRouter()
+
+    def test_reads_go_to_replica_outside_transactions(self):
+        self.assertEqual(self.router.db_for_write(Movie), 'default')
+        self.assertEqual(self.router.db_for_read(Movie), 'replica')
+        with db.use_writer():
+            self.assertEqual(self.router.db_for_read(Movie), 'default')
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Movie), 'default')
+        self.assertEqual(self.router.db_for_read(Movie), 'replica')
+        self.assertTrue(self.router.allow_migrate('default', 'movie_app'))
+        self.assertFalse(self.router.allow_migrate('replica', 'movie_app'))
+
+    def test_requests_pick_connection_by_method(self):
+        movie = Movie.objects.create(name='Heat', original_name='Heat', year=1995, length=170,
+                                     rating_imdb=Decimal('8.3'), description='', slug='heat')
+        seen = []
+
+        def record(execute, sql, params, many, context):
+            seen.append((method, context['connection'].alias, sql.split()[0]))
+            return execute(sql, params, many, context)
+
+        with connections['default'].execute_wrapper(record), connections['replica'].execute_wrapper(record):
+            method = 'GET'
+            self.assertEqual(self.client.get('/movies/heat').status_code, 200)
+            method = 'POST'
+            self.client.post(f'/review/{movie.id}/', {'rating': '7.5', 'viewed_date_day': '1',
+                                                      'viewed_date_month': '2', 'viewed_date_year': '2022'})
+        self.assertEqual(Rating.objects.get().movie, movie)
+        # перегляд сторінки записується в буфер, тож GET лише читає
+        self.assertEqual({alias for request, alias, _ in seen if request == 'GET'}, {'replica'})
+        self.assertEqual({alias for request, alias, _ in seen if request == 'POST'}, {'default'})
+
+
+class ImmediateTransactionTests(TestCase):
+    """Два з'єднання з окремим файлом бази читають і потім пишуть в одній транзакції одночасно"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'concurrency.sqlite3')
+        with sqlite3.connect(self.path) as conn:
+            conn.execute('CREATE TABLE counter (n INTEGER)')
+            conn.execute('INSERT INTO counter VALUES (0)')
+
+    def wrapper(self, mode):
+        settings_dict = {**connection.settings_dict, 'NAME': self.path, 'OPTIONS': {}}
+        if mode:
+            settings_dict['OPTIONS'] = {'transaction_mode': mode}
+        return SQLiteWrapper(settings_dict, alias='concurrency')
+
+    def increment(self, mode, barrier, errors):
+        conn = self.wrapper(mode)
+        try:
+            conn.ensure_connection()
+            conn.set_autocommit(False)
+            conn._start_transaction_under_autocommit()
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT n FROM counter')
+                value = cursor.fetchone()[0]
+                if barrier:
+                    barrier.wait()
+                time.sleep(0.05)
+                cursor.execute('UPDATE counter SET n = %s', [value + 1])
+            conn.commit()
+        except DatabaseError as e:
+            errors.append(e)
+            conn.rollback()
+        finally:
+            conn.close()
+
+    def run_writers(self, mode, barrier=None):
+        errors = []
+        threads = [threading.Thread(target=self.increment, args=(mode, barrier, errors)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with sqlite3.connect(self.path) as conn:
+            return conn.execute('SELECT n FROM counter').fetchone()[0], errors
+
+    def test_immediate_mode_serializes_writers(self):
+        self.assertEqual(self.run_writers('IMMEDIATE'), (2, []))
+
+    def test_deferred_mode_fails_on_lock_upgrade(self):
+        # обидва з'єднання вже прочитали дані, тож одне з них не може стати записувачем
+        value, errors = self.run_writers(None, threading.Barrier(2))
+        self.assertEqual((value, len(errors)), (1, 1))
+        self.assertIn('locked', str(errors[0]))
+
+
+class AdminAutocompleteTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.mann = Director.objects.create(first_name='Michael', last_name='Mann')
+        self.scorsese = Director.objects.create(first_name='Martin', last_name='Scorsese')
+        self.scott = Director.objects.create(first_name='Ridley', last_name='Scott')
+
+    def autocomplete(self, term):
+        response = self.client.get('/admin/autocomplete/', {'app_label': 'movie_app', 'model_name': 'movie',
+                                                            'field_name': 'director', 'term': term})
+        return {item['text'] for item in response.json()['results']}
+
+    def test_words_match_name_prefixes(self):
+        self.assertEqual(self.autocomplete('ma'), {'Michael Mann', 'Martin Scorsese'})
+        self.assertEqual(self.autocomplete('Sco'), {'Martin Scorsese', 'Ridley Scott'})
+        self.assertEqual(self.autocomplete('mi ma'), {'Michael Mann'})
+        # лише початок слова, не підрядок
+        self.assertEqual(self.autocomplete('ann'), set())
+
+    def test_change_form_renders_only_selected_director(self):
+        movie = self.make_movie('Heat', director=self.mann)
+        content = self.client.get(f'/admin/movie_app/movie/{movie.id}/change/').content.decode()
+        self.assertIn('Michael Mann', content)
+        self.assertNotIn('Scorsese', content)
+
+    def director_choices(self, **params):
+        response = self.client.get('/admin/movie_app/movie/', params)
+        spec, = [spec for spec in response.context['cl'].filter_specs if spec.parameter_name == 'director']
+        return [name for _, name in spec.lookup_choices]
+
+    def test_director_filter_lists_busiest_directors_from_cache(self):
+        self.make_movie('Heat', director=self.mann)
+        self.make_movie('Thief', director=self.mann)
+        self.make_movie('Taxi Driver', director=self.scorsese)
+        with mock.patch.object(DirectorFilter, 'limit', 2):
+            self.assertEqual(self.director_choices(), ['Michael Mann', 'Martin Scorsese'])
+            # вибраний режисер поза списком теж показується
+            self.assertEqual(self.director_choices(director=self.scott.id),
+                             ['Michael Mann', 'Martin Scorsese', 'Ridley Scott'])
+            for name in ('Alien', 'Gladiator', 'Blade Runner'):
+                self.make_movie(name, director=self.scott)
+            self.assertEqual(self.director_choices(), ['Michael Mann', 'Martin Scorsese'])
+            caches['default'].delete(DirectorFilter.cache_key)
+            self.assertEqual(self.director_choices(), ['Ridley Scott', 'Michael Mann'])
+
+
+class PaginatedInlineTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.movie = self.make_movie('Heat', description='Crime', genres=[Genre.objects.create(name='Crime')],
+                                     director=Director.objects.create(first_name='Michael', last_name='Mann'))
+        self.movie.actors.add(Actor.objects.create(first_name='Al', last_name='Pacino'))
+        self.feedbacks = [Feedback.objects.create(email=f'f{i}@example.com', name=f'Name {i}', surname='S',
+                                                  feed=f'Text {i}', movie=self.movie) for i in range(5)]
+        for i in range(3):
+            self.rate(self.movie, 7, ip=f'10.0.0.{i}')
+        self.url = f'/admin/movie_app/movie/{self.movie.id}/change/'
+
+    @staticmethod
+    def form_data(response):
+        """Дані POST, які надіслав би браузер з показаної форми зміни"""
+        forms = [response.context['adminform'].form]
+        data = {}
+        for inline in response.context['inline_admin_formsets']:
+            management = inline.formset.management_form
+            data.update({management.add_prefix(name): management[name].value() for name in management.fields})
+            forms += inline.formset.forms
+        for form in forms:
+            for name, field in form.fields.items():
+                value = form[name].value()
+                if value is None or isinstance(field, django_forms.FileField):
+                    continue
+                data[form.add_prefix(name)] = [str(v) for v in value] if isinstance(value, (list, tuple)) else value
+        return data
+
+    @mock.patch.object(FeedbackInline, 'per_page', 2)
+    def test_post_touches_only_rows_of_the_shown_page(self):
+        response = self.client.get(self.url, {'feedback_set-page': 2})
+        formset = [inline.formset for inline in response.context['inline_admin_formsets']
+                   if inline.formset.prefix == 'feedback_set'][0]
+        # найновіші першими: друга сторінка - третій і четвертий з кінця
+        shown = [form.instance for form in formset.initial_forms]
+        self.assertEqual(shown, [self.feedbacks[2], self.feedbacks[1]])
+
+        data = self.form_data(response)
+        data['feedback_set-0-feed'] = 'Edited'
+        data['feedback_set-1-DELETE'] = 'on'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'{self.url}?feedback_set-page=2', data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(dict(Feedback.objects.values_list('id', 'feed')), {
+            self.feedbacks[0].id: 'Text 0', self.feedbacks[2].id: 'Edited', self.feedbacks[3].id: 'Text 3',
+            self.feedbacks[4].id: 'Text 4'})
+        self.assertEqual(Rating.objects.filter(movie=self.movie).count(), 3)
+
+
+class BulkEditTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def bulk_edit(self, url, edits):
+        """POST списку змін адмінки; edits - {pk: {поле: значення}} поверх показаних значень"""
+        formset = self.client.get(url).context['cl'].formset
+        data = {'_save': 'Save'}
+        management = formset.management_form
+        data.update({management.add_prefix(name): management[name].value() for name in management.fields})
+        for form in formset.forms:
+            for name in form.fields:
+                value = edits.get(form.instance.pk, {}).get(name, form[name].value())
+                if value is not None:
+                    data[form.add_prefix(name)] = value
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+
+    def test_renamed_rows_get_unique_slugs(self):
+        Director.objects.create(first_name='John', last_name='Smith', director_email='a@example.com')
+        first = Director.objects.create(first_name='John', last_name='Doe', director_email='b@example.com')
+        second = Director.objects.create(first_name='John', last_name='Roe', director_email='c@example.com')
+        self.bulk_edit('/admin/movie_app/director/', {first.pk: {'last_name': 'Smith'},
+                                                      second.pk: {'last_name': 'Smith'}})
+        self.assertEqual(list(Director.objects.order_by('pk').values_list('slug', flat=True)),
+                         ['john-smith', 'john-smith-2', 'john-smith-3'])
+        self.assertEqual(self.client.get('/directors/john-smith-3').status_code, 200)
+
+    def derived_state(self):
+        return (set(MovieScore.objects.values_list('movie_id', 'rating_count', 'rating_sum', 'score')),
+                dict(Leaderboard.objects.values_list('key', 'movie_ids')),
+                set(TrendingBucket.objects.values_list('movie_id', 'period', 'start', 'ratings', 'views')),
+                {movie_id: round(log_score, 9) for movie_id, log_score in MovieTrend.objects.values_list(
+                    'movie_id', 'log_score')})
+
+    def test_rating_edits_match_per_object_saves(self):
+        # середня оцінка кешується, тож обидва шляхи рахують бали з тим самим середнім
+        caches['default'].set(leaderboard.MEAN_CACHE_KEY, 7.0)
+        today = date.today()
+        movies = [self.make_movie(f'M{i}', rating_imdb=f'{6 + i}.0') for i in range(4)]
+        ratings = [self.rate(movies[i % 4], 5 + i % 3, ip=f'10.0.0.{i}', viewed_date=today - timedelta(days=i))
+                   for i in range(8)]
+        edits = {ratings[0].pk: {'rating': '10'}, ratings[1].pk: {'viewed_date': today.isoformat()},
+                 ratings[5].pk: {'rating': '1', 'viewed_date': (today - timedelta(days=2)).isoformat()},
+                 ratings[7].pk: {'rating': '9'}}
+
+        with transaction.atomic():
+            for rating in ratings:
+                for field, value in edits.get(rating.pk, {}).items():
+                    setattr(rating, field, Decimal(value) if field == 'rating' else date.fromisoformat(value))
+                if rating.pk in edits:
+                    with self.captureOnCommitCallbacks(execute=True):
+                        rating.save()
+            expected = self.derived_state()
+            transaction.set_rollback(True)
+
+        self.assertNotEqual(self.derived_state(), expected)
+        self.bulk_edit('/admin/movie_app/rating/', edits)
+        self.assertEqual(self.derived_state(), expected)
+
+
+class UploadTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    @staticmethod
+    def image(name, size, fmt='JPEG'):
+        from PIL import Image
+        content = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(content, format=fmt)
+        return SimpleUploadedFile(name, content.getvalue())
+
+    def upload(self, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/ckeditor/upload/', {'upload': file})
+
+    def test_post_without_file_is_rejected(self):
+        self.assertEqual(self.client.post('/ckeditor/upload/').status_code, 400)
+
+    def test_same_content_is_stored_once(self):
+        first = self.upload(self.image('poster.png', (40, 20), 'PNG')).json()
+        second = self.upload(self.image('copy.png', (40, 20), 'PNG')).json()
+        self.assertEqual(first['url'], second['url'])
+        image = UploadedImage.objects.get()
+        self.assertEqual((image.original_name, image.width, image.height), ('poster.png', 40, 20))
+        self.assertEqual(len(os.listdir(os.path.dirname(uploads.get_storage().path(image.path)))), 2)
+
+    @override_settings(CKEDITOR_IMAGE_MAX_SIZE=100, CKEDITOR_THUMBNAIL_SIZE=(20, 20))
+    def test_large_image_is_scaled_down_with_thumbnail(self):
+        from PIL import Image
+        self.assertEqual(self.upload(self.image('wide.jpg', (400, 200))).status_code, 200)
+        image = UploadedImage.objects.get()
+        storage = uploads.get_storage()
+        self.assertEqual((image.width, image.height), (100, 50))
+        with storage.open(image.path) as f:
+            self.assertEqual(Image.open(f).size, (100, 50))
+        with storage.open(image.thumbnail) as f:
+            self.assertEqual(Image.open(f).size, (20, 10))
+
+
+class SweepMediaTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.root = media.name
+        self.enterContext(override_settings(MEDIA_ROOT=self.root))
+        self.files = ['my_gallery/poster.jpg', 'uploads/2024/still.png', 'uploads/2024/still_thumb.jpg',
+                      'uploads/2024/orphan.png', 'admin-interface/logo/logo.png', 'admin-interface/favicon/icon.png']
+        for path in self.files:
+            os.makedirs(os.path.dirname(os.path.join(self.root, path)), exist_ok=True)
+            with open(os.path.join(self.root, path), 'wb') as f:
+                f.write(b'x')
+        self.make_movie('Heat', picture='my_gallery/poster.jpg',
+                        description='<p><img src="/uploads/2024/still.png"></p>')
+        for i, name in enumerate(['still', 'orphan']):
+            UploadedImage.objects.create(path=f'uploads/2024/{name}.png', sha256=str(i),
+                                         thumbnail='uploads/2024/still_thumb.jpg' if name == 'still' else '')
+        Theme.objects.create(name='Custom', logo='admin-interface/logo/logo.png',
+                             favicon='admin-interface/favicon/icon.png')
+
+    def sweep(self, *args):
+        out = io.StringIO()
+        call_command('sweep_media', '--min-age', '0', '--list', *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue().splitlines()
+
+    def test_only_unreferenced_files_are_reported(self):
+        self.assertEqual(self.sweep()[:-1], ['uploads/2024/orphan.png'])
+        self.assertTrue(all(os.path.exists(os.path.join(self.root, path)) for path in self.files))
+
+    def test_delete_removes_only_orphans(self):
+        self.sweep('--delete')
+        self.assertEqual([path for path in self.files if not os.path.exists(os.path.join(self.root, path))],
+                         ['uploads/2024/orphan.png'])
+        self.assertEqual(list(UploadedImage.objects.values_list('path', flat=True)), ['uploads/2024/still.png'])
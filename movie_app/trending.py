@@ -0,0 +1,226 @@
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, time as dtime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone as dj_timezone
+
+from .models import Rating, TrendingBucket, MovieTrend
+
+# бали зберігаються як log2(сума 2^(t / період напіврозпаду)) відносно цієї дати,
+# тож порядок за log_score збігається з порядком за поточним згасаючим балом
+TRENDING_EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+RATING = 'ratings'
+VIEW = 'views'
+
+logger = logging.getLogger('movie_app.trending')
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_last_flush = [time.monotonic()]
+
+
+def half_life():
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 48) * 3600
+
+
+def weight(kind):
+    return getattr(settings, 'TRENDING_RATING_WEIGHT', 3) if kind == RATING else 1
+
+
+def log_component(count, kind, when):
+    return math.log2(count * weight(kind)) + (when - TRENDING_EPOCH).total_seconds() / half_life()
+
+
+def log_add(a, b):
+    """log2(2^a + 2^b) без переповнення"""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def log_sub(a, b):
+    """log2(2^a - 2^b); None, якщо від бала нічого не лишається"""
+    if a is None or b >= a:
+        return None
+    rest = 1 - 2 ** (b - a)
+    return a + math.log2(rest) if rest > 1e-9 else None
+
+
+def event_time(day, now):
+    """Час, з яким рахується згасання подій дня: полудень цього дня (майбутні дати - сьогоднішній).
+    Не залежить від години запису, тож подію можна точно відняти при зміні чи видаленні оцінки"""
+    return datetime.combine(min(day, now.date()), dtime(12), tzinfo=timezone.utc)
+
+
+def current_score(log_score, now=None):
+    now = now or dj_timezone.now()
+    return 2 ** (log_score - (now - TRENDING_EPOCH).total_seconds() / half_life())
+
+
+def record(events, now=None):
+    """Записує події {(movie_id, kind, date): count} у денні кошики та бали; від'ємна кількість - скасування
+    подій, наприклад зміненої дати перегляду чи видаленої оцінки"""
+    now = now or dj_timezone.now()
+    with transaction.atomic():
+        for (movie_id, kind, day), count in events.items():
+            if count > 0:
+                _add(movie_id, kind, day, count, now)
+            elif count < 0:
+                _subtract(movie_id, kind, day, -count, now)
+    maybe_compact(now.date())
+
+
+def _add(movie_id, kind, day, count, now):
+    bucket, _ = TrendingBucket.objects.get_or_create(movie_id=movie_id, period=TrendingBucket.DAY, start=day)
+    TrendingBucket.objects.filter(pk=bucket.pk).update(**{kind: F(kind) + count})
+    # подія з минулою датою перегляду враховується з відповідним згасанням
+    component = log_component(count, kind, event_time(day, now))
+    trend = MovieTrend.objects.select_for_update().filter(movie_id=movie_id).first()
+    if trend is None:
+        MovieTrend.objects.create(movie_id=movie_id, log_score=component)
+    else:
+        trend.log_score = log_add(trend.log_score, component)
+        trend.save(update_fields=['log_score'])
+
+
+def _subtract(movie_id, kind, day, count, now):
+    # денний кошик міг уже злитися в тижневий
+    for period, start in ((TrendingBucket.DAY, day), (TrendingBucket.WEEK, week_start(day))):
+        if TrendingBucket.objects.filter(movie_id=movie_id, period=period, start=start, **{f'{kind}__gte': count}) \
+                .update(**{kind: F(kind) - count}):
+            break
+    trend = MovieTrend.objects.select_for_update().filter(movie_id=movie_id).first()
+    if trend is None:
+        return
+    trend.log_score = log_sub(trend.log_score, log_component(count, kind, event_time(day, now)))
+    if trend.log_score is None:
+        trend.delete()
+    else:
+        trend.save(update_fields=['log_score'])
+
+
+def record_rating(movie_id, viewed_date, count=1):
+    record({(movie_id, RATING, viewed_date): count})
+
+
+def move_rating(previous, current):
+    """Оцінка перейшла з (movie_id, дата перегляду) previous на current; None - оцінки не було чи вже немає"""
+    if previous == current:
+        return
+    events = Counter()
+    if previous is not None:
+        events[(previous[0], RATING, previous[1])] -= 1
+    if current is not None:
+        events[(current[0], RATING, current[1])] += 1
+    record(events)
+
+
+def record_view(movie_id):
+    """Перегляди сторінок буферизуються в процесі і записуються пакетами: раз на TRENDING_FLUSH_SECONDS,
+    при 100 різних фільмах у буфері і під час звичайного завершення процесу. Якщо процес зупинено
+    аварійно (SIGKILL, OOM), втрачаються перегляди після останнього запису: під навантаженням - до
+    TRENDING_FLUSH_SECONDS секунд і не більше 100 фільмів"""
+    today = dj_timezone.now().date()
+    with _pending_lock:
+        _pending[(movie_id, VIEW, today)] += 1
+        due = (time.monotonic() - _last_flush[0] >= getattr(settings, 'TRENDING_FLUSH_SECONDS', 5)
+               or len(_pending) >= 100)
+    if due:
+        flush()
+
+
+def flush():
+    with _pending_lock:
+        events = dict(_pending)
+        _pending.clear()
+        _last_flush[0] = time.monotonic()
+    if events:
+        record(events)
+
+
+@atexit.register
+def flush_at_exit():
+    """Запис буфера під час завершення процесу; помилка лише журналюється, щоб не заважати виходу"""
+    try:
+        flush()
+    except Exception:
+        logger.exception('Could not flush buffered trending views')
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def maybe_compact(today):
+    """Ущільнення не частіше разу на день"""
+    if cache.add(f'trending:compacted:{today.isoformat()}', True, 86400):
+        compact(today)
+
+
+def compact(today):
+    """Денні кошики старші за TRENDING_DAY_BUCKETS днів зливаються в тижневі, старі тижневі видаляються"""
+    day_limit = today - timedelta(days=getattr(settings, 'TRENDING_DAY_BUCKETS', 14))
+    week_limit = week_start(today) - timedelta(weeks=getattr(settings, 'TRENDING_WEEK_BUCKETS', 12))
+    with transaction.atomic():
+        old_days = TrendingBucket.objects.filter(period=TrendingBucket.DAY, start__lt=day_limit)
+        weeks = Counter()
+        for movie_id, start, ratings, views in old_days.values_list('movie_id', 'start', 'ratings', 'views'):
+            weeks[(movie_id, week_start(start), RATING)] += ratings
+            weeks[(movie_id, week_start(start), VIEW)] += views
+        for (movie_id, start, kind), count in weeks.items():
+            if count and start >= week_limit:
+                bucket, _ = TrendingBucket.objects.get_or_create(movie_id=movie_id, period=TrendingBucket.WEEK,
+                                                                 start=start)
+                TrendingBucket.objects.filter(pk=bucket.pk).update(**{kind: F(kind) + count})
+        old_days.delete()
+        TrendingBucket.objects.filter(period=TrendingBucket.WEEK, start__lt=week_limit).delete()
+
+
+def trending(limit=20, now=None):
+    """Найпопулярніші фільми зараз з кількістю подій за останній тиждень"""
+    now = now or dj_timezone.now()
+    trends = list(MovieTrend.objects.select_related('movie').order_by('-log_score')[:limit])
+    since = now.date() - timedelta(days=6)
+    recent = {row['movie_id']: row for row in
+              TrendingBucket.objects.filter(movie_id__in=[t.movie_id for t in trends], period=TrendingBucket.DAY,
+                                            start__gte=since)
+              .values('movie_id').annotate(ratings=Sum('ratings'), views=Sum('views'))}
+    return [{
+        'movie': trend.movie,
+        'score': current_score(trend.log_score, now),
+        'ratings_7d': recent.get(trend.movie_id, {}).get('ratings', 0),
+        'views_7d': recent.get(trend.movie_id, {}).get('views', 0),
+    } for trend in trends]
+
+
+def rebuild(now=None):
+    """Перерахунок кошиків і балів з дат переглядів у Rating за період зберігання"""
+    now = now or dj_timezone.now()
+    today = now.date()
+    since = week_start(today) - timedelta(weeks=getattr(settings, 'TRENDING_WEEK_BUCKETS', 12))
+    events = Counter()
+    for movie_id, viewed_date in Rating.objects.filter(viewed_date__gte=since).values_list('movie_id', 'viewed_date'):
+        events[(movie_id, RATING, min(viewed_date, today))] += 1
+    with transaction.atomic():
+        TrendingBucket.objects.all().delete()
+        MovieTrend.objects.all().delete()
+        buckets = {}
+        scores = {}
+        for (movie_id, kind, day), count in events.items():
+            buckets[(movie_id, day)] = TrendingBucket(movie_id=movie_id, period=TrendingBucket.DAY, start=day,
+                                                      ratings=count)
+            scores[movie_id] = log_add(scores.get(movie_id), log_component(count, kind, event_time(day, now)))
+        TrendingBucket.objects.bulk_create(buckets.values(), batch_size=1000)
+        MovieTrend.objects.bulk_create([MovieTrend(movie_id=pk, log_score=s) for pk, s in scores.items()],
+                                       batch_size=1000)
+        compact(today)
+    return len(buckets), len(scores)
@@ -0,0 +1,176 @@
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import render
+from django.utils.html import escape
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import UploadedImage
+
+# формати, що перекодовуються в PNG без втрат; решта - у JPEG
+LOSSLESS_FORMATS = {'PNG', 'GIF', 'BMP', 'TIFF'}
+
+
+def get_storage():
+    from ckeditor_uploader.utils import storage
+    return storage
+
+
+def file_url(path):
+    from ckeditor_uploader.utils import get_media_url
+    return get_media_url(path)
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(1 << 16), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def prepare_image(file):
+    """Зменшене до CKEDITOR_IMAGE_MAX_SIZE і перекодоване зображення без EXIF та інших метаданих.
+
+    Повертає (вміст, розширення, (ширина, висота)); анімації повертаються без змін з розширенням None,
+    файли, що не є зображеннями, - None.
+    """
+    # Pillow потрібен лише тут, тому не завантажується в процеси, що не приймають файлів
+    from PIL import Image, ImageOps
+    try:
+        image = Image.open(file)
+        image.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        file.seek(0)
+        return None
+    if getattr(image, 'is_animated', False):
+        file.seek(0)
+        return file, None, image.size
+    source_format = image.format
+    # орієнтація з EXIF застосовується до пікселів, бо сам EXIF не зберігається
+    image = ImageOps.exif_transpose(image)
+    max_size = getattr(settings, 'CKEDITOR_IMAGE_MAX_SIZE', 1600)
+    image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    if source_format in LOSSLESS_FORMATS:
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            image = image.convert('RGBA')
+        image.save(output, format='PNG', optimize=True)
+        extension = '.png'
+    else:
+        image.convert('RGB').save(output, format='JPEG', quality=getattr(settings, 'CKEDITOR_IMAGE_QUALITY', 85),
+                                  optimize=True, progressive=True)
+        extension = '.jpg'
+    output.seek(0)
+    return output, extension, image.size
+
+
+def store_upload(upload, request):
+    """Зберігає завантажений файл через конвеєр обробки; None, якщо тип файлу не дозволено"""
+    from ckeditor_uploader.views import get_upload_filename
+
+    digest = content_hash(upload)
+    storage = get_storage()
+    existing = UploadedImage.objects.filter(sha256=digest).first()
+    if existing is not None and storage.exists(existing.path):
+        return existing
+
+    prepared = prepare_image(upload)
+    if prepared is None:
+        if not getattr(settings, 'CKEDITOR_ALLOW_NONIMAGE_FILES', True):
+            return None
+        content, extension, (width, height) = upload, None, (None, None)
+    else:
+        content, extension, (width, height) = prepared
+    path = get_upload_filename(upload.name, request)
+    if extension:
+        path = os.path.splitext(path)[0] + extension
+    path = storage.save(path, File(content))
+
+    fields = {'path': path, 'thumbnail': '', 'original_name': upload.name[:255], 'size': storage.size(path),
+              'width': width, 'height': height, 'is_image': prepared is not None}
+    try:
+        with transaction.atomic():
+            image, _ = UploadedImage.objects.update_or_create(sha256=digest, defaults=fields)
+    except IntegrityError:
+        # той самий файл щойно зберіг інший запит
+        storage.delete(path)
+        return UploadedImage.objects.get(sha256=digest)
+    if image.is_image:
+        from . import tasks
+        tasks.make_thumbnail.enqueue_on_commit(image.pk)
+    return image
+
+
+def make_thumbnail(image):
+    """Мініатюра для браузера файлів з тим самим суфіксом _thumb, що й у ckeditor_uploader"""
+    from PIL import Image
+    from ckeditor_uploader.utils import get_thumb_filename
+
+    storage = get_storage()
+    with storage.open(image.path) as f:
+        thumb = Image.open(f)
+        width, height = thumb.size
+        thumb.thumbnail(getattr(settings, 'CKEDITOR_THUMBNAIL_SIZE', (75, 75)), Image.Resampling.LANCZOS)
+        output = BytesIO()
+        thumb.convert('RGB').save(output, format='JPEG', quality=80, optimize=True)
+    if image.thumbnail:
+        storage.delete(image.thumbnail)
+    path = storage.save(os.path.splitext(get_thumb_filename(image.path))[0] + '.jpg', ContentFile(output.getvalue()))
+    # розміри заповнюються і для файлів, доданих до маніфесту командою index_uploads
+    UploadedImage.objects.filter(pk=image.pk).update(thumbnail=path, width=width, height=height)
+    return path
+
+
+@csrf_exempt
+def upload(request):
+    """Завантаження з CKEditor; відповідь у форматі ckeditor_uploader"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    upload = request.FILES.get('upload')
+    if upload is None:
+        return HttpResponseBadRequest('No file uploaded.')
+    ck_func_num = escape(request.GET.get('CKEditorFuncNum') or '')
+    image = store_upload(upload, request)
+    if image is None:
+        return HttpResponse(f"<script type='text/javascript'>window.parent.CKEDITOR.tools.callFunction("
+                            f"{ck_func_num}, '', 'Invalid file type.');</script>")
+    url = file_url(image.path)
+    if ck_func_num:
+        return HttpResponse(f"<script type='text/javascript'>window.parent.CKEDITOR.tools.callFunction("
+                            f"{ck_func_num}, '{url}');</script>")
+    return JsonResponse({'url': url, 'uploaded': '1', 'fileName': os.path.basename(image.path)})
+
+
+def browse(request):
+    """Браузер файлів CKEditor за маніфестом, найновіші першими"""
+    from ckeditor_uploader.forms import SearchForm
+    from ckeditor_uploader.utils import get_icon_filename
+
+    images = UploadedImage.objects.order_by('-uploaded', '-id')
+    form = SearchForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid() and form.cleaned_data.get('q'):
+        images = images.filter(original_name__icontains=form.cleaned_data['q'])
+    files = []
+    for image in images[:getattr(settings, 'CKEDITOR_BROWSE_LIMIT', 500)]:
+        src = file_url(image.path)
+        if image.thumbnail:
+            thumb = file_url(image.thumbnail)
+        else:
+            thumb = src if image.is_image else get_icon_filename(image.path)
+        name = os.path.basename(image.path)
+        files.append({'thumb': thumb, 'src': src, 'is_image': image.is_image,
+                      'visible_filename': name if len(name) <= 20 else name[:19] + '...'})
+    context = {
+        'show_dirs': getattr(settings, 'CKEDITOR_BROWSE_SHOW_DIRS', False),
+        'dirs': sorted({os.path.dirname(f['src']) for f in files}, reverse=True),
+        'files': files,
+        'form': form,
+    }
+    return render(request, 'ckeditor/browse.html', context)
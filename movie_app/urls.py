@@ -1,12 +1,17 @@
 from django.urls import path
 from .views import AllMovies, AllActors, AllDirectors, \
     OneActor, OneMovie, OneGenre, OneDirector, BestMovies,\
-    AddRating, AddFeedback, FilterMoviesView, Search
+    AddRating, AddFeedback, FilterMoviesView, Search, Trending, TrendingApi, \
+    MyHistory, MyHistoryApi
 
 urlpatterns = [
     # path('', main_page),
-    # path('', BestMovies.as_view(), name='best_movies'),
     path('', AllMovies.as_view(), name='movies'),
+    path('best/', BestMovies.as_view(), name='best_movies'),
+    path('trending/', Trending.as_view(), name='trending'),
+    path('api/trending/', TrendingApi.as_view(), name='trending_api'),
+    path('history/', MyHistory.as_view(), name='history'),
+    path('api/history/', MyHistoryApi.as_view(), name='history_api'),
     path('filter/', FilterMoviesView.as_view(), name='filter'),
     path('search/', Search.as_view(), name='search'),
     path('feedback/<int:pk>/', AddFeedback.as_view(), name='add_feedback'),
@@ -1,23 +1,29 @@
-from django.db.models import Q
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import Q, Count
+from django.db.models.functions import TruncMonth
+from django.http import HttpResponse, Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 
+from . import leaderboard, querycache, snapshot, trending
+from .cards import cards_for
 from .models import Movie, Actor, Director, Genre, Rating
 from .forms import RatingForm, FeedbackForm
+from .metrics import registry
 from .service import get_client_ip
+from .slugs import resolver
 
 
 class FilterData:
     """Фільтр по жанрах, роках, рейтингах"""
 
     def get_genres(self):
-        return Genre.objects.all()
+        return querycache.genre_list()
 
     def get_years(self):
-        return Movie.objects.all().values("year")
+        return querycache.movie_years()
 
     def get_rating(self):
         return [4, 5, 6, 7, 8, 9]
@@ -27,74 +33,255 @@ class FilterData:
 
 
 
+class CardListMixin:
+    """Списки фільмів з готових карток: сторінка id, одна вибірка карток за первинним ключем.
+    object_list - queryset фільмів або вже впорядкований список їх id"""
+
+    def get_context_data(self, **kwargs):
+        ids = self.object_list
+        if not isinstance(ids, list):
+            ids = ids.order_by('id').values_list('id', flat=True)
+        context = super().get_context_data(object_list=ids, **kwargs)
+        cards = cards_for(context["object_list"])
+        my_ratings = {rating.movie_id: rating for rating in Rating.objects.filter(
+            ip=get_client_ip(self.request), movie_id__in=[card["id"] for card in cards])}
+        for card in cards:
+            rating = my_ratings.get(card["id"])
+            if rating:
+                card["my_rating"] = rating.rating
+                card["my_viewed_date"] = rating.viewed_date
+        context["object_list"] = context["movie_list"] = cards
+        return context
+
+
 class BestMovies(FilterData, ListView):
-    # template_name = 'movie_app/main_page.html'
+    """Кращі фільми: загалом, за жанром (?genre=) чи десятиліттям (?decade=)"""
+    template_name = 'movie_app/best_movies.html'
     model = Movie
     context_object_name = 'movies'
 
+    def get_board_key(self):
+        if "genre" in self.request.GET:
+            genre = self.request.GET.get("genre", "")
+            if not genre.isdigit():
+                raise Http404
+            return leaderboard.genre_key(get_object_or_404(Genre, id=int(genre)).id)
+        if "decade" in self.request.GET:
+            decade = self.request.GET.get("decade", "")
+            if not decade.isdigit() or not 1890 <= int(decade) <= 2100:
+                raise Http404
+            return leaderboard.decade_key(int(decade))
+        return leaderboard.ALL
+
+    def get_queryset(self):
+        return leaderboard.top_movies(self.get_board_key())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["board"] = self.get_board_key()
+        context["decades"] = range(1890, date.today().year + 1, 10)
+        return context
+
 
-class AllMovies(FilterData, ListView):
+class AllMovies(CardListMixin, FilterData, ListView):
     """Список фільмів"""
     # form_class = FeedbackForm
     # success_url = ''
     # template_name = 'movie_app/movie_list.html'
     model = Movie
 
-    # creating auto slug
-    # movies = Movie.objects.all()
-    # for movie in movies:
-    #     movie.save()
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["get_client_ip"] = get_client_ip(self.request)
         return context
 
 
+class Trending(FilterData, ListView):
+    """Популярні зараз фільми"""
+    template_name = 'movie_app/trending.html'
+    context_object_name = 'trending'
+
+    def get_queryset(self):
+        return trending.trending(getattr(settings, 'TRENDING_PAGE_SIZE', 20))
+
+
+class TrendingApi(View):
+    """Популярні зараз фільми у форматі JSON"""
+
+    def get(self, request):
+        return JsonResponse({"movies": [{
+            "id": item["movie"].id,
+            "name": item["movie"].name,
+            "original_name": item["movie"].original_name,
+            "url": item["movie"].get_url(),
+            "score": round(item["score"], 4),
+            "ratings_7d": item["ratings_7d"],
+            "views_7d": item["views_7d"],
+        } for item in trending.trending(getattr(settings, 'TRENDING_PAGE_SIZE', 20))]})
+
+
+class HistoryMixin:
+    """Історія переглядів клієнта: діапазон місяців ?from=&to= (РРРР-ММ) і курсор ?after="""
+
+    def parse_month(self, name):
+        value = self.request.GET.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, "%Y-%m").date()
+        except ValueError:
+            raise Http404
+
+    def get_history_queryset(self):
+        queryset = Rating.objects.filter(ip=get_client_ip(self.request))
+        month_from = self.parse_month("from")
+        month_to = self.parse_month("to")
+        if month_from:
+            queryset = queryset.filter(viewed_date__gte=month_from)
+        if month_to:
+            next_month = (month_to.replace(day=28) + timedelta(days=4)).replace(day=1)
+            queryset = queryset.filter(viewed_date__lt=next_month)
+        return queryset
+
+    def get_history_page(self):
+        """Сторінка за курсором (дата, id): індекс (ip, viewed_date) читається з потрібного місця"""
+        queryset = self.get_history_queryset().select_related('movie').order_by('-viewed_date', '-id')
+        after = self.request.GET.get("after")
+        if after:
+            try:
+                after_date, after_id = after.split("_")
+                after_date = date.fromisoformat(after_date)
+                after_id = int(after_id)
+            except ValueError:
+                raise Http404
+            queryset = queryset.filter(Q(viewed_date__lt=after_date) | Q(viewed_date=after_date, id__lt=after_id))
+        size = getattr(settings, 'HISTORY_PAGE_SIZE', 50)
+        ratings = list(queryset[:size + 1])
+        cursor = None
+        if len(ratings) > size:
+            ratings = ratings[:size]
+            cursor = f"{ratings[-1].viewed_date.isoformat()}_{ratings[-1].id}"
+        return ratings, cursor
+
+    def get_month_counts(self):
+        return list(self.get_history_queryset().annotate(month=TruncMonth('viewed_date'))
+                    .values('month').annotate(count=Count('id')).order_by('-month'))
+
+
+class MyHistory(HistoryMixin, FilterData, ListView):
+    """Моя історія переглядів"""
+    template_name = 'movie_app/history.html'
+    context_object_name = 'ratings'
+
+    def get_queryset(self):
+        self.ratings, self.cursor = self.get_history_page()
+        return self.ratings
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["months"] = self.get_month_counts()
+        context["cursor"] = self.cursor
+        context["range"] = ''.join([f"{x}={self.request.GET[x]}&" for x in ("from", "to") if self.request.GET.get(x)])
+        return context
+
+
+class MyHistoryApi(HistoryMixin, View):
+    """Моя історія переглядів у форматі JSON"""
+
+    def get(self, request):
+        ratings, cursor = self.get_history_page()
+        return JsonResponse({
+            "ratings": [{
+                "movie": rating.movie.name,
+                "url": rating.movie.get_url(),
+                "rating": str(rating.rating),
+                "viewed_date": rating.viewed_date.isoformat(),
+            } for rating in ratings],
+            "next": cursor,
+            "months": [{"month": row["month"].strftime("%Y-%m"), "count": row["count"]}
+                       for row in self.get_month_counts()],
+        })
+
+
 class AllActors(ListView):
     """Список акторів"""
     # template_name = 'movie_app/actor_list.html'
     model = Actor
     context_object_name = 'actors'
-    # creating auto slug
-    # actors = Actor.objects.all()
-    # for actor in actors:
-    #     actor.save()
-
 
 class AllDirectors(ListView):
     """Список режисерів"""
     # template_name = 'movie_app/director_list.html'
     model = Director
     context_object_name = 'directors'
-    # creating auto slug
-    # directors = Director.objects.all()
-    # for director in directors:
-    #     director.save()
-
 
-class OneActor(FilterData, DetailView):
+class SlugResolverMixin:
+    """Сторінка деталей за слагом: запис вибирається за первинним ключем з кешу slug -> pk.
+
+    Спершу перевіряється LRU процесу, потім спільний знімок каталогу; в LRU потрапляють лише слаги,
+    яких у знімку ще немає."""
+
+    def get_object(self, queryset=None):
+        queryset = self.get_queryset() if queryset is None else queryset
+        slug = self.kwargs[self.slug_url_kwarg]
+        pk = resolver.get(queryset.model, slug)
+        if pk is None:
+            catalog = snapshot.current()
+            pk = catalog.slug_pk(queryset.model, slug) if catalog else None
+        if pk is not None:
+            obj = queryset.filter(pk=pk).first()
+            # слаг міг змінитися після потрапляння в кеш
+            if obj is not None and obj.slug == slug:
+                return obj
+            resolver.discard(queryset.model, slug)
+        obj = queryset.filter(slug=slug).first()
+        if obj is None:
+            raise Http404
+        resolver.put(queryset.model, slug, obj.pk)
+        return obj
+
+
+class OneActor(SlugResolverMixin, FilterData, DetailView):
     """Інформація про актора"""
     # template_name = 'movie_app/actor_detail.html'
     model = Actor
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["movies"] = cards_for(querycache.filmography(self.object))
+        return context
+
 
-class OneDirector(FilterData, DetailView):
+class OneDirector(SlugResolverMixin, FilterData, DetailView):
     """Інформація про режисера"""
     # template_name = 'movie_app/director_detail.html'
     model = Director
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["movies"] = cards_for(querycache.filmography(self.object))
+        return context
+
 
-class OneMovie(FilterData, DetailView):
+class OneMovie(SlugResolverMixin, FilterData, DetailView):
     """Інформація про фільм"""
     # template_name = 'movie_app/movie_detail.html'
     model = Movie
 
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        if not getattr(request, 'warmup', False):
+            trending.record_view(self.object.id)
+        return response
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["form"] = RatingForm()
         context["form_f"] = FeedbackForm()
         context["get_client_ip"] = get_client_ip(self.request)
+        context.update(querycache.movie_related(self.object))
+        context["my_rating"] = Rating.objects.filter(movie=self.object, ip=context["get_client_ip"]) \
+            .order_by('-id').first()
         return context
 
 
@@ -103,6 +290,11 @@ class OneGenre(DetailView):
     # template_name = 'movie_app/genre_detail.html'
     model = Genre
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["movies"] = cards_for(querycache.filmography(self.object))
+        return context
+
 
 class AddRating(View):
     """Додавання рейтингу до фільму"""
@@ -118,6 +310,7 @@ class AddRating(View):
                 movie_id=movie.id,
                 defaults={"rating": request.POST.get("rating")}
             )
+            registry.inc('rating_writes_total')
             return redirect(movie.get_url())
 
 
@@ -131,11 +324,14 @@ class AddFeedback(View):
             form = form.save(commit=False)
             form.movie = movie
             form.save()
+            registry.inc('feedback_submissions_total')
         return redirect(movie.get_url())
 
 
-class FilterMoviesView(FilterData, ListView):
+class FilterMoviesView(CardListMixin, FilterData, ListView):
     """Фільтр фільмів"""
+    # зі знімка приходить список id, з якого ListView не виведе назву шаблону
+    template_name = 'movie_app/movie_list.html'
     paginate_by = 2
 
     def get_queryset(self):
@@ -143,7 +339,7 @@ class FilterMoviesView(FilterData, ListView):
         if "year" in self_get:
             get_year = self_get.getlist("year")
         else:
-            get_year = self.get_years()
+            get_year = [row["year"] for row in self.get_years()]
         if "genre" in self_get:
             get_genre = self_get.getlist("genre")
         else:
@@ -165,6 +361,9 @@ class FilterMoviesView(FilterData, ListView):
                                             rating__ip=get_client_ip(self.request), rating__rating__gte=get_my_rating,
                                             rating__viewed_date__lte=get_my_date
                                             ).distinct()
+        elif self.get_snapshot_ids() is not None:
+            # id зі знімка вже в порядку id: пагінатор бере зріз сторінки, без запиту з усіма id у IN
+            queryset = self.get_snapshot_ids()
         else:
             queryset = Movie.objects.filter(year__in=get_year, genres__in=get_genre, rating_imdb__gte=get_rating_imdb
                                             ).distinct()
@@ -172,6 +371,21 @@ class FilterMoviesView(FilterData, ListView):
         print(queryset)
         return queryset
 
+    def get_snapshot_ids(self):
+        """Id фільмів з бітових масок знімка каталогу замість з'єднання з жанрами і DISTINCT;
+        None, якщо знімка немає чи параметри не цілі числа"""
+        if not hasattr(self, "_snapshot_ids"):
+            self._snapshot_ids = None
+            catalog = snapshot.current()
+            params = self.request.GET
+            values = params.getlist("year") + params.getlist("genre") + params.getlist("rating_imdb")[:1]
+            if catalog is not None and all(value.isdigit() for value in values):
+                self._snapshot_ids = catalog.filter_ids(
+                    years=[int(year) for year in params.getlist("year")] if "year" in params else None,
+                    genre_ids=[int(genre) for genre in params.getlist("genre")] if "genre" in params else None,
+                    min_rating=int(params.getlist("rating_imdb")[0]) if "rating_imdb" in params else 4)
+        return self._snapshot_ids
+
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
         context["year"] = ''.join([f"year={x}&" for x in self.request.GET.getlist("year")])
@@ -179,7 +393,7 @@ class FilterMoviesView(FilterData, ListView):
         return context
 
 
-class Search(FilterData, ListView):
+class Search(CardListMixin, FilterData, ListView):
     """Пошук фільмів"""
     paginate_by = 1
 
@@ -0,0 +1,157 @@
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from . import leaderboard, querycache, trending
+from .cards import cards_for
+from .models import Movie
+
+logger = logging.getLogger('movie_app.warmup')
+
+# сторінки, які має сенс прогрівати: лише GET без побічних ефектів
+WARM_URL_NAMES = {'movies', 'best_movies', 'trending', 'trending_api', 'filter', 'search', 'genre', 'movie',
+                  'actors', 'actor', 'directors', 'director'}
+
+
+class WarmupHandler(WSGIHandler):
+    """Внутрішні запити прогріву не потрапляють у лог доступу і не рахуються як перегляди"""
+
+    def get_response(self, request):
+        request.replayed = True
+        request.warmup = True
+        return super().get_response(request)
+
+
+def recent_paths(path, max_bytes):
+    """Частота GET запитів в останніх max_bytes логу доступу: (шлях, рядок запиту) -> кількість"""
+    counts = Counter()
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return counts
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size - max_bytes, 0))
+        if size > max_bytes:
+            f.readline()  # перший рядок обрізаний
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('m') == 'GET':
+                counts[(entry['p'], entry.get('q', ''))] += 1
+    return counts
+
+
+def ranked_paths(limit, log_bytes):
+    """Найчастіші сторінки з логу доступу; без логу - головна, кращі й популярні зараз фільми"""
+    counts = Counter()
+    log_path = getattr(settings, 'ACCESS_LOG_PATH', None)
+    if log_path:
+        for (path, query), count in recent_paths(log_path, log_bytes).items():
+            try:
+                match = resolve(path)
+            except Resolver404:
+                continue
+            if match.url_name in WARM_URL_NAMES:
+                counts[(path, query)] += count
+    if not counts:
+        counts.update({('/', ''): 3, ('/best/', ''): 2, ('/trending/', ''): 2})
+        for i, item in enumerate(trending.trending(limit)):
+            counts[(item['movie'].get_url(), '')] = 1 / (i + 2)
+    return counts.most_common(limit)
+
+
+def warm_data(pages):
+    """Дані, спільні для багатьох сторінок: панель фільтрів, рейтинги кращих і картки перших pages сторінок
+    списку з фільтром; картки решти сторінок прогріваються лише запитами до них"""
+    # warmup імпортується під час запуску процесу (apps.ready), views - лише коли прогрів почався
+    from .views import FilterMoviesView
+
+    querycache.genre_list()
+    querycache.movie_years()
+    leaderboard.global_mean()
+    leaderboard.top_movies(leaderboard.ALL)
+    ids = Movie.objects.order_by('id').values_list('id', flat=True)[:pages * FilterMoviesView.paginate_by]
+    return len(cards_for(ids))
+
+
+def warm_pages(pages, host='localhost'):
+    """Внутрішні GET запити до сторінок: прогріваються кеш слагів, кеш запитів, шаблони й індекси.
+    Повертає кількість сторінок за статусами відповіді"""
+    app = WarmupHandler()
+    statuses = Counter()
+    for path, query in pages:
+        environ = {
+            # WSGI передає шлях як байти UTF-8, декодовані в latin-1
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path.encode().decode('iso-8859-1'), 'QUERY_STRING': query,
+            'REMOTE_ADDR': '127.0.0.1',
+            'SERVER_NAME': host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        status = []
+        result = app(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        statuses[int(status[0].split()[0])] += 1
+    return statuses
+
+
+def warm(limit=None, log_bytes=None, host=None):
+    """Прогрів кешів процесу; повертає [(крок, кількість, секунди)]"""
+    limit = limit or getattr(settings, 'WARMUP_PAGES', 200)
+    log_bytes = log_bytes or getattr(settings, 'WARMUP_LOG_BYTES', 4 * 1024 * 1024)
+    host = host or (settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS and settings.ALLOWED_HOSTS[0] != '*'
+                    else 'localhost')
+    report = []
+    started = time.perf_counter()
+    ranked = ranked_paths(limit, log_bytes)
+    report.append(('ranked pages', len(ranked), time.perf_counter() - started))
+    started = time.perf_counter()
+    report.append(('shared data', warm_data(limit), time.perf_counter() - started))
+    started = time.perf_counter()
+    statuses = warm_pages([page for page, _ in ranked], host)
+    report.append(('pages ' + ', '.join(f'{count}x{status}' for status, count in sorted(statuses.items())),
+                   sum(statuses.values()), time.perf_counter() - started))
+    return report
+
+
+def _prime():
+    time.sleep(getattr(settings, 'WARMUP_DELAY', 2))
+    try:
+        for step, count, seconds in warm():
+            logger.info('Warm-up %s: %d in %.2fs', step, count, seconds)
+    except Exception:
+        logger.exception('Warm-up failed')
+    finally:
+        connections.close_all()
+
+
+def start_primer():
+    """Фоновий прогрів процесу вебсервера після запуску (WARMUP_ON_START)"""
+    argv = [os.path.basename(arg) for arg in sys.argv[:2]]
+    if argv[:1] == ['manage.py'] and argv[1:] != ['runserver']:
+        # інші команди manage.py (migrate, run_tasks...) прогріву не потребують
+        return None
+    if argv[1:] == ['runserver'] and os.environ.get('RUN_MAIN') != 'true' and '--noreload' not in sys.argv:
+        # батьківський процес автоперезавантаження запитів не обслуговує
+        return None
+    thread = threading.Thread(target=_prime, name='cache-warmup', daemon=True)
+    thread.start()
+    return thread
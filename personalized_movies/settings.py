@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'movie_app.middleware.MetricsMiddleware',
+    'movie_app.middleware.WriterRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +54,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'movie_app.middleware.AccessLogMiddleware',
+    'movie_app.middleware.ProfilingMiddleware',
+    'movie_app.middleware.SlowQueryMiddleware',
 ]
 
 ROOT_URLCONF = 'personalized_movies.urls'
@@ -80,9 +85,29 @@ WSGI_APPLICATION = 'personalized_movies.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'movie_app.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    },
+    # той самий файл, відкритий лише для читання; сюди йдуть читання GET запитів
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{BASE_DIR / "db.sqlite3"}?mode=ro',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['movie_app.db.ReadReplicaRouter']
+
+# PRAGMA для кожного нового з'єднання SQLite (основне з'єднання додатково переводиться в WAL)
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,
 }
 
 
@@ -134,7 +159,93 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_ROOT = BASE_DIR / 'uploads'
 # MEDIA_URL = '/my_gallery/'
 
+# JSONL лог запитів для manage.py replay_log; None - запис вимкнено
+ACCESS_LOG_PATH = None
+
+# профілі запитів (?_profile=1 для персоналу або підписаний заголовок X-Profile)
+PROFILE_STORE_DIR = BASE_DIR / 'profiles'
+PROFILE_STORE_MAX = 50
+PROFILE_TOKEN_MAX_AGE = 3600
+
+# каталог для знімків метрик кожного процесу; None - метрики лише поточного процесу
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_INTERVAL = 1
+# /metrics віддається лише цим адресам (REMOTE_ADDR) або з заголовком Authorization: Bearer METRICS_TOKEN
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# запити до БД, довші за поріг, пишуться в журнал разом з EXPLAIN QUERY PLAN (manage.py slow_queries)
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.log'
+
+# рейтинг кращих: бал = вага * IMDB + (1 - вага) * байєсівське середнє оцінок
+LEADERBOARD_SIZE = 100
+LEADERBOARD_IMDB_WEIGHT = 0.5
+LEADERBOARD_MIN_VOTES = 5
+
+# популярне зараз: згасаючий бал з періодом напіврозпаду, денні кошики зливаються в тижневі
+TRENDING_HALF_LIFE_HOURS = 48
+TRENDING_RATING_WEIGHT = 3
+TRENDING_DAY_BUCKETS = 14
+TRENDING_WEEK_BUCKETS = 12
+# перегляди буферизуються в процесі і записуються не рідше ніж раз на стільки секунд під навантаженням
+# та під час завершення процесу; аварійна зупинка втрачає лише ще не записаний буфер
+TRENDING_FLUSH_SECONDS = 5
+TRENDING_PAGE_SIZE = 20
+
+HISTORY_PAGE_SIZE = 50
+
+# списки адмінки з більшою кількістю рядків не рахуються точно; кешовані підрахунки живуть стільки секунд
+ADMIN_COUNT_THRESHOLD = 10000
+ADMIN_COUNT_CACHE_SECONDS = 300
+
+# кількість записів у кеші slug -> pk кожного процесу
+SLUG_CACHE_SIZE = 10000
+
+# кеш запитів з тегами (querycache): псевдонім з CACHES і час життя записів, с.
+# Типовий locmem окремий для кожного процесу; щоб інвалідація доходила до всіх воркерів і run_tasks,
+# потрібен спільний бекенд, наприклад
+# CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'}}
+# або 'django.core.cache.backends.filebased.FileBasedCache' з LOCATION - каталогом
+QUERY_CACHE_ALIAS = 'default'
+QUERY_CACHE_SECONDS = 3600
+
+# прогрів кешів: у фоновому потоці кожного процесу вебсервера після запуску (через WARMUP_DELAY с),
+# кількість найчастіших сторінок з останніх WARMUP_LOG_BYTES логу доступу
+WARMUP_ON_START = False
+WARMUP_DELAY = 2
+WARMUP_PAGES = 200
+WARMUP_LOG_BYTES = 4 * 1024 * 1024
+
+# знімок каталогу (build_snapshot): один файл, який усі процеси відображають у пам'ять лише для читання;
+# None вимикає знімок. Заміну файлу процес помічає не пізніше ніж за CATALOG_SNAPSHOT_CHECK_SECONDS с
+CATALOG_SNAPSHOT_PATH = BASE_DIR / 'catalog.snapshot'
+CATALOG_SNAPSHOT_CHECK_SECONDS = 1
+# поставлена в чергу перебудова знімка чекає стільки секунд, зливаючи всі зміни каталогу за цей час в одну
+CATALOG_SNAPSHOT_BUILD_DELAY = 5
+
+# пошук дублікатів: мінімальна схожість назв, кількість сусідів для порівняння в блоці, час життя кандидатів у кеші
+DEDUPE_THRESHOLD = 0.7
+DEDUPE_WINDOW = 50
+DEDUPE_CACHE_SECONDS = 3600
+
+# фонові завдання: True - виконувати одразу після фіксації транзакції в процесі запиту (розробка й тести);
+# False - лише записувати в чергу, тоді поруч з вебсервером обов'язково має працювати воркер run_tasks,
+# інакше картки, рейтинги кращих і знімок каталогу не оновлюються
+TASKS_EAGER = DEBUG
+# затримка першого повтору (далі подвоюється), час до повернення в чергу завдання зупиненого воркера
+# і час зберігання виконаних завдань, с
+TASKS_RETRY_DELAY = 10
+TASKS_STALE_SECONDS = 600
+TASKS_KEEP_SECONDS = 86400
+
 CKEDITOR_UPLOAD_PATH = "uploads/"
+# завантажені зображення зменшуються до цього розміру (px) і перекодовуються; мініатюри для браузера файлів
+CKEDITOR_IMAGE_MAX_SIZE = 1600
+CKEDITOR_IMAGE_QUALITY = 85
+CKEDITOR_THUMBNAIL_SIZE = (150, 150)
+# скільки останніх файлів показує браузер CKEditor
+CKEDITOR_BROWSE_LIMIT = 500
 
 CKEDITOR_CONFIGS = {
     'default': {
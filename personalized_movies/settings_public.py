@@ -0,0 +1,13 @@
+"""Профіль процесів, що обслуговують лише публічні сторінки каталогу.
+
+Без адмінки, admin_interface, colorfield і CKEditor: їхні модулі не імпортуються під час запуску,
+а admin.py застосунків не завантажується. Адмінку і завантаження файлів обслуговують процеси
+з personalized_movies.settings; база даних, кеш і знімок каталогу спільні.
+"""
+from .settings import *  # noqa: F401,F403
+
+EDITOR_APPS = {'admin_interface', 'colorfield', 'django.contrib.admin', 'ckeditor', 'ckeditor_uploader'}
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in EDITOR_APPS]
+
+ROOT_URLCONF = 'personalized_movies.urls_public'
@@ -14,15 +14,26 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
 from django.urls import path, include
+from django.views.decorators.cache import never_cache
 from django.conf import settings
 from django.conf.urls.static import static
 
+from movie_app.metrics import metrics_view
+from movie_app.profiling import profile_list, profile_download
+from movie_app import uploads
+
 # admin.site.site_header = 'Movie admin'
 # admin.site.index_title = 'Administration'
 
 urlpatterns = [
+    path('admin/profiles/', admin.site.admin_view(profile_list), name='profiles'),
+    path('admin/profiles/<str:name>', admin.site.admin_view(profile_download), name='profile_download'),
     path('admin/', admin.site.urls),
-    path('ckeditor/', include('ckeditor_uploader.urls')),
+    # завантаження і браузер файлів CKEditor через маніфест UploadedImage
+    path('ckeditor/upload/', staff_member_required(uploads.upload), name='ckeditor_upload'),
+    path('ckeditor/browse/', never_cache(staff_member_required(uploads.browse)), name='ckeditor_browse'),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('movie_app.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
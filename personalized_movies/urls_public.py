@@ -0,0 +1,11 @@
+"""URL-и публічного профілю (settings_public): каталог і метрики без адмінки та CKEditor"""
+from django.urls import path, include
+from django.conf import settings
+from django.conf.urls.static import static
+
+from movie_app.metrics import metrics_view
+
+urlpatterns = [
+    path('metrics', metrics_view, name='metrics'),
+    path('', include('movie_app.urls')),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)